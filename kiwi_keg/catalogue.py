@@ -0,0 +1,148 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+import json
+import logging
+import os
+import tempfile
+from glob import glob
+from typing import (
+    Dict, List, Optional
+)
+
+from kiwi_keg.exceptions import KegError
+from kiwi_keg.image_definition import KegImageDefinition
+from kiwi_keg.version import __version__
+
+log = logging.getLogger('keg')
+
+CATALOGUE_VERSION = 1
+
+
+class RecipesCatalogue:
+    """
+    Persistent cache of image header information as shown by
+    keg --list-recipes.
+
+    Each entry stores the modification times of the directories and
+    YAML files the image header was read from. An entry is only used
+    if none of them changed.
+
+    :param str cache_file: path of the cache file, None for no persistence
+    """
+    def __init__(self, cache_file: Optional[str] = None):
+        self.cache_file = cache_file
+        self._entries: Dict[str, Dict] = {}
+        self._modified = False
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r') as cache:
+                    content = json.load(cache)
+                if content.get('version') == CATALOGUE_VERSION and content.get('keg') == __version__:
+                    self._entries = content['images']
+            except (OSError, ValueError, KeyError, AttributeError) as issue:
+                log.warning('Ignoring unreadable catalogue cache {}: {}'.format(cache_file, issue))
+
+    def get(self, roots: List[str], image_src: str) -> Optional[Dict]:
+        """
+        Return cached entry for image if all its dependencies are unchanged
+        """
+        entry = self._entries.get(self._key(roots, image_src))
+        if entry and entry['deps'] == get_mtimes(list(entry['deps'].keys())):
+            return entry
+        return None
+
+    def set(self, roots: List[str], image_src: str, entry: Dict) -> None:
+        """
+        Store entry for image, entries without dependencies are not stored
+        """
+        if not entry.get('deps'):
+            return
+        self._entries[self._key(roots, image_src)] = entry
+        self._modified = True
+
+    def save(self) -> None:
+        """
+        Write the catalogue to the cache file if it changed
+        """
+        if not self.cache_file or not self._modified:
+            return
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=cache_dir, delete=False) as cache:
+                json.dump(
+                    {'version': CATALOGUE_VERSION, 'keg': __version__, 'images': self._entries},
+                    cache
+                )
+            os.replace(cache.name, self.cache_file)
+        except OSError as issue:
+            log.warning('Cannot write catalogue cache {}: {}'.format(self.cache_file, issue))
+
+    @staticmethod
+    def _key(roots, image_src):
+        return json.dumps([[os.path.abspath(x) for x in roots], image_src])
+
+
+def get_mtimes(paths: List[str]) -> Dict[str, Optional[int]]:
+    """
+    Return modification times of given paths, None for missing ones
+    """
+    mtimes: Dict[str, Optional[int]] = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+def read_image_info(roots: List[str], image_src: str) -> Dict:
+    """
+    Read header information of given image and return a catalogue entry
+    with either 'info' or 'error' set, and the dependencies of the entry
+    in 'deps'.
+    """
+    entry: Dict = {}
+    image_definition = None
+    try:
+        image_definition = KegImageDefinition(
+            image_name=image_src,
+            recipes_roots=roots
+        )
+        image_definition.populate_header()
+        image_spec = image_definition.data['image']
+        if isinstance(image_spec['preferences'], list):
+            ver = image_spec['preferences'][0].get('version', 'n/a')
+        else:
+            ver = image_spec['preferences'].get('version', 'n/a')
+        entry['info'] = {
+            'name': image_spec['_attributes']['name'],
+            'desc': image_spec['description']['specification'],
+            'ver': ver
+        }
+    except KegError as e:
+        entry['error'] = '{} is not a valid image definition: {}'.format(image_src, e)
+    except KeyError as e:
+        entry['error'] = '{} is not a valid image definition, missing key "{}"'.format(image_src, e)
+    deps = []
+    if image_definition:
+        for src_dir in dict.fromkeys(image_definition.source_dirs):
+            deps.append(src_dir)
+            deps += sorted(glob(os.path.join(src_dir, '*.yaml')))
+    entry['deps'] = get_mtimes(deps)
+    return entry
@@ -15,8 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with keg. If not, see <http://www.gnu.org/licenses/>
 #
+import json
 import logging
-from typing import List
+from typing import (
+    Any, IO, Iterator, List
+)
 from kiwi_keg.exceptions import KegDataError
 from kiwi_keg.annotated_mapping import AnnotatedMapping, keg_dict
 
@@ -84,3 +87,107 @@ def get_merged_list(data: keg_dict, node_name: str) -> List:
         if key.startswith('_namespace'):
             result += get_merged_list(data[key], node_name)
     return result
+
+
+def get_key_path(data: keg_dict, key_path: str) -> Any:
+    """
+    Return the node of data found at given key path. Keys are separated
+    by dots, list items are selected by their index, e.g.
+    'image.preferences.0'.
+    """
+    node = data
+    for key in key_path.split('.'):
+        if isinstance(node, (dict, AnnotatedMapping)) and key in node:
+            node = node[key]
+        elif isinstance(node, list) and key.isdigit() and int(key) < len(node):
+            node = node[int(key)]
+        else:
+            raise KegDataError(
+                'Key path {} not found, {!r} does not exist'.format(key_path, key)
+            )
+    return node
+
+
+def dump_json(data: Any, stream: IO[str], annotations: bool = False) -> None:
+    """
+    Write data as JSON to stream, one node at a time
+
+    :param data: data to dump
+    :param stream: text stream to write to
+    :param bool annotations: include source annotations of AnnotatedMapping
+    """
+    for chunk in _iter_json(data, annotations, 0):
+        stream.write(chunk)
+    stream.write('\n')
+
+
+def dump_yaml(data: Any, stream: IO[str], annotations: bool = False) -> None:
+    """
+    Write data as YAML to stream, one node at a time
+
+    :param data: data to dump
+    :param stream: text stream to write to
+    :param bool annotations: include source annotations of AnnotatedMapping
+    """
+    import yaml
+    dumper = yaml.SafeDumper(stream, sort_keys=False)
+    dumper.emit(yaml.StreamStartEvent())
+    dumper.emit(yaml.DocumentStartEvent(explicit=False))
+    _emit_yaml(dumper, data, annotations)
+    dumper.emit(yaml.DocumentEndEvent(explicit=False))
+    dumper.emit(yaml.StreamEndEvent())
+
+
+def _get_items(data: Any, annotations: bool) -> Iterator:
+    if isinstance(data, AnnotatedMapping) and annotations:
+        return data.all_items()
+    return iter(data.items())
+
+
+def _iter_json(data: Any, annotations: bool, level: int) -> Iterator[str]:
+    if isinstance(data, (dict, AnnotatedMapping)):
+        items = ((json.dumps(str(key)) + ': ', value) for key, value in _get_items(data, annotations))
+        yield from _iter_json_container(items, '{}', annotations, level)
+    elif isinstance(data, (list, tuple)):
+        yield from _iter_json_container((('', value) for value in data), '[]', annotations, level)
+    else:
+        yield json.dumps(data, default=str)
+
+
+def _iter_json_container(items: Iterator, brackets: str, annotations: bool, level: int) -> Iterator[str]:
+    indent = '\n' + '  ' * (level + 1)
+    separator = brackets[0]
+    for prefix, value in items:
+        yield separator + indent + prefix
+        yield from _iter_json(value, annotations, level + 1)
+        separator = ','
+    if separator == ',':
+        yield '\n' + '  ' * level + brackets[1]
+    else:
+        yield brackets
+
+
+def _emit_yaml(dumper, data: Any, annotations: bool) -> None:
+    import yaml
+    if isinstance(data, (dict, AnnotatedMapping)):
+        dumper.emit(yaml.MappingStartEvent(None, None, True, flow_style=False))
+        for key, value in _get_items(data, annotations):
+            _emit_yaml(dumper, key, annotations)
+            _emit_yaml(dumper, value, annotations)
+        dumper.emit(yaml.MappingEndEvent())
+    elif isinstance(data, (list, tuple)):
+        dumper.emit(yaml.SequenceStartEvent(None, None, True, flow_style=False))
+        for value in data:
+            _emit_yaml(dumper, value, annotations)
+        dumper.emit(yaml.SequenceEndEvent())
+    else:
+        try:
+            node = dumper.represent_data(data)
+        except yaml.representer.RepresenterError:
+            node = dumper.represent_data(str(data))
+        # same tag resolution as yaml.serializer.Serializer
+        implicit = (
+            node.tag == dumper.resolve(yaml.ScalarNode, node.value, (True, False)),
+            node.tag == dumper.resolve(yaml.ScalarNode, node.value, (False, True))
+        )
+        dumper.emit(yaml.ScalarEvent(None, node.tag, implicit, node.value, style=node.style))
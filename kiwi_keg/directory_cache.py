@@ -0,0 +1,93 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+import os
+from typing import (
+    Dict, List, NamedTuple, Optional
+)
+
+
+class DirectoryEntry(NamedTuple):
+    is_dir: bool
+    is_file: bool
+
+
+class DirectoryCache:
+    """
+    Cache of directory listings for path lookups in the recipes tree.
+
+    Every directory is scanned once on first access, existence checks
+    for paths in it are answered from the listing afterwards. The cache
+    assumes the recipes do not change while keg is running.
+    """
+    def __init__(self):
+        self._listings: Dict[str, Dict[str, DirectoryEntry]] = {}
+
+    def list_dir(self, path: str) -> Dict[str, DirectoryEntry]:
+        """
+        Return entries of given directory by name, empty if the directory
+        does not exist
+
+        :param: str path: directory path
+        """
+        path = os.path.normpath(path)
+        listing = self._listings.get(path)
+        if listing is None:
+            listing = {}
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        listing[entry.name] = DirectoryEntry(entry.is_dir(), entry.is_file())
+            except OSError:
+                pass
+            self._listings[path] = listing
+        return listing
+
+    def get_entry(self, path: str) -> Optional[DirectoryEntry]:
+        """
+        Return type information of path, None if it does not exist
+
+        :param: str path: file or directory path
+        """
+        parent, name = os.path.split(os.path.normpath(path))
+        if name in ('', os.curdir, os.pardir):
+            # no parent listing to look at, e.g. for '/' or '..'
+            return DirectoryEntry(True, False) if os.path.isdir(path) else None
+        return self.list_dir(parent or os.curdir).get(name)
+
+    def exists(self, path: str) -> bool:
+        """
+        Return True if path exists
+
+        :param: str path: file or directory path
+        """
+        return self.get_entry(path) is not None
+
+    def find_file(self, dirs: List[str], file_name: str) -> Optional[str]:
+        """
+        Return path of file_name in the last of the given directories
+        containing it
+
+        :param: list dirs: directories to look in
+        :param: str file_name: name of the file
+        """
+        file_path = None
+        for directory in dirs:
+            entry = self.list_dir(directory).get(file_name)
+            if entry and entry.is_file:
+                file_path = os.path.join(directory, file_name)
+        return file_path
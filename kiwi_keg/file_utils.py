@@ -19,7 +19,7 @@ import logging
 from glob import glob
 from pathlib import Path
 from typing import (
-    List, Dict, Union, Type
+    Any, List, Dict, Optional, Set, Tuple, Union, Type
 )
 import os
 import collections.abc
@@ -27,6 +27,7 @@ import yaml
 from kiwi_keg import dict_utils
 from kiwi_keg.exceptions import KegError
 from kiwi_keg.annotated_mapping import AnnotatedMapping, keg_dict
+from kiwi_keg.recipes_cache import RecipesCache
 
 log = logging.getLogger('keg')
 
@@ -84,7 +85,8 @@ class SafeTrackerLoader(yaml.loader.SafeLoader):
 
 
 def get_recipes(
-    roots: List[str], sub_dirs: List[str], include_paths: List[str] = [], track_sources: bool = False
+    roots: List[str], sub_dirs: List[str], include_paths: List[str] = [], track_sources: bool = False,
+    cache: Optional[RecipesCache] = None
 ) -> keg_dict:
     """
     Return a new yaml tree including the data of all the source files for
@@ -93,12 +95,20 @@ def get_recipes(
     :param: list roots: list of root directory paths to get the files from
     :param: str sub_dir: subdirectory path to get the files from
     :param: list include_paths: list of paths to be included
+    :param: RecipesCache cache: optional cache for file lists and parsed data
     """
     desc_files = []
     for sub_dir in sub_dirs:
-        desc_files += _get_source_files(
-            roots, sub_dir, 'yaml', include_paths
-        )
+        if cache:
+            desc_files += cache.get(
+                'source_files',
+                (tuple(roots), sub_dir, 'yaml', tuple(include_paths or [])),
+                lambda: _get_source_files(roots, sub_dir, 'yaml', include_paths)
+            )
+        else:
+            desc_files += _get_source_files(
+                roots, sub_dir, 'yaml', include_paths
+            )
     merged_tree: Union[Dict[str, str], AnnotatedMapping]
     yaml_loader: Union[Type[yaml.SafeLoader], Type[SafeTrackerLoader]]
     if track_sources:
@@ -110,14 +120,89 @@ def get_recipes(
     files_read = []
     for desc_file in desc_files:
         if desc_file not in files_read:
-            log.debug(f'Reading: {desc_file}')
-            with open(desc_file, 'r') as f:
-                desc_yaml = yaml.load(f, Loader=yaml_loader)
+            if cache:
+                desc_yaml = cache.load_yaml(desc_file, yaml_loader)
+            else:
+                log.debug(f'Reading: {desc_file}')
+                with open(desc_file, 'r') as f:
+                    desc_yaml = yaml.load(f, Loader=yaml_loader)
             dict_utils.rmerge(desc_yaml, merged_tree)
             files_read.append(desc_file)
     return merged_tree
 
 
+def get_recipes_header(
+    roots: List[str], sub_dirs: List[str], spec: Dict[str, Any], required: List[Tuple[str, ...]],
+    include_paths: List[str] = []
+) -> Dict:
+    """
+    Return a new yaml tree containing only the keys selected by spec from
+    all the source files for a given list of root directories and sub
+    directories.
+
+    The files are read with the YAML event parser. Values of keys not
+    selected by spec are skipped without being constructed and reading
+    a file stops as soon as all required keys have been found in it.
+
+    :param: list roots: list of root directory paths to get the files from
+    :param: list sub_dirs: subdirectory paths to get the files from
+    :param: dict spec: nested dict of wanted keys; a value of None selects
+        the complete value of the key, a dict selects sub keys of a mapping
+    :param: list required: key paths (tuples) after which reading a file
+        can stop, e.g. [('image', 'description')]
+    :param: list include_paths: list of paths to be included
+    """
+    desc_files = []
+    for sub_dir in sub_dirs:
+        desc_files += _get_source_files(
+            roots, sub_dir, 'yaml', include_paths
+        )
+    merged_tree: Dict = {}
+    for desc_file in dict.fromkeys(desc_files):
+        log.debug(f'Reading header: {desc_file}')
+        header = _read_yaml_header(desc_file, spec, required)
+        if header:
+            dict_utils.rmerge(header, merged_tree)
+    return merged_tree
+
+
+def preload_recipes(
+    cache: RecipesCache, roots: List[str], image_names: List[str], track_sources: bool = False
+) -> None:
+    """
+    Populate cache with the source file index and the parsed YAML data of
+    the given images and all data files of the given recipes roots.
+
+    :param: RecipesCache cache: cache to populate
+    :param: list roots: list of recipes root directories
+    :param: list image_names: image sources relative to the images directories
+    :param: bool track_sources: parse with source tracking enabled
+    """
+    yaml_loader: Union[Type[yaml.SafeLoader], Type[SafeTrackerLoader]]
+    yaml_loader = SafeTrackerLoader if track_sources else yaml.SafeLoader
+    image_roots = [os.path.join(x, 'images') for x in roots]
+    for image_name in image_names:
+        desc_files = cache.get(
+            'source_files',
+            (tuple(image_roots), image_name, 'yaml', ()),
+            lambda: _get_source_files(image_roots, image_name, 'yaml', [])
+        )
+        cache.preload_yaml(desc_files, yaml_loader)
+    for data_root in [os.path.join(x, 'data') for x in roots]:
+        for dirpath, dirnames, filenames in os.walk(data_root):
+            if dirpath == data_root:
+                if 'overlayfiles' in dirnames:
+                    dirnames.remove('overlayfiles')
+                # get_recipes reads these files through the '.' parent of
+                # the include paths, parse them under the same name so the
+                # tracked source paths do not depend on preloading
+                dirpath = os.path.join(dirpath, '.')
+            cache.preload_yaml(
+                [os.path.join(dirpath, x) for x in sorted(filenames) if x.endswith('.yaml')],
+                yaml_loader
+            )
+
+
 def load_scripts(
     roots: List[str], sub_dir: str, include_paths: List[str] = []
 ) -> Dict[str, str]:
@@ -149,6 +234,31 @@ def load_scripts(
     return script_lib
 
 
+def get_source_dirs(
+    roots: List[str], sub_dir: str, include_paths: List[str] = []
+) -> List[str]:
+    """
+    Return the list of directories scanned for source files of a given
+    sub directory, i.e. the sub directory, its parents and the include
+    paths below each of them, for all given roots.
+
+    :param: list roots: list of root directory paths
+    :param: str sub_dir: subdirectory path
+    :param: list include_paths: list of paths to be included
+    """
+    src_dirs = []
+    for root_dir in roots:
+        for src_dir in [sub_dir] + [str(x) for x in Path(sub_dir).parents]:
+            current_dir = os.path.join(root_dir, src_dir)
+            src_dirs.append(current_dir)
+            for include_path in include_paths or []:
+                include_dir = current_dir
+                for level_down in Path(include_path).parts:
+                    include_dir = os.path.join(include_dir, level_down)
+                    src_dirs.append(include_dir)
+    return list(dict.fromkeys(src_dirs))
+
+
 def get_all_leaf_dirs(base_dir: str) -> List[str]:
     """
     Return a list of leaf directories of a given path.
@@ -160,6 +270,14 @@ def get_all_leaf_dirs(base_dir: str) -> List[str]:
     return [x[0][strip_offset:] for x in walker if not x[1]]
 
 
+def get_cache_dir() -> str:
+    """
+    Return default directory for keg's persistent caches
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'keg')
+
+
 def raise_on_file_exists(fpath: str, overwrite: bool):
     """
     Raise error if given path exists and overwrite is False.
@@ -173,6 +291,91 @@ def raise_on_file_exists(fpath: str, overwrite: bool):
         )
 
 
+class _HeaderReader:
+    """
+    Extract selected keys from a YAML document by walking its event stream
+    """
+    def __init__(self, loader: yaml.SafeLoader, required: List[Tuple[str, ...]]):
+        self.loader = loader
+        self.pending: Set[Tuple[str, ...]] = set(required)
+
+    def read_mapping(self, spec: Dict[str, Any], path: Tuple[str, ...] = ()) -> Dict:
+        loader = self.loader
+        result: Dict = {}
+        loader.get_event()
+        while not loader.check_event(yaml.MappingEndEvent):
+            if not self.pending:
+                return result
+            key = loader.construct_object(self.compose_node())
+            if not isinstance(key, str) or key not in spec:
+                self.skip_node()
+            elif isinstance(spec[key], dict) and loader.check_event(yaml.MappingStartEvent):
+                result[key] = self.read_mapping(spec[key], path + (key,))
+            else:
+                node = self.compose_node()
+                result[key] = loader.construct_object(node, deep=True)
+                self._resolve(path + (key,))
+        loader.get_event()
+        # anything still missing below this mapping cannot appear anymore
+        self._resolve(path)
+        return result
+
+    def compose_node(self) -> Optional[yaml.Node]:
+        # compose_document passes no parent and index for a root node as
+        # well, the type stubs only allow an int index
+        return self.loader.compose_node(None, None)  # type: ignore[arg-type]
+
+    def skip_node(self) -> None:
+        depth = 0
+        while True:
+            event = self.loader.get_event()
+            if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                depth += 1
+            elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                depth -= 1
+            if depth == 0:
+                return
+
+    def _resolve(self, path: Tuple[str, ...]) -> None:
+        self.pending = set(
+            x for x in self.pending if x[:len(path)] != path
+        )
+
+
+def _read_yaml_header(desc_file: str, spec: Dict[str, Any], required: List[Tuple[str, ...]]) -> Dict:
+    with open(desc_file, 'r') as f:
+        loader = yaml.SafeLoader(f)
+        try:
+            loader.get_event()
+            if not loader.check_event(yaml.DocumentStartEvent):
+                return {}
+            loader.get_event()
+            if not loader.check_event(yaml.MappingStartEvent):
+                return {}
+            return _HeaderReader(loader, required).read_mapping(spec)
+        except yaml.composer.ComposerError:
+            # e.g. alias referring to an anchor in a skipped value
+            log.debug(f'Falling back to full parse of {desc_file}')
+        finally:
+            loader.dispose()
+    with open(desc_file, 'r') as f:
+        return _filter_tree(yaml.load(f, Loader=yaml.SafeLoader), spec)
+
+
+def _filter_tree(data: Any, spec: Dict[str, Any]) -> Dict:
+    result: Dict = {}
+    if not isinstance(data, dict):
+        return result
+    for key, sub_spec in spec.items():
+        if key not in data:
+            continue
+        if isinstance(sub_spec, dict) and isinstance(data[key], dict):
+            result[key] = _filter_tree(data[key], sub_spec)
+        else:
+            result[key] = data[key]
+    return result
+
+
 def _get_source_files(roots, sub_dir, ext, include_paths):
     src_files = []
     for root_dir in roots:
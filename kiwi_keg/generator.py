@@ -16,11 +16,9 @@
 # along with keg. If not, see <http://www.gnu.org/licenses/>
 #
 import logging
-from jinja2 import Environment, FileSystemLoader, ChoiceLoader
 from typing import Optional
 import os
 import shutil
-import tarfile
 from collections import OrderedDict
 from xml.sax.saxutils import XMLGenerator
 from xml.sax.xmlreader import AttributesImpl
@@ -28,13 +26,14 @@ from xml.sax.xmlreader import AttributesImpl
 from kiwi_keg import file_utils
 from kiwi_keg.image_definition import KegImageDefinition
 from kiwi_keg.kiwi_description import KiwiDescription
+from kiwi_keg.recipes_cache import RecipesCache
+from kiwi_keg.validation_cache import ValidationCache
+from kiwi_keg import profiler as prof
 from kiwi_keg.exceptions import (
     KegError,
     KegDataError
 )
 
-from jinja2.exceptions import TemplateNotFound
-
 log = logging.getLogger('keg')
 
 
@@ -44,9 +43,11 @@ class KegGenerator:
 
     :param object image_definition: Instance of KegImageDefinition
     :param str dest_dir: Destination directory
+    :param object cache: Optional RecipesCache to share templates with
     """
     def __init__(
-        self, image_definition: KegImageDefinition, dest_dir: str, archs: list = [], gen_profiles_comment=True
+        self, image_definition: KegImageDefinition, dest_dir: str, archs: list = [], gen_profiles_comment=True,
+        cache: Optional[RecipesCache] = None
     ):
         if not os.path.isdir(dest_dir):
             raise KegError(
@@ -67,12 +68,14 @@ class KegGenerator:
         self.dest_dir: str = dest_dir
         self.archs = archs
         self.gen_profiles_comment = gen_profiles_comment
-        loaders = []
-        for root in reversed(image_definition.recipes_roots):
-            loaders.append(FileSystemLoader(os.path.join(root, 'schemas')))
-        self.env = Environment(
-            loader=ChoiceLoader(loaders)
-        )
+        if cache:
+            self.env = cache.get(
+                'template_env',
+                tuple(image_definition.recipes_roots),
+                lambda: self._create_template_env(image_definition.recipes_roots)
+            )
+        else:
+            self.env = self._create_template_env(image_definition.recipes_roots)
         self.filter_def = {}
         if self.archs:
             self.filter_def = {'arch': self.archs}
@@ -80,18 +83,21 @@ class KegGenerator:
         self.image_definition.populate()
 
         self.image_schema: Optional[str] = self.image_definition.data.get('schema')
+        self._kiwi: Optional[KiwiDescription] = None
 
     def create_kiwi_description(self, overwrite: bool = False) -> None:
         file_utils.raise_on_file_exists(self.kiwi_description, overwrite)
-        if not self.image_schema:
-            self.create_xml_description()
-        else:
-            log.info(
-                'Using KIWI schema: {keg_schema}'.format(
-                    keg_schema=self.image_schema
+        self._kiwi = None
+        with prof.profiler.phase(prof.PHASE_DESCRIPTION_RENDERING):
+            if not self.image_schema:
+                self.create_xml_description()
+            else:
+                log.info(
+                    'Using KIWI schema: {keg_schema}'.format(
+                        keg_schema=self.image_schema
+                    )
                 )
-            )
-            self.create_template_description()
+                self.create_template_description()
 
     def create_template_description(self) -> None:
         """
@@ -142,13 +148,33 @@ class KegGenerator:
             self._create_xml_node('image', self.image_definition.data['image'], content_handler, filter_attributes=self.filter_def)
             content_handler.endDocument()
 
-    def validate_kiwi_description(self) -> None:
-        kiwi = KiwiDescription(self.kiwi_description)
-        kiwi.validate_description()
+    def validate_kiwi_description(self, cache: Optional[ValidationCache] = None) -> None:
+        """
+        Validate the KIWI description with kiwi.
+
+        :param object cache:
+            Optional ValidationCache, validation is skipped if the
+            description did not change since it was last validated
+        """
+        with prof.profiler.phase(prof.PHASE_KIWI_VALIDATION):
+            if cache:
+                cache.validate(self.kiwi_description, self._validate_kiwi_description)
+            else:
+                self._validate_kiwi_description()
+
+    def _validate_kiwi_description(self) -> None:
+        self._get_kiwi_description().validate_description()
+
+    def _get_kiwi_description(self) -> KiwiDescription:
+        # one KiwiDescription per generated description, so validating
+        # and formatting share a single kiwi load
+        if self._kiwi is None:
+            self._kiwi = KiwiDescription(self.kiwi_description)
+        return self._kiwi
 
     def format_kiwi_description(self, markup: str = 'xml') -> None:
         supported_markup_languages = ['xml', 'yaml']
-        kiwi = KiwiDescription(self.kiwi_description)
+        kiwi = self._get_kiwi_description()
         if markup not in supported_markup_languages:
             raise KegError(
                 'Unsupported markup type: {name}'.format(name=markup)
@@ -159,10 +185,11 @@ class KegGenerator:
         log.info(
             f'--> Writing description in {markup!r} markup'
         )
-        if markup == 'xml':
-            kiwi.create_XML_description(self.kiwi_description)
-        if markup == 'yaml':
-            kiwi.create_YAML_description(self.kiwi_description)
+        with prof.profiler.phase(prof.PHASE_KIWI_VALIDATION):
+            if markup == 'xml':
+                kiwi.create_XML_description(self.kiwi_description)
+            if markup == 'yaml':
+                kiwi.create_YAML_description(self.kiwi_description)
 
     def create_custom_scripts(self, overwrite: bool = False):
         """
@@ -171,23 +198,24 @@ class KegGenerator:
         :param bool overwrite:
             Overwrite destination contents, default is: False
         """
-        if self.image_definition.config_script:
-            log.debug('Generating config.sh')
-            file_utils.raise_on_file_exists(self.kiwi_config_script, overwrite)
-            self._write_custom_script(
-                self.kiwi_config_script,
-                self.image_definition.config_script,
-                'config_sh_header.templ'
-            )
+        with prof.profiler.phase(prof.PHASE_SCRIPT_GENERATION):
+            if self.image_definition.config_script:
+                log.debug('Generating config.sh')
+                file_utils.raise_on_file_exists(self.kiwi_config_script, overwrite)
+                self._write_custom_script(
+                    self.kiwi_config_script,
+                    self.image_definition.config_script,
+                    'config_sh_header.templ'
+                )
 
-        if self.image_definition.images_script:
-            log.debug('Generating images.sh')
-            file_utils.raise_on_file_exists(self.kiwi_images_script, overwrite)
-            self._write_custom_script(
-                self.kiwi_images_script,
-                self.image_definition.images_script,
-                'images_sh_header.templ'
-            )
+            if self.image_definition.images_script:
+                log.debug('Generating images.sh')
+                file_utils.raise_on_file_exists(self.kiwi_images_script, overwrite)
+                self._write_custom_script(
+                    self.kiwi_images_script,
+                    self.image_definition.images_script,
+                    'images_sh_header.templ'
+                )
 
     def create_overlays(self,
                         disable_root_tar: bool = False,
@@ -206,29 +234,32 @@ class KegGenerator:
         """
         if not self.image_definition.archives:
             return
-        for archive_name, dir_list in self.image_definition.archives.items():
-            if archive_name.startswith('root.') and disable_root_tar:
-                overlay_dest_dir = os.path.join(self.dest_dir, 'root')
-                if os.path.exists(overlay_dest_dir):
-                    if not overwrite:
-                        raise KegError(
-                            '{target} exists, use force to overwrite.'.format(
-                                target=overlay_dest_dir
+        import tarfile
+        with prof.profiler.phase(prof.PHASE_OVERLAY_PACKING), \
+                prof.profiler.memory(prof.PHASE_OVERLAY_PACKING):
+            for archive_name, dir_list in self.image_definition.archives.items():
+                if archive_name.startswith('root.') and disable_root_tar:
+                    overlay_dest_dir = os.path.join(self.dest_dir, 'root')
+                    if os.path.exists(overlay_dest_dir):
+                        if not overwrite:
+                            raise KegError(
+                                '{target} exists, use force to overwrite.'.format(
+                                    target=overlay_dest_dir
+                                )
                             )
-                        )
-                    shutil.rmtree(overlay_dest_dir)
-                os.makedirs(overlay_dest_dir)
-                for base_dir in dir_list:
-                    self._copytree(base_dir, overlay_dest_dir)
-            else:
-                overlay_tarball_path = os.path.join(
-                    self.dest_dir,
-                    archive_name
-                )
-                compression = archive_name.split('.')[-1]
-                with tarfile.open(overlay_tarball_path, f'w:{compression}') as tar:  # type: ignore
+                        shutil.rmtree(overlay_dest_dir)
+                    os.makedirs(overlay_dest_dir)
                     for base_dir in dir_list:
-                        self._add_dir_to_tar(tar, base_dir)
+                        self._copytree(base_dir, overlay_dest_dir)
+                else:
+                    overlay_tarball_path = os.path.join(
+                        self.dest_dir,
+                        archive_name
+                    )
+                    compression = archive_name.split('.')[-1]
+                    with tarfile.open(overlay_tarball_path, f'w:{compression}') as tar:  # type: ignore
+                        for base_dir in dir_list:
+                            self._add_dir_to_tar(tar, base_dir)
 
     def create_multibuild_file(self, overwrite: bool = False):
         profiles = self.image_definition.get_build_profile_names()
@@ -251,6 +282,16 @@ class KegGenerator:
             for custom_file in self.image_definition.data['xmlfiles']:
                 self._write_xml_file(custom_file, overwrite)
 
+    @staticmethod
+    def _create_template_env(recipes_roots):
+        from jinja2 import Environment, FileSystemLoader, ChoiceLoader
+        loaders = []
+        for root in reversed(recipes_roots):
+            loaders.append(FileSystemLoader(os.path.join(root, 'schemas')))
+        return Environment(
+            loader=ChoiceLoader(loaders)
+        )
+
     @staticmethod
     def _tarinfo_set_root(tarinfo):
         tarinfo.uid = tarinfo.gid = 0
@@ -296,6 +337,7 @@ class KegGenerator:
             custom_script.write(content)
 
     def _read_template(self, template_name):
+        from jinja2.exceptions import TemplateNotFound
         try:
             return self.env.get_template(
                 template_name
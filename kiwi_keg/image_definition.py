@@ -17,25 +17,44 @@
 #
 import logging
 import os
+import pickle
 from typing import (
-    List, Optional
+    List, Optional, Tuple
 )
 from datetime import (
     datetime, timezone
 )
-from schema import SchemaError
-
 # project
 from kiwi_keg import dict_utils
 from kiwi_keg import file_utils
 from kiwi_keg import script_utils
 from kiwi_keg import version
+from kiwi_keg.directory_cache import DirectoryCache
 from kiwi_keg.exceptions import KegDataError
+from kiwi_keg.profile_graph import ProfileGraph
 from kiwi_keg.annotated_mapping import AnnotatedMapping, keg_dict, keg_dict_type
-from kiwi_keg.image_schema import ImageSchema
+from kiwi_keg.recipes_cache import RecipesCache
+from kiwi_keg import profiler as prof
 
 log = logging.getLogger('keg')
 
+SNAPSHOT_VERSION = 1
+
+# Keys read by populate_header; values of all other keys are skipped
+HEADER_SPEC = {
+    'image': {
+        '_attributes': None,
+        'description': None,
+        'preferences': None
+    },
+    'include-paths': None
+}
+HEADER_REQUIRED: List[Tuple[str, ...]] = [
+    ('image', '_attributes'),
+    ('image', 'description'),
+    ('image', 'preferences')
+]
+
 
 class KegImageDefinition:
     """
@@ -47,10 +66,14 @@ class KegImageDefinition:
         recipes_roots: List[str],
         image_version: Optional[str] = None,
         archive_ext: str = 'tar.gz',
-        track_sources: bool = False
+        track_sources: bool = False,
+        cache: Optional[RecipesCache] = None
     ):
         """
         Init ImageDefintion with image_name and recipes root path
+
+        An optional RecipesCache can be passed to share parsed recipes
+        data between several image definitions.
         """
         self._recipes_roots = recipes_roots
         self._image_name = image_name
@@ -60,6 +83,10 @@ class KegImageDefinition:
         self._overlay_roots = [os.path.join(x, 'data', 'overlayfiles') for x in recipes_roots]
         self._archive_ext = archive_ext
         self._track_sources = track_sources
+        self._cache = cache
+        # directory listings used for include, overlay and script lookups,
+        # shared by all image definitions of a batch run
+        self._dir_cache: DirectoryCache = cache.get('directory_cache', (), DirectoryCache) if cache else DirectoryCache()
         self._dict_type: keg_dict_type
         self._data: keg_dict
         if self._track_sources:
@@ -69,6 +96,10 @@ class KegImageDefinition:
         self._data = self._dict_type({})
         self._config_script = None
         self._images_script = None
+        self._source_dirs: List[str] = []
+        self._profile_graph: Optional[ProfileGraph] = None
+        self._populated = False
+        self._restored = False
         self._check_recipes_paths_exist()
         self._check_image_path_exists()
 
@@ -96,6 +127,27 @@ class KegImageDefinition:
     def image_roots(self) -> List[str]:
         return self._image_roots
 
+    @property
+    def source_dirs(self) -> List[str]:
+        """
+        Directories scanned for recipes files by the last populate call
+        """
+        return self._source_dirs
+
+    @property
+    def dir_cache(self) -> DirectoryCache:
+        return self._dir_cache
+
+    @property
+    def profile_graph(self) -> ProfileGraph:
+        """
+        Dependency graph of the image profiles, built and checked for
+        cycles by populate
+        """
+        if self._profile_graph is None:
+            self._profile_graph = ProfileGraph.from_profiles(self.get_profiles())
+        return self._profile_graph
+
     @property
     def archives(self) -> Optional[keg_dict]:
         return self._data.get('archives')
@@ -111,7 +163,18 @@ class KegImageDefinition:
     def populate(self) -> None:
         """
         Parse recipes data and construct wanted image definition
+
+        An image definition restored by load_snapshot is populated
+        already, populate does nothing in that case.
         """
+        if self._restored:
+            return
+        with prof.profiler.memory(prof.PHASE_POPULATE):
+            self._populate()
+
+    def _populate(self) -> None:
+        from schema import SchemaError
+        from kiwi_keg.image_schema import ImageSchema
         utc_now = datetime.now(timezone.utc)
         utc_now_str = utc_now.strftime("%Y-%m-%d %H:%M:%S")
         self._data = self._dict_type({
@@ -120,10 +183,14 @@ class KegImageDefinition:
             'image_source_path': '{}'.format(self.image_name),
             'archives': {}
         })
+        self._populated = False
+        self._profile_graph = None
+        self._source_dirs = file_utils.get_source_dirs(self.image_roots, self.image_name)
         try:
-            img_dict = file_utils.get_recipes(
-                self.image_roots, [self.image_name], track_sources=self._track_sources
-            )
+            with prof.profiler.phase(prof.PHASE_RECIPE_LOADING):
+                img_dict = file_utils.get_recipes(
+                    self.image_roots, [self.image_name], track_sources=self._track_sources, cache=self._cache
+                )
             self._data.update(img_dict)
         except Exception as issue:
             raise KegDataError(
@@ -131,14 +198,18 @@ class KegImageDefinition:
             )
 
         try:
-            self._expand_includes(self._data)
+            with prof.profiler.phase(prof.PHASE_INCLUDE_EXPANSION):
+                self._expand_includes(self._data)
             if self._image_version:
                 if isinstance(self._data['image']['preferences'], list):
                     self._data['image']['preferences'][0]['version'] = self._image_version
                 else:
                     self._data['image']['preferences']['version'] = self._image_version
-            ImageSchema().validate(self._data)
-            self._generate_config_scripts()
+            with prof.profiler.phase(prof.PHASE_SCHEMA_VALIDATION), \
+                    prof.profiler.memory(prof.PHASE_SCHEMA_VALIDATION):
+                ImageSchema().validate(self._data)
+            with prof.profiler.phase(prof.PHASE_SCRIPT_GENERATION):
+                self._generate_config_scripts()
             self._generate_overlay_info()
             self._check_archive_refs()
         except SchemaError as err:
@@ -147,16 +218,95 @@ class KegImageDefinition:
             raise KegDataError(
                 'Error generating profile data: {error}'.format(error=issue)
             )
+        self._profile_graph = ProfileGraph.from_profiles(self.get_profiles())
+        self._profile_graph.check()
+        self._populated = True
+
+    def save_snapshot(self, snapshot_file: str) -> None:
+        """
+        Write the populated image definition to snapshot_file
+
+        The snapshot contains the data including source annotations,
+        the generated config and images scripts and the archive directory
+        lists, so a KegGenerator or SourceInfoGenerator in another process
+        can use it without populating again. It is written with pickle,
+        only load snapshots from trusted locations.
+
+        :param str snapshot_file: path of the snapshot file
+        """
+        if not self._populated:
+            raise KegDataError(
+                'Image definition {} is not populated, populate it before writing a snapshot'.format(
+                    self.image_name
+                )
+            )
+        state = dict(self.__dict__)
+        # the caches belong to the process that populated the definition
+        state['_cache'] = None
+        state['_dir_cache'] = DirectoryCache()
+        with open(snapshot_file, 'wb') as snapshot:
+            pickle.dump(
+                {'version': SNAPSHOT_VERSION, 'keg': version.__version__, 'state': state},
+                snapshot,
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+    @classmethod
+    def load_snapshot(cls, snapshot_file: str) -> 'KegImageDefinition':
+        """
+        Return image definition restored from snapshot_file written by
+        save_snapshot of the same keg version
+
+        :param str snapshot_file: path of the snapshot file
+        """
+        try:
+            with open(snapshot_file, 'rb') as snapshot:
+                content = pickle.load(snapshot)
+        except Exception as issue:
+            raise KegDataError(
+                'Error reading image definition snapshot {}: {}'.format(snapshot_file, issue)
+            )
+        if not isinstance(content, dict) or content.get('version') != SNAPSHOT_VERSION \
+                or content.get('keg') != version.__version__:
+            raise KegDataError(
+                'Image definition snapshot {} was not written by keg {}'.format(
+                    snapshot_file, version.__version__
+                )
+            )
+        image_definition = cls.__new__(cls)
+        image_definition.__dict__.update(content['state'])
+        image_definition._restored = True
+        return image_definition
 
     def populate_header(self) -> None:
         """
         Parse recipes data but only expand 'image: description'.
         Used by list command for faster operation.
+
+        Without source tracking, only the image attributes, description
+        and preferences are extracted from the recipes files by an event
+        based YAML parser that stops reading a file as soon as these keys
+        have been found.
         """
+        self._source_dirs = file_utils.get_source_dirs(self.image_roots, self.image_name)
         try:
-            img_dict = file_utils.get_recipes(
-                self.image_roots, [self.image_name], track_sources=self._track_sources
-            )
+            if self._track_sources:
+                img_dict = file_utils.get_recipes(
+                    self.image_roots, [self.image_name], track_sources=self._track_sources, cache=self._cache
+                )
+            else:
+                img_dict = file_utils.get_recipes_header(
+                    self.image_roots, [self.image_name], HEADER_SPEC, HEADER_REQUIRED
+                )
+                if 'include-paths' not in img_dict and self._has_include(img_dict['image']['description']):
+                    # include-paths may follow the header keys, read all
+                    # files completely for this key only
+                    img_dict.update(
+                        file_utils.get_recipes_header(
+                            self.image_roots, [self.image_name],
+                            {'include-paths': None}, [('include-paths',)]
+                        )
+                    )
             self._data.update(img_dict)
             self._expand_includes(self._data['image']['description'])
         except Exception as issue:
@@ -181,16 +331,10 @@ class KegImageDefinition:
         return list(dict.fromkeys(profiles).keys())
 
     def get_base_profile_names(self, profile_name: str) -> List[str]:
-        base_profile_names = []
-        profiles = self.get_profiles()
-        for p in profiles:
-            if dict_utils.get_attribute(p, 'name') == profile_name:
-                requires = p.get('requires', [])
-                if not isinstance(requires, list):
-                    requires = [requires]
-                for r in requires:
-                    base_profile_names += [dict_utils.get_attribute(r, 'profile')]
-        return base_profile_names
+        """
+        Return names of the profiles directly required by profile_name
+        """
+        return self.profile_graph.get_requires(profile_name)
 
     def _check_recipes_paths_exist(self):
         for recipes_root in self._recipes_roots:
@@ -224,6 +368,13 @@ class KegImageDefinition:
                     if arch_name not in self._data.get('archives', []):
                         log.warning(f'Referenced archive "{arch_name}" not defined')
 
+    def _has_include(self, data):
+        if isinstance(data, list):
+            return any(self._has_include(x) for x in data)
+        if not isinstance(data, dict):
+            return False
+        return '_include' in data or any(self._has_include(x) for x in data.values())
+
     def _expand_includes(self, data, key=None):
         if not hasattr(data, '__iter__') or isinstance(data, str):
             return
@@ -243,14 +394,16 @@ class KegImageDefinition:
             includes = [includes]
         if includes:
             for incl in includes:
-                include_exists = [os.path.exists(os.path.join(x, incl)) for x in self.data_roots]
+                self._source_dirs += file_utils.get_source_dirs(self.data_roots, incl, include_paths)
+                include_exists = [self._dir_cache.exists(os.path.join(x, incl)) for x in self.data_roots]
                 if True not in include_exists:
                     log.info(f'Include "{incl}" does not exist (still including parent directories)')
             incl_dict = file_utils.get_recipes(
                 self.data_roots,
                 includes,
                 include_paths,
-                self._track_sources
+                self._track_sources,
+                self._cache
             )
             if incl_dict.get(key):
                 dict_utils.rmerge(
@@ -262,18 +415,24 @@ class KegImageDefinition:
                 # preserve source info
                 node['__deleted__include'] = {}
 
-    def _generate_config_scripts(self):
-        script_dirs = [
+    def get_script_dirs(self) -> List[str]:
+        """
+        Return existing scripts directories of the data roots
+        """
+        return [
             os.path.join(x, 'scripts') for x in self._data_roots
-            if os.path.exists(os.path.join(x, 'scripts'))
+            if self._dir_cache.exists(os.path.join(x, 'scripts'))
         ]
+
+    def _generate_config_scripts(self):
+        script_dirs = self.get_script_dirs()
         if self._data.get('config'):
             self._config_script = script_utils.get_config_script(
-                self._data['config'], script_dirs
+                self._data['config'], script_dirs, self._cache, self._dir_cache
             )
         if self._data.get('setup'):
             self._images_script = script_utils.get_config_script(
-                self._data['setup'], script_dirs
+                self._data['setup'], script_dirs, self._cache, self._dir_cache
             )
 
     def _generate_overlay_info(self):
@@ -288,7 +447,7 @@ class KegImageDefinition:
         src_dir = None
         for data_root in self._data_roots:
             comp_dir = os.path.join(data_root, 'overlayfiles', overlay_module_name)
-            if os.path.exists(comp_dir):
+            if self._dir_cache.exists(comp_dir):
                 src_dir = comp_dir
         if not src_dir:
             raise KegDataError('No such overlay files module "{}"'.format(overlay_module_name))
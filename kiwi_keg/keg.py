@@ -18,19 +18,44 @@
 """
 
 Usage: keg (-l|--list-recipes) (-r RECIPES_ROOT|--recipes-root=RECIPES_ROOT)... [-v]
+           [-j JOBS] [--list-format=FORMAT] [--cache-dir=CACHE_DIR|--no-cache]
        keg (-r RECIPES_ROOT|--recipes-root=RECIPES_ROOT)...
            [--format-xml|--format-yaml] [--disable-root-tar]
-           [--disable-multibuild] [--dump-dict]
+           [--disable-multibuild]
+           [--dump-dict [--dump-format=FORMAT] [--dump-key=KEY_PATH]]
            [-i IMAGE_VERSION|--image-version=IMAGE_VERSION]
            [-d DEST_DIR] [-a ARCH]... [-fv]
+           [--profile] [--profile-memory] [--profile-trace=TRACE_FILE]
+           [--cache-dir=CACHE_DIR|--no-cache]
            [-s|--write-source-info] SOURCE
+       keg (-r RECIPES_ROOT|--recipes-root=RECIPES_ROOT)... --batch [-j JOBS]
+           [--format-xml|--format-yaml] [--disable-root-tar]
+           [--disable-multibuild]
+           [-i IMAGE_VERSION|--image-version=IMAGE_VERSION]
+           [-d DEST_DIR] [-a ARCH]... [-fv]
+           [--profile] [--profile-memory] [--profile-trace=TRACE_FILE]
+           [--cache-dir=CACHE_DIR|--no-cache]
+           [-s|--write-source-info] SOURCE...
        keg -h | --help
        keg --version
 
 Arguments:
-    SOURCE    Path to image source, expected under RECIPES_ROOT/images
+    SOURCE    Path to image source, expected under RECIPES_ROOT/images.
+              In batch mode, SOURCE may be given multiple times and may
+              contain glob patterns.
 
 Options:
+    --batch
+        Generate image descriptions for all images matching the given
+        SOURCE arguments in one run. Each description is written to
+        DEST_DIR/SOURCE. Parsed recipes data is shared between images,
+        errors in one image do not abort the others.
+
+    -j JOBS, --jobs=JOBS
+        Number of worker processes used to generate images in batch mode
+        or to read image headers for --list-recipes. In batch mode, recipes
+        data is parsed once before the workers are started. [default: 1]
+
     -r RECIPES_ROOT, --recipes-root=RECIPES_ROOT
         Root directory of keg recipes. Can be used more than once. Elements
         from later roots may overwrite earlier one.
@@ -51,9 +76,28 @@ Options:
         Dump generated data dictionary to stdout instead of generating an image
         description. Useful for debugging.
 
+    --dump-format=FORMAT
+        Output format for --dump-dict, 'pretty', 'json' or 'yaml'.
+        Source annotations are included if -s is given. [default: pretty]
+
+    --dump-key=KEY_PATH
+        Only dump the part of the data dictionary at KEY_PATH, keys separated
+        by dots, e.g. 'image.preferences.0'
+
     -l, --list-recipes
         List available images that can be created with the current recipes
 
+    --list-format=FORMAT
+        Output format for --list-recipes, 'text' or 'json' [default: text]
+
+    --cache-dir=CACHE_DIR
+        Directory for persistent caches, i.e. the KIWI validation results
+        and the image catalogue used by --list-recipes. Defaults to
+        $XDG_CACHE_HOME/keg or ~/.cache/keg.
+
+    --no-cache
+        Do not read or write persistent caches
+
     -f, --force
         Force mode (ignore errors, overwrite files)
 
@@ -72,6 +116,22 @@ Options:
         Generate image description for architecture ARCH (can be used
         multiple times)
 
+    --profile
+        Measure the time spent in the processing phases (recipe loading,
+        include expansion, schema validation, script generation, rendering,
+        KIWI validation, overlay packing, source info writing) and print a
+        summary table to stderr when done.
+
+    --profile-memory
+        Like --profile, additionally trace memory allocations and report
+        peak and retained memory and the top allocation sites of populating
+        the image definition, schema validation, overlay packing and source
+        info writing. Slows down processing considerably.
+
+    --profile-trace=TRACE_FILE
+        Like --profile, additionally write all measured phases to TRACE_FILE
+        in Chrome trace event format (JSON).
+
     -s, --write-source-info
         Write a file per profile containing a list of all used source
         locations. The files can used to generate a change log from the
@@ -84,22 +144,27 @@ Options:
         Print version
 """
 import docopt
+import glob
+import json
 import logging
 import os
 import sys
 
 # project
-from kiwi_keg.annotated_mapping import AnnotatedPrettyPrinter
+# Only lightweight modules are imported here. Modules depending on kiwi,
+# jinja2, schema or yaml are imported by the code paths that need them,
+# which keeps e.g. 'keg --version' fast.
 from kiwi_keg.exceptions import KegError, KegKiwiValidationError
-from kiwi_keg.file_utils import get_all_leaf_dirs
-from kiwi_keg.generator import KegGenerator
-from kiwi_keg.image_definition import KegImageDefinition
-from kiwi_keg.source_info_generator import SourceInfoGenerator
+from kiwi_keg.profiler import profiler
 from kiwi_keg.version import __version__
 
 log = logging.getLogger('keg')
 log.setLevel(logging.INFO)
 
+# Recipes cache populated by the batch mode parent process, inherited
+# copy-on-write by forked worker processes
+_batch_cache = None
+
 
 def main():
     args = docopt.docopt(__doc__, version=__version__)
@@ -111,107 +176,27 @@ def main():
         log.setLevel(logging.DEBUG)
 
     if args['--list-recipes']:
-        image_roots = [os.path.join(x, 'images') for x in roots]
-        image_dirs = []
-        for image_root in image_roots:
-            image_dirs += get_all_leaf_dirs(image_root)
-        images = {}
-        for image_src in sorted(image_dirs):
-            try:
-                image_definition = KegImageDefinition(
-                    image_name=image_src,
-                    recipes_roots=roots
-                )
-                image_definition.populate_header()
-                image_spec = image_definition.data['image']
-                if isinstance(image_spec['preferences'], list):
-                    ver = image_spec['preferences'][0].get('version', 'n/a')
-                else:
-                    ver = image_spec['preferences'].get('version', 'n/a')
-                images[image_src] = {
-                    'name': image_spec['_attributes']['name'],
-                    'desc': image_spec['description']['specification'],
-                    'ver': ver
-                }
-            except KegError as e:
-                log.error('{} is not a valid image definition: {}'.format(image_src, e))
-            except KeyError as e:
-                log.error('{} is not a valid image definition, missing key "{}"'.format(image_src, e))
-
-        header = ['Source', 'Name', 'Version', 'Description']
-        max_src = len(header[0])
-        max_name = len(header[1])
-        max_ver = len(header[2])
-        max_desc = len(header[3])
-        for image, spec in images.items():
-            max_src = len(image) if len(image) > max_src else max_src
-            max_name = len(spec['name']) if len(spec['name']) > max_name else max_name
-            max_ver = len(spec['ver']) if len(spec['ver']) > max_ver else max_ver
-            max_desc = len(spec['desc']) if len(spec['desc']) > max_desc else max_desc
-
-        print(f'{header[0]:{max_src}s} {header[1]:{max_name}s} {header[2]:{max_ver}s} {header[3]}')
-        for image, spec in images.items():
-            print(f'{image:{max_src}s} {spec["name"]:{max_name}s} {spec["ver"]:{max_ver}s} {spec["desc"]}')
+        list_recipes(args, roots)
         return
 
+    if args['--profile'] or args['--profile-memory'] or args['--profile-trace']:
+        profiler.enable(memory=args['--profile-memory'])
+    try:
+        if args['--batch']:
+            batch_generate(args, roots)
+        else:
+            generate_single(args, roots)
+    finally:
+        if profiler.enabled:
+            report_profile(args)
+
+
+def generate_single(args, roots):
     try:
-        image_definition = KegImageDefinition(
-            image_name=args['SOURCE'],
-            recipes_roots=roots,
-            image_version=args['--image-version'],
-            track_sources=args['--write-source-info']
-        )
         if args['--dump-dict']:
-            try:
-                image_definition.populate()
-            except KegError:  # pragma: no cover
-                pass
-            ap = AnnotatedPrettyPrinter(indent=2)
-            ap.pprint(image_definition.data)
+            dump_dict(args, roots)
             return
-        image_generator = KegGenerator(
-            image_definition=image_definition,
-            dest_dir=args['--dest-dir'],
-            archs=args['-a'],
-            gen_profiles_comment=not args['--disable-multibuild']
-        )
-        image_generator.create_kiwi_description(
-            overwrite=args['--force']
-        )
-
-        if args['--format-yaml']:
-            image_generator.format_kiwi_description('yaml')
-        elif args['--format-xml']:
-            image_generator.format_kiwi_description('xml')
-        else:
-            try:
-                image_generator.validate_kiwi_description()
-            except KegKiwiValidationError as issue:
-                if args['--force']:
-                    log.warning('%s: %s', type(issue).__name__, format(issue))
-                    log.warning('Ignoring validation error')
-                else:
-                    raise
-        image_generator.create_custom_scripts(
-            overwrite=args['--force']
-        )
-        image_generator.create_overlays(
-            disable_root_tar=args['--disable-root-tar'],
-            overwrite=args['--force']
-        )
-        image_generator.create_custom_files(
-            overwrite=args['--force']
-        )
-        if not args['--disable-multibuild']:
-            image_generator.create_multibuild_file(
-                overwrite=args['--force']
-            )
-        if args['--write-source-info']:
-            source_info_generator = SourceInfoGenerator(
-                image_definition=image_definition,
-                dest_dir=args['--dest-dir']
-            )
-            source_info_generator.write_source_info(overwrite=args['--force'])
+        generate_image(args, roots, args['SOURCE'][0], args['--dest-dir'])
     except KegError as issue:
         # known exception, log information and exit
         if args['--verbose']:
@@ -226,3 +211,293 @@ def main():
         # exception we did no expect, show python backtrace
         log.error('Unexpected error:')
         raise
+
+
+def report_profile(args):
+    """
+    Print profiling summary and write trace file if requested
+    """
+    profiler.disable()
+    profiler.print_report()
+    if args['--profile-trace']:
+        try:
+            profiler.write_trace(args['--profile-trace'])
+        except OSError as issue:
+            log.error('Cannot write profile trace: {}'.format(issue))
+
+
+def get_jobs(args):
+    try:
+        return int(args['--jobs'])
+    except ValueError:
+        log.error('Invalid number of jobs "{}"'.format(args['--jobs']))
+        sys.exit(1)
+
+
+def list_recipes(args, roots):
+    """
+    Print name, version and description of all images in the recipes
+    roots. Image headers are read in parallel with --jobs, results are
+    cached in the catalogue cache unless disabled.
+    """
+    import multiprocessing
+    from kiwi_keg.catalogue import RecipesCatalogue, read_image_info
+    from kiwi_keg.file_utils import get_all_leaf_dirs, get_cache_dir
+    if args['--list-format'] not in ['text', 'json']:
+        log.error('Unsupported list format "{}"'.format(args['--list-format']))
+        sys.exit(1)
+    jobs = get_jobs(args)
+    image_roots = [os.path.join(x, 'images') for x in roots]
+    image_dirs = []
+    for image_root in image_roots:
+        image_dirs += get_all_leaf_dirs(image_root)
+    image_dirs = sorted(image_dirs)
+
+    cache_file = None
+    if not args['--no-cache']:
+        cache_file = os.path.join(args['--cache-dir'] or get_cache_dir(), 'catalogue.json')
+    catalogue = RecipesCatalogue(cache_file)
+    entries = {}
+    for image_src in image_dirs:
+        entry = catalogue.get(roots, image_src)
+        if entry:
+            entries[image_src] = entry
+    stale = [x for x in image_dirs if x not in entries]
+    if stale:
+        log.debug('Reading {} of {} image headers'.format(len(stale), len(image_dirs)))
+        if jobs > 1 and len(stale) > 1:
+            ctx = multiprocessing.get_context('fork')
+            with ctx.Pool(min(jobs, len(stale))) as pool:
+                results = pool.starmap(read_image_info, [(roots, x) for x in stale])
+        else:
+            results = [read_image_info(roots, x) for x in stale]
+        for image_src, entry in zip(stale, results):
+            entries[image_src] = entry
+            catalogue.set(roots, image_src, entry)
+        catalogue.save()
+
+    images = {}
+    for image_src in image_dirs:
+        entry = entries[image_src]
+        if 'error' in entry:
+            log.error(entry['error'])
+        else:
+            images[image_src] = entry['info']
+
+    if args['--list-format'] == 'json':
+        json.dump(
+            [
+                {
+                    'source': image,
+                    'name': spec['name'],
+                    'version': spec['ver'],
+                    'description': spec['desc']
+                } for image, spec in images.items()
+            ],
+            sys.stdout,
+            indent=2
+        )
+        sys.stdout.write('\n')
+        return
+
+    header = ['Source', 'Name', 'Version', 'Description']
+    max_src = len(header[0])
+    max_name = len(header[1])
+    max_ver = len(header[2])
+    for image, spec in images.items():
+        max_src = len(image) if len(image) > max_src else max_src
+        max_name = len(spec['name']) if len(spec['name']) > max_name else max_name
+        max_ver = len(spec['ver']) if len(spec['ver']) > max_ver else max_ver
+
+    print(f'{header[0]:{max_src}s} {header[1]:{max_name}s} {header[2]:{max_ver}s} {header[3]}')
+    for image, spec in images.items():
+        print(f'{image:{max_src}s} {spec["name"]:{max_name}s} {spec["ver"]:{max_ver}s} {spec["desc"]}')
+
+
+def dump_dict(args, roots):
+    """
+    Write data dictionary of the image to stdout in the format given
+    by --dump-format
+    """
+    from kiwi_keg import dict_utils
+    from kiwi_keg.image_definition import KegImageDefinition
+    dump_format = args['--dump-format']
+    if dump_format not in ['pretty', 'json', 'yaml']:
+        raise KegError('Unsupported dump format: {}'.format(dump_format))
+    image_definition = KegImageDefinition(
+        image_name=args['SOURCE'][0],
+        recipes_roots=roots,
+        image_version=args['--image-version'],
+        track_sources=args['--write-source-info']
+    )
+    try:
+        image_definition.populate()
+    except KegError:  # pragma: no cover
+        pass
+    data = image_definition.data
+    if args['--dump-key']:
+        data = dict_utils.get_key_path(data, args['--dump-key'])
+    if dump_format == 'json':
+        dict_utils.dump_json(data, sys.stdout, annotations=args['--write-source-info'])
+    elif dump_format == 'yaml':
+        dict_utils.dump_yaml(data, sys.stdout, annotations=args['--write-source-info'])
+    else:
+        from kiwi_keg.annotated_mapping import AnnotatedPrettyPrinter
+        ap = AnnotatedPrettyPrinter(indent=2)
+        ap.pprint(data)
+
+
+def generate_image(args, roots, image_source, dest_dir, cache=None):
+    """
+    Generate image description for image_source in dest_dir according
+    to given command line arguments.
+    """
+    from kiwi_keg.file_utils import get_cache_dir
+    from kiwi_keg.generator import KegGenerator
+    from kiwi_keg.image_definition import KegImageDefinition
+    from kiwi_keg.source_info_generator import SourceInfoGenerator
+    from kiwi_keg.validation_cache import ValidationCache
+    image_definition = KegImageDefinition(
+        image_name=image_source,
+        recipes_roots=roots,
+        image_version=args['--image-version'],
+        track_sources=args['--write-source-info'],
+        cache=cache
+    )
+    image_generator = KegGenerator(
+        image_definition=image_definition,
+        dest_dir=dest_dir,
+        archs=args['-a'],
+        gen_profiles_comment=not args['--disable-multibuild'],
+        cache=cache
+    )
+    image_generator.create_kiwi_description(
+        overwrite=args['--force']
+    )
+
+    if args['--format-yaml']:
+        image_generator.format_kiwi_description('yaml')
+    elif args['--format-xml']:
+        image_generator.format_kiwi_description('xml')
+    else:
+        validation_cache = None
+        if not args['--no-cache']:
+            validation_cache = ValidationCache(
+                os.path.join(args['--cache-dir'] or get_cache_dir(), 'validation.json')
+            )
+        try:
+            image_generator.validate_kiwi_description(validation_cache)
+        except KegKiwiValidationError as issue:
+            if args['--force']:
+                log.warning('%s: %s', type(issue).__name__, format(issue))
+                log.warning('Ignoring validation error')
+            else:
+                raise
+    image_generator.create_custom_scripts(
+        overwrite=args['--force']
+    )
+    image_generator.create_overlays(
+        disable_root_tar=args['--disable-root-tar'],
+        overwrite=args['--force']
+    )
+    image_generator.create_custom_files(
+        overwrite=args['--force']
+    )
+    if not args['--disable-multibuild']:
+        image_generator.create_multibuild_file(
+            overwrite=args['--force']
+        )
+    if args['--write-source-info']:
+        source_info_generator = SourceInfoGenerator(
+            image_definition=image_definition,
+            dest_dir=dest_dir
+        )
+        source_info_generator.write_source_info(overwrite=args['--force'])
+
+
+def get_batch_sources(roots, patterns):
+    """
+    Return sorted list of image sources matching any of the given glob
+    patterns. Patterns are relative to the images directory of the
+    recipes roots, matching directories select all images below.
+    """
+    from kiwi_keg.file_utils import get_all_leaf_dirs
+    image_dirs = set()
+    for root in roots:
+        image_root = os.path.join(root, 'images')
+        image_dirs.update(get_all_leaf_dirs(image_root))
+    sources = set()
+    for root in roots:
+        image_root = os.path.join(root, 'images')
+        for pattern in patterns:
+            for match in glob.glob(os.path.join(image_root, pattern), recursive=True):
+                match = os.path.relpath(match, image_root)
+                sources.update(
+                    x for x in image_dirs if x == match or x.startswith(match + os.sep)
+                )
+    return sorted(sources)
+
+
+def batch_generate(args, roots):
+    """
+    Generate image descriptions for all sources matching the SOURCE
+    arguments. Each image is processed independently, failures are
+    reported at the end.
+    """
+    import multiprocessing
+    from kiwi_keg.file_utils import preload_recipes
+    from kiwi_keg.recipes_cache import RecipesCache
+    global _batch_cache
+    image_sources = get_batch_sources(roots, args['SOURCE'])
+    if not image_sources:
+        log.error('No images found matching {}'.format(', '.join(args['SOURCE'])))
+        sys.exit(1)
+    jobs = get_jobs(args)
+    _batch_cache = RecipesCache()
+    try:
+        if jobs > 1:
+            preload_recipes(_batch_cache, roots, image_sources, args['--write-source-info'])
+            ctx = multiprocessing.get_context('fork')
+            with ctx.Pool(min(jobs, len(image_sources))) as pool:
+                results = pool.starmap(
+                    _generate_batch_image,
+                    [(args, roots, x) for x in image_sources],
+                    chunksize=1
+                )
+        else:
+            results = [_generate_batch_image(args, roots, x) for x in image_sources]
+    except KeyboardInterrupt:
+        log.error('keg aborted by keyboard interrupt')
+        sys.exit(1)
+    finally:
+        _batch_cache = None
+    if jobs > 1:
+        for _, records in results:
+            profiler.add_records(records)
+    failed = [x for x, (ok, _) in zip(image_sources, results) if not ok]
+    log.info('Generated {} of {} image descriptions'.format(
+        len(image_sources) - len(failed), len(image_sources))
+    )
+    if failed:
+        log.error('Failed images: {}'.format(', '.join(failed)))
+        sys.exit(1)
+
+
+def _generate_batch_image(args, roots, image_source):
+    """
+    Generate one image in batch mode, return success flag and the
+    profiler records collected while doing so
+    """
+    log.info('Generating image description for {}'.format(image_source))
+    first_record = len(profiler.records)
+    dest_dir = os.path.join(args['--dest-dir'], image_source)
+    try:
+        os.makedirs(dest_dir, exist_ok=True)
+        generate_image(args, roots, image_source, dest_dir, _batch_cache)
+    except KegError as issue:
+        log.error('%s: %s: %s', image_source, type(issue).__name__, format(issue))
+        return False, profiler.records[first_record:]
+    except Exception:
+        log.exception('{}: Unexpected error:'.format(image_source))
+        return False, profiler.records[first_record:]
+    return True, profiler.records[first_record:]
@@ -18,10 +18,9 @@
 import os
 import shutil
 import logging
-from typing import Any
-
-# from KIWI
-from kiwi.xml_description import XMLDescription
+from typing import (
+    Any, List, Optional, TYPE_CHECKING
+)
 
 # from KEG
 from kiwi_keg.exceptions import (
@@ -30,6 +29,9 @@ from kiwi_keg.exceptions import (
     KegKiwiDescriptionError
 )
 
+if TYPE_CHECKING:  # pragma: no cover
+    from kiwi.xml_description import XMLDescription
+
 log = logging.getLogger('keg')
 
 
@@ -45,48 +47,59 @@ class KiwiDescription:
             raise KegDescriptionNotFound(
                 'No such file {0}'.format(description_file)
             )
+        # kiwi is imported on first use only, it takes longer to load
+        # than all of keg, and it also sets up the kiwi logger class
+        import kiwi.xml_description  # noqa: F401
+
         kiwi_logger: Any = logging.getLogger('kiwi')
         kiwi_logger.setLogLevel(logging.INFO)
         self.description_file = description_file
+        self._description: Optional['XMLDescription'] = None
 
-    def validate_description(self) -> XMLDescription:
-        try:
-            description = XMLDescription(self.description_file)
-            description.load()
-        except Exception as issue:
-            raise KegKiwiValidationError(
-                'Failed to validate image description: {0}'.format(issue)
-            )
-        return description
+    def validate_description(self) -> 'XMLDescription':
+        """
+        Load and validate the description with kiwi. The loaded
+        description is kept, so formatting after validation does
+        not load it again.
+        """
+        if self._description is None:
+            from kiwi.xml_description import XMLDescription
+            try:
+                description = XMLDescription(self.description_file)
+                description.load()
+            except Exception as issue:
+                raise KegKiwiValidationError(
+                    'Failed to validate image description: {0}'.format(issue)
+                )
+            self._description = description
+        return self._description
 
     def create_YAML_description(self, output_file: str) -> None:
         self._read_YAML_comments()
         self._create_description(output_file, 'yaml')
 
     def create_XML_description(self, output_file: str) -> None:
+        # KIWI does not preserve comment blocks after validation.
+        # However, for OBS the comments are no comments but effective
+        # project config data. Questionable design but we can't
+        # influence this and will add back at least the toplevel
+        # header comments.
         comments = self._read_XML_comments()
-        self._create_description(output_file, 'xml')
-        if comments:
-            # KIWI does not preserve comment blocks after validation.
-            # However, for OBS the comments are no comments but effective
-            # project config data. Questionable design but we can't
-            # influence this and will add back at least the toplevel
-            # header comments.
-            with open(output_file, 'r') as xml:
-                xml_data = xml.read()
+        self._create_description(output_file, 'xml', comments)
 
-            with open(output_file, 'w') as xml:
-                xml.write(''.join(comments))
-                xml.write(xml_data)
-
-    def _create_description(self, output_file, markup):
+    def _create_description(self, output_file: str, markup: str, header: List[str] = []) -> None:
         description = self.validate_description()
         try:
             if markup == 'xml':
                 document = description.markup.get_xml_description()
             else:
                 document = description.markup.get_yaml_description()
-            shutil.copy(document, output_file)
+            if header:
+                with open(document, 'r') as source, open(output_file, 'w') as target:
+                    target.write(''.join(header))
+                    shutil.copyfileobj(source, target)
+            else:
+                shutil.copy(document, output_file)
         except Exception as issue:
             raise KegKiwiDescriptionError(
                 'Failed to create image description: {0}'.format(issue)
@@ -107,24 +120,25 @@ class KiwiDescription:
         comments = []
         multiline_comment = False
         with open(self.description_file, 'r') as keg_description:
-            description_lines = keg_description.readlines()
-
-        for comment in description_lines:
-            if multiline_comment:
-                # within a multiline comment
-                comments.append(comment)
-                if comment.endswith('-->\n'):
-                    multiline_comment = False
-            elif comment.startswith('<?'):
-                # toplevel XML processing instruction
-                comments.append(comment)
-            elif comment.startswith('<!--') and comment.endswith('-->\n'):
-                # toplevel comment
-                comments.append(comment)
-            elif comment.startswith('<!--'):
-                # toplevel start of multiline comment
-                multiline_comment = True
-                comments.append(comment)
+            for comment in keg_description:
+                if multiline_comment:
+                    # within a multiline comment
+                    comments.append(comment)
+                    if comment.endswith('-->\n'):
+                        multiline_comment = False
+                elif comment.startswith('<?'):
+                    # toplevel XML processing instruction
+                    comments.append(comment)
+                elif comment.startswith('<!--') and comment.endswith('-->\n'):
+                    # toplevel comment
+                    comments.append(comment)
+                elif comment.startswith('<!--'):
+                    # toplevel start of multiline comment
+                    multiline_comment = True
+                    comments.append(comment)
+                elif comment.startswith('<'):
+                    # toplevel element, the header ends here
+                    break
 
         log.warn(
             'Inline comments from Keg KIWI description will not be preserved !'
@@ -0,0 +1,92 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+from typing import (
+    Dict, List
+)
+
+from kiwi_keg import dict_utils
+from kiwi_keg.exceptions import KegDataError
+
+
+class ProfileGraph:
+    """
+    Dependency graph of the image profiles, built from their
+    `requires` elements.
+
+    check raises KegDataError if the requirements contain a cycle.
+
+    :param dict requires: direct requirements by profile name
+    """
+    def __init__(self, requires: Dict[str, List[str]]):
+        self._requires = requires
+        self._closures: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_profiles(cls, profiles: List) -> 'ProfileGraph':
+        """
+        Return graph for the given list of image profile nodes
+
+        :param list profiles: profile nodes as returned by
+            KegImageDefinition.get_profiles
+        """
+        requires: Dict[str, List[str]] = {}
+        for profile in profiles:
+            name = dict_utils.get_attribute(profile, 'name')
+            profile_requires = profile.get('requires', [])
+            if not isinstance(profile_requires, list):
+                profile_requires = [profile_requires]
+            requires.setdefault(name, []).extend(
+                dict_utils.get_attribute(x, 'profile') for x in profile_requires
+            )
+        return cls(requires)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._requires)
+
+    def get_requires(self, profile_name: str) -> List[str]:
+        """
+        Return names of the profiles directly required by profile_name
+        """
+        return list(self._requires.get(profile_name, []))
+
+    def check(self) -> None:
+        """
+        Raise KegDataError if the profile requirements contain a cycle
+        """
+        # the transitive requirements of each profile are collected once,
+        # so the check is linear in the number of requirements
+        for name in self._requires:
+            self._get_closure(name, [])
+
+    def _get_closure(self, profile_name: str, path: List[str]) -> List[str]:
+        if profile_name in self._closures:
+            return self._closures[profile_name]
+        if profile_name in path:
+            cycle = path[path.index(profile_name):] + [profile_name]
+            raise KegDataError(
+                'Cyclic profile requirements: {}'.format(' -> '.join(cycle))
+            )
+        path.append(profile_name)
+        closure: Dict[str, None] = {}
+        for required in self._requires.get(profile_name, []):
+            closure[required] = None
+            closure.update(dict.fromkeys(self._get_closure(required, path)))
+        path.pop()
+        self._closures[profile_name] = list(closure)
+        return self._closures[profile_name]
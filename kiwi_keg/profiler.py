@@ -0,0 +1,291 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import (
+    Any, Dict, Iterator, List, Optional, TextIO
+)
+
+# phase names used by the keg code base
+PHASE_POPULATE = 'populate'
+PHASE_RECIPE_LOADING = 'recipe loading'
+PHASE_INCLUDE_EXPANSION = 'include expansion'
+PHASE_SCHEMA_VALIDATION = 'schema validation'
+PHASE_SCRIPT_GENERATION = 'script generation'
+PHASE_DESCRIPTION_RENDERING = 'description rendering'
+PHASE_KIWI_VALIDATION = 'kiwi validation'
+PHASE_OVERLAY_PACKING = 'overlay packing'
+PHASE_SOURCE_INFO_WRITING = 'source info writing'
+
+_NO_PHASE = nullcontext()
+
+
+class Profiler:
+    """
+    **Collect wall clock time spent in named processing phases**
+
+    The profiler is disabled by default. In that state phase() and
+    memory() return a shared no-op context manager, so instrumented code
+    paths only pay for a method call.
+
+    With memory accounting enabled, memory() additionally takes tracemalloc
+    snapshots before and after the enclosed code and records the peak and
+    retained number of bytes allocated within, and the allocation sites
+    that grew most.
+
+    :param int top_sites: number of allocation sites recorded per memory phase
+    """
+    def __init__(self, top_sites: int = 5):
+        self.enabled = False
+        self.memory_enabled = False
+        self.top_sites = top_sites
+        self.records: List[Dict[str, Any]] = []
+        self._start: Optional[float] = None
+        self._memory_stack: List[Dict[str, int]] = []
+        self._started_tracing = False
+
+    def enable(self, memory: bool = False) -> None:
+        """
+        Start a new profiling session
+
+        :param bool memory: also enable memory accounting
+        """
+        self.enabled = True
+        self.memory_enabled = memory
+        self.records = []
+        self._start = time.perf_counter()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        self.memory_enabled = False
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def phase(self, name: str):
+        """
+        Return context manager measuring the enclosed code as phase name
+
+        :param str name: phase name
+        """
+        if not self.enabled:
+            return _NO_PHASE
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.records.append({
+                'kind': 'time',
+                'name': name,
+                'start': start,
+                'duration': time.perf_counter() - start,
+                'pid': os.getpid()
+            })
+
+    def memory(self, name: str):
+        """
+        Return context manager recording the memory allocated by the
+        enclosed code as phase name
+
+        :param str name: phase name
+        """
+        if not self.memory_enabled:
+            return _NO_PHASE
+        return self._measure_memory(name)
+
+    @contextmanager
+    def _measure_memory(self, name: str) -> Iterator[None]:
+        before = self._take_snapshot()
+        self._update_peaks()
+        current = tracemalloc.get_traced_memory()[0]
+        frame = {'base': current, 'peak': current}
+        self._memory_stack.append(frame)
+        try:
+            yield
+        finally:
+            self._update_peaks()
+            self._memory_stack.pop()
+            current = tracemalloc.get_traced_memory()[0]
+            after = self._take_snapshot()
+            self.records.append({
+                'kind': 'memory',
+                'name': name,
+                'peak': frame['peak'] - frame['base'],
+                'retained': current - frame['base'],
+                'sites': [
+                    {
+                        'site': '{}:{}'.format(stat.traceback[0].filename, stat.traceback[0].lineno),
+                        'size': stat.size_diff,
+                        'count': stat.count_diff
+                    } for stat in after.compare_to(before, 'lineno')[:self.top_sites]
+                ],
+                'pid': os.getpid()
+            })
+
+    def _update_peaks(self) -> None:
+        # tracemalloc only has one peak counter, fold it into all active
+        # (possibly nested) memory phases before it is reset
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._memory_stack:
+            frame['peak'] = max(frame['peak'], peak)
+        tracemalloc.reset_peak()
+
+    @staticmethod
+    def _take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+
+    def add_records(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Add records collected in another process
+        """
+        self.records += records
+
+    def get_summary(self) -> List[Dict[str, Any]]:
+        """
+        Return per phase statistics in order of first occurrence
+        """
+        phases: Dict[str, Dict[str, Any]] = {}
+        for record in self._get_records('time'):
+            phase = phases.setdefault(
+                record['name'], {'name': record['name'], 'calls': 0, 'total': 0.0, 'max': 0.0}
+            )
+            phase['calls'] += 1
+            phase['total'] += record['duration']
+            phase['max'] = max(phase['max'], record['duration'])
+        for phase in phases.values():
+            phase['mean'] = phase['total'] / phase['calls']
+        return list(phases.values())
+
+    def get_memory_summary(self) -> List[Dict[str, Any]]:
+        """
+        Return per phase memory statistics in order of first occurrence,
+        peak is the maximum of all calls, retained and allocation sites
+        are summed up over all calls
+        """
+        phases: Dict[str, Dict[str, Any]] = {}
+        for record in self._get_records('memory'):
+            phase = phases.setdefault(
+                record['name'], {'name': record['name'], 'calls': 0, 'peak': 0, 'retained': 0, 'sites': {}}
+            )
+            phase['calls'] += 1
+            phase['peak'] = max(phase['peak'], record['peak'])
+            phase['retained'] += record['retained']
+            for site in record['sites']:
+                phase['sites'][site['site']] = phase['sites'].get(site['site'], 0) + site['size']
+        for phase in phases.values():
+            phase['sites'] = [
+                {'site': site, 'size': size} for site, size in sorted(
+                    phase['sites'].items(), key=lambda x: -x[1]
+                )[:self.top_sites]
+            ]
+        return list(phases.values())
+
+    def _get_records(self, kind: str) -> List[Dict[str, Any]]:
+        return [x for x in self.records if x['kind'] == kind]
+
+    def get_wall_time(self) -> float:
+        if self._start is None:
+            return 0.0
+        return time.perf_counter() - self._start
+
+    def print_report(self, stream: Optional[TextIO] = None) -> None:
+        """
+        Print summary table of all phases
+
+        :param stream: output stream, defaults to stderr
+        """
+        stream = stream or sys.stderr
+        wall_time = self.get_wall_time()
+        summary = self.get_summary()
+        width = max([len('Phase')] + [len(x['name']) for x in summary])
+        print(
+            f'{"Phase":{width}s} {"Calls":>6s} {"Total[s]":>9s} {"Mean[s]":>9s} {"Max[s]":>9s} {"Wall%":>6s}',
+            file=stream
+        )
+        for phase in summary:
+            share = 100 * phase['total'] / wall_time if wall_time else 0.0
+            print(
+                f'{phase["name"]:{width}s} {phase["calls"]:6d} {phase["total"]:9.3f} '
+                f'{phase["mean"]:9.3f} {phase["max"]:9.3f} {share:6.1f}',
+                file=stream
+            )
+        print(f'{"wall time":{width}s} {"":6s} {wall_time:9.3f}', file=stream)
+        memory_summary = self.get_memory_summary()
+        if not memory_summary:
+            return
+        width = max([len('Phase')] + [len(x['name']) for x in memory_summary])
+        print(file=stream)
+        print(f'{"Phase":{width}s} {"Calls":>6s} {"Peak[KiB]":>11s} {"Retained[KiB]":>14s}', file=stream)
+        for phase in memory_summary:
+            print(
+                f'{phase["name"]:{width}s} {phase["calls"]:6d} {phase["peak"] / 1024:11.1f} '
+                f'{phase["retained"] / 1024:14.1f}',
+                file=stream
+            )
+        for phase in memory_summary:
+            print(f'\nTop allocation sites in {phase["name"]}:', file=stream)
+            for site in phase['sites']:
+                print(f'  {site["size"] / 1024:11.1f} KiB  {site["site"]}', file=stream)
+
+    def write_trace(self, trace_file: str) -> None:
+        """
+        Write all records in Chrome trace event format, which can be loaded
+        in e.g. chrome://tracing or https://ui.perfetto.dev
+
+        :param str trace_file: output file path
+        """
+        origin = self._start or 0.0
+        events = [
+            {
+                'name': record['name'],
+                'ph': 'X',
+                'ts': round((record['start'] - origin) * 1e6),
+                'dur': round(record['duration'] * 1e6),
+                'pid': record['pid'],
+                'tid': record['pid']
+            } for record in self._get_records('time')
+        ]
+        with open(trace_file, 'w') as trace:
+            json.dump(
+                {
+                    'traceEvents': events,
+                    'displayTimeUnit': 'ms',
+                    'summary': self.get_summary(),
+                    'memory': self.get_memory_summary(),
+                    'wall_time': self.get_wall_time()
+                },
+                trace,
+                indent=2
+            )
+
+
+# process wide profiler instance used by all instrumented code
+profiler = Profiler()
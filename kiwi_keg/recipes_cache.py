@@ -0,0 +1,102 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+import copy
+import logging
+import os
+import yaml
+from typing import (
+    Any, Callable, Dict, Hashable, List
+)
+
+log = logging.getLogger('keg')
+
+
+class RecipesCache:
+    """
+    Cache for recipes data that can be shared by several image definitions
+    processed in the same keg run, e.g. in batch mode.
+
+    Parsed YAML documents are handed out as deep copies as the image
+    definition code modifies its data in place while expanding includes.
+    """
+    def __init__(self):
+        self._store: Dict[str, Dict[Hashable, Any]] = {}
+
+    def get(self, namespace: str, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Return cached value for key in namespace, calling factory to
+        create the value on first access.
+
+        :param: str namespace: cache section name
+        :param: Hashable key: lookup key within namespace
+        :param: callable factory: function returning the value to cache
+        """
+        section = self._store.setdefault(namespace, {})
+        if key not in section:
+            section[key] = factory()
+        return section[key]
+
+    def load_yaml(self, desc_file: str, loader: Any) -> Any:
+        """
+        Return a private copy of the parsed content of given YAML file.
+
+        :param: str desc_file: path of the YAML file
+        :param: object loader: YAML loader class used for parsing
+        """
+        return copy.deepcopy(self._get_yaml(desc_file, loader))
+
+    def preload_yaml(self, desc_files: List[str], loader: Any) -> None:
+        """
+        Parse given YAML files into the cache without handing out copies.
+        Files that fail to parse are skipped, the error is raised again
+        when the file is actually loaded.
+
+        :param: list desc_files: paths of the YAML files
+        :param: object loader: YAML loader class used for parsing
+        """
+        for desc_file in desc_files:
+            try:
+                self._get_yaml(desc_file, loader)
+            except Exception as issue:
+                log.debug(f'Skipped preloading {desc_file}: {issue}')
+
+    def read_file(self, file_path: str) -> str:
+        """
+        Return content of given text file.
+
+        :param: str file_path: path of the file
+        """
+        def _read():
+            with open(file_path, 'r') as f:
+                return f.read()
+        return self.get('files', file_path, _read)
+
+    def _get_yaml(self, desc_file, loader):
+        def _load():
+            log.debug(f'Reading: {desc_file}')
+            with open(desc_file, 'r') as f:
+                return yaml.load(f, Loader=loader)
+        # the same file is reached through different paths, e.g. with a
+        # '.' component for the parent directories of an include path
+        return self.get('yaml', (os.path.normpath(desc_file), loader), _load)
+
+    def clear(self) -> None:
+        """
+        Drop all cached data
+        """
+        self._store = {}
@@ -22,16 +22,23 @@ from typing import (
 )
 
 # project
+from kiwi_keg.directory_cache import DirectoryCache
 from kiwi_keg.exceptions import KegError
+from kiwi_keg.recipes_cache import RecipesCache
 
 
-def get_config_script(config_dict: Dict, script_dirs: List[str]) -> str:
+def get_config_script(
+    config_dict: Dict, script_dirs: List[str], cache: Optional[RecipesCache] = None,
+    dir_cache: Optional[DirectoryCache] = None
+) -> str:
     """
     Return image configuration script.
 
     :param: Dict profiles_dict: Dictionary containing profiles structure
     :param: str config_key: Lookup key for config structure ('config' or 'setup')
     :param: List[str] script_dirs: Directories to scan for script snippets
+    :param: RecipesCache cache: Optional cache for script snippets
+    :param: DirectoryCache dir_cache: Optional cache for script directory listings
     """
     content = ''
     for config_section in config_dict:
@@ -44,20 +51,25 @@ def get_config_script(config_dict: Dict, script_dirs: List[str]) -> str:
             for profile in profiles[1:]:
                 content += '|| {} =~ ^(${{profiles}})$ '.format(profile)
             content += ']]; then\n'
-            content += get_script_section(config_section, script_dirs, '    ')
+            content += get_script_section(config_section, script_dirs, '    ', cache, dir_cache)
             content += 'fi\n'
         else:
-            content += get_script_section(config_section, script_dirs)
+            content += get_script_section(config_section, script_dirs, cache=cache, dir_cache=dir_cache)
     return content
 
 
-def get_script_section(config_section: Dict, script_dirs: List[str], indent: str = '') -> str:
+def get_script_section(
+    config_section: Dict, script_dirs: List[str], indent: str = '', cache: Optional[RecipesCache] = None,
+    dir_cache: Optional[DirectoryCache] = None
+) -> str:
     """
     Return scriptlet for given profile.
 
     :param: Dict config_section: Dictionary containing wanted profile's config section
     :param: List[str] script_dirs: Directories to scan for script snippets
     :param: str indent: Indent output with given string
+    :param: RecipesCache cache: Optional cache for script snippets
+    :param: DirectoryCache dir_cache: Optional cache for script directory listings
     """
     content = ''
     config_sysconfig = config_section.get('sysconfig')
@@ -81,7 +93,7 @@ def get_script_section(config_section: Dict, script_dirs: List[str], indent: str
             content += separator
             separator = '\n'
             content += '{indent}# keg: included from {ns}\n'.format(indent=indent, ns=ns)
-            content += textwrap.indent(get_scripts_section(items, ns, script_dirs), indent)
+            content += textwrap.indent(get_scripts_section(items, ns, script_dirs, cache, dir_cache), indent)
     config_services = config_section.get('services')
     if config_services:
         for ns, items in config_services.items():
@@ -164,22 +176,37 @@ def get_services_section(service_items: Dict, ns: str) -> str:
         raise KegError('service section "{namespace}" malformed'.format(namespace=ns))
 
 
-def get_scripts_section(script_items: Dict, ns: str, script_dirs: List[str]) -> str:
+def get_scripts_section(
+    script_items: Dict, ns: str, script_dirs: List[str], cache: Optional[RecipesCache] = None,
+    dir_cache: Optional[DirectoryCache] = None
+) -> str:
     """
     Return scriptlet for given scripts section.
 
     :param: Dict config_section: Dictionary containing config section
     :param: str ns: Namespace the section belongs to
+    :param: RecipesCache cache: Optional cache for script snippets
+    :param: DirectoryCache dir_cache: Optional cache for script directory listings
     """
     content = ''
     separator = ''
     for script_name in script_items:
-        script_path = get_script_path(script_dirs, script_name)
+        if cache:
+            script_path = cache.get(
+                'script_path',
+                (tuple(script_dirs), script_name),
+                lambda: get_script_path(script_dirs, script_name, dir_cache)
+            )
+        else:
+            script_path = get_script_path(script_dirs, script_name, dir_cache)
         if script_path:
-            with open(script_path, 'r') as script_file:
-                content += separator
-                separator = '\n'
-                content += script_file.read()
+            content += separator
+            separator = '\n'
+            if cache:
+                content += cache.read_file(script_path)
+            else:
+                with open(script_path, 'r') as script_file:
+                    content += script_file.read()
         else:
             raise KegError(
                 'script "{scriptname}" included in "{namespace}" does not exist'.format(
@@ -190,13 +217,18 @@ def get_scripts_section(script_items: Dict, ns: str, script_dirs: List[str]) ->
     return content
 
 
-def get_script_path(script_dirs: List[str], script_name: str) -> Optional[str]:
+def get_script_path(
+    script_dirs: List[str], script_name: str, dir_cache: Optional[DirectoryCache] = None
+) -> Optional[str]:
     """
     Return script location.
 
     :param: List[str]: List of directories.
     :param: str script_name: Name of script snippet to find ('.sh' appended automatically)
+    :param: DirectoryCache dir_cache: Optional cache for script directory listings
     """
+    if dir_cache:
+        return dir_cache.find_file(script_dirs, '{}.sh'.format(script_name))
     script_path = None
     for script_dir in script_dirs:
         for entry in os.scandir(script_dir):
@@ -17,6 +17,9 @@
 #
 import logging
 import os
+from typing import (
+    Dict, List, Optional, Tuple
+)
 
 from kiwi_keg.image_definition import KegImageDefinition
 from kiwi_keg import dict_utils
@@ -24,6 +27,7 @@ from kiwi_keg import file_utils
 from kiwi_keg import script_utils
 from kiwi_keg.exceptions import KegError
 from kiwi_keg.annotated_mapping import AnnotatedMapping
+from kiwi_keg import profiler as prof
 
 log = logging.getLogger('keg')
 
@@ -47,6 +51,8 @@ class SourceInfoGenerator:
         self.image_definition: KegImageDefinition = image_definition
         self.dest_dir: str = dest_dir
         self.internal_toplevel_keys = ['archive', 'archives', 'generator', 'timestamp', 'image_source_path']
+        self._archive_profiles: Optional[Dict[str, List[str]]] = None
+        self._parsed_ranges: Dict[str, Tuple[str, Tuple[int, int]]] = {}
 
     def write_source_info(self, overwrite: bool = False):
         """
@@ -54,31 +60,90 @@ class SourceInfoGenerator:
 
         :param bool overwrite: Overwrite any existing files
         """
-        profile_names = self.image_definition.get_build_profile_names()
-        if not profile_names:
-            src_info = self._get_mapping_sources(self.image_definition.data, profile=None, skip_keys=self.internal_toplevel_keys)
-            src_info += self._get_script_sources()
-            src_info += self._get_archive_sources()
-            with self._open_source_info_file('log_sources', overwrite) as outf:
-                for r in self.image_definition.recipes_roots:
-                    outf.write('root:{}\n'.format(r))
-                outf.write('\n'.join(filter(None, src_info)))
-                outf.write('\n')
-        else:
-            for profile_name in profile_names:
-                base_profile_names = self.image_definition.get_base_profile_names(profile_name)
-                src_info = []
-                for p in [profile_name] + base_profile_names:
-                    src_info += self._get_mapping_sources(self.image_definition.data, profile=p, skip_keys=self.internal_toplevel_keys)
-                    src_info += self._get_script_sources(p)
-                    src_info += self._get_archive_sources(p)
-                with self._open_source_info_file(
-                    'log_sources_{}'.format(profile_name), overwrite
-                ) as outf:
-                    for r in self.image_definition.recipes_roots:
-                        outf.write('root:{}\n'.format(r))
-                    outf.write('\n'.join(filter(None, src_info)))
-                    outf.write('\n')
+        with prof.profiler.phase(prof.PHASE_SOURCE_INFO_WRITING), \
+                prof.profiler.memory(prof.PHASE_SOURCE_INFO_WRITING):
+            profile_names = self.image_definition.get_build_profile_names()
+            if not profile_names:
+                src_info = self._get_mapping_sources(self.image_definition.data, profile=None, skip_keys=self.internal_toplevel_keys)
+                src_info += self._get_script_sources()
+                src_info += self._get_archive_sources()
+                self._write_source_info_file('log_sources', src_info, overwrite)
+            else:
+                profile_sources = self._get_profile_sources(profile_names)
+                for profile_name in profile_names:
+                    base_profile_names = self.image_definition.get_base_profile_names(profile_name)
+                    src_info = []
+                    for p in [profile_name] + base_profile_names:
+                        src_info += profile_sources[p]
+                    self._write_source_info_file('log_sources_{}'.format(profile_name), src_info, overwrite)
+
+    def _get_profile_sources(self, profile_names):
+        """
+        Return source info of each of the given build profiles and their
+        base profiles. The data tree is traversed once for all profiles.
+        """
+        needed_profiles = {}
+        for profile_name in profile_names:
+            needed_profiles[profile_name] = None
+            needed_profiles.update(dict.fromkeys(self.image_definition.get_base_profile_names(profile_name)))
+        mapping_sources: dict = {x: [] for x in needed_profiles}
+        for src, src_profiles in self._get_profile_mapping_sources(
+            self.image_definition.data, frozenset(needed_profiles), skip_keys=self.internal_toplevel_keys
+        ):
+            for p in src_profiles:
+                mapping_sources[p].append(src)
+        # coalescing each profile here keeps the lists merged again per
+        # build profile in _write_source_info_file short
+        return {
+            p: self._coalesce_sources(mapping_sources[p] + self._get_script_sources(p) + self._get_archive_sources(p))
+            for p in needed_profiles
+        }
+
+    def _write_source_info_file(self, fname, src_info, overwrite):
+        with self._open_source_info_file(fname, overwrite) as outf:
+            for r in self.image_definition.recipes_roots:
+                outf.write('root:{}\n'.format(r))
+            outf.write('\n'.join(self._coalesce_sources(src_info)))
+            outf.write('\n')
+
+    def _coalesce_sources(self, src_info):
+        """
+        Return src_info with overlapping and adjacent ranges of the same
+        file merged and duplicate entries removed. The merged ranges of a
+        file are placed where the first range of that file was.
+        """
+        file_ranges: dict = {}
+        entries: dict = {}
+        for src in src_info:
+            if not src or src in entries:
+                continue
+            if src.startswith('range:'):
+                parsed = self._parsed_ranges.get(src)
+                if parsed is None:
+                    range_mark, start, end, src_file = src.split(':', 3)
+                    parsed = self._parsed_ranges[src] = (src_file, (int(start), int(end)))
+                ranges = file_ranges.get(parsed[0])
+                if ranges is None:
+                    ranges = file_ranges[parsed[0]] = []
+                    entries[src] = parsed[0]
+                ranges.append(parsed[1])
+            else:
+                entries[src] = None
+        result = []
+        for src, src_file in entries.items():
+            if src_file is None:
+                result.append(src)
+                continue
+            ranges = sorted(file_ranges[src_file])
+            merged_start, merged_end = ranges[0]
+            for start, end in ranges[1:]:
+                if start > merged_end + 1:
+                    result.append('range:{}:{}:{}'.format(merged_start, merged_end, src_file))
+                    merged_start = start
+                if end > merged_end:
+                    merged_end = end
+            result.append('range:{}:{}:{}'.format(merged_start, merged_end, src_file))
+        return result
 
     def _open_source_info_file(self, fname, overwrite):
         fpath = os.path.join(self.dest_dir, fname)
@@ -87,16 +152,28 @@ class SourceInfoGenerator:
         return fobj
 
     def _get_mapping_sources(self, data, profile=None, skip_keys=[]):
+        return [
+            src for src, _ in self._get_profile_mapping_sources(data, frozenset([profile]), skip_keys)
+        ]
+
+    def _get_profile_mapping_sources(self, data, profiles, skip_keys=[]):
+        """
+        Return source info of data for a set of profiles as list of
+        tuples (source, profiles), the second element being the subset
+        of profiles that source belongs to.
+        """
         src_info: list = []
         if not hasattr(data, '__iter__') or isinstance(data, str):
             return []
         if not isinstance(data, AnnotatedMapping):
             for item in data:
-                src_info += self._get_mapping_sources(item, profile)
+                src_info += self._get_profile_mapping_sources(item, profiles)
         else:
-            profiles = self._get_profiles_attrib(data)
-            if profiles and profile not in profiles:
-                return []
+            profiles_attr = self._get_profiles_attrib(data)
+            if profiles_attr:
+                profiles = frozenset(x for x in profiles if x in profiles_attr)
+                if not profiles:
+                    return []
             for key, value in data.items():
                 if key in skip_keys:
                     continue
@@ -104,27 +181,30 @@ class SourceInfoGenerator:
                     # special case for image:profiles; select only matching ones
                     for item in value:
                         item_name = dict_utils.get_attribute(item, 'name')
-                        if item_name == profile:
-                            src_info += self._get_mapping_sources(item)
+                        if item_name in profiles:
+                            item_profiles = frozenset([item_name])
+                            src_info += [
+                                (src, item_profiles) for src, _ in self._get_profile_mapping_sources(item, frozenset([None]))
+                            ]
                 elif isinstance(value, list):
                     # We can't simply add the source of the list as one block,
                     # because it may contain keys included from other sources,
                     # and also profile specific attributes.
                     if all(isinstance(i, AnnotatedMapping) for i in value):
-                        src_info.append(self._get_key_def_source(key, data))
-                        src_info += self._get_mapping_sources(value, profile)
+                        src_info.append((self._get_key_def_source(key, data), profiles))
+                        src_info += self._get_profile_mapping_sources(value, profiles)
                     else:
-                        src_info.append(self._get_key_sources(key, data))
+                        src_info.append((self._get_key_sources(key, data), profiles))
                 elif isinstance(value, AnnotatedMapping):
-                    src_info.append(self._get_key_def_source(key, data))
-                    src_info += self._get_mapping_sources(value, profile)
+                    src_info.append((self._get_key_def_source(key, data), profiles))
+                    src_info += self._get_profile_mapping_sources(value, profiles)
                 else:
-                    src_info.append(self._get_key_sources(key, data))
+                    src_info.append((self._get_key_sources(key, data), profiles))
             # keys may be deleted when merging, but info is preserved with __deleted_ prefix
             for key in [x for x in data.all_keys() if x.startswith('__deleted_')]:
                 orig_key = key[10:]
                 if orig_key not in data.keys():
-                    src_info.append(self._get_key_sources(orig_key, data))
+                    src_info.append((self._get_key_sources(orig_key, data), profiles))
         return src_info
 
     def _get_key_sources(self, key, data):
@@ -158,21 +238,26 @@ class SourceInfoGenerator:
         return profiles_attr
 
     def _get_archive_profiles(self, archive_name):
-        profiles = []
-        for pkg_sect in dict_utils.get_merged_list(self.image_definition.data['image'], 'packages'):
-            archives = pkg_sect.get('archive', [])
-            for archive_sect in archives:
-                if dict_utils.get_attribute(archive_sect, 'name') == archive_name:
-                    profiles += dict_utils.get_attribute(pkg_sect, 'profiles', [])
-        return profiles
+        if self._archive_profiles is None:
+            # profiles of all archives, collected in one pass over the
+            # packages sections
+            self._archive_profiles = {}
+            for pkg_sect in dict_utils.get_merged_list(self.image_definition.data['image'], 'packages'):
+                profiles = dict_utils.get_attribute(pkg_sect, 'profiles', [])
+                for archive_sect in pkg_sect.get('archive', []):
+                    self._archive_profiles.setdefault(
+                        dict_utils.get_attribute(archive_sect, 'name'), []
+                    ).extend(profiles)
+        return self._archive_profiles.get(archive_name, [])
 
     def _get_archive_sources(self, profile=None):
         src_info: list = []
+        if profile:
+            build_profile_names = set([profile] + self.image_definition.get_base_profile_names(profile))
         for archive in self.image_definition.data.get('archive', []):
             if profile:
-                build_profile_names = [profile] + self.image_definition.get_base_profile_names(profile)
                 archive_profile_names = self._get_archive_profiles(archive['name'])
-                if archive_profile_names and not set(build_profile_names) & set(archive_profile_names):
+                if archive_profile_names and not build_profile_names & set(archive_profile_names):
                     continue
             src_info += self._get_mapping_sources(archive)
             src_info += self.image_definition.data['archives'].get(archive['name'], [])
@@ -180,10 +265,7 @@ class SourceInfoGenerator:
 
     def _get_script_sources(self, profile=''):
         src_info: list = []
-        script_dirs = [
-            os.path.join(x, 'scripts') for x in self.image_definition.data_roots
-            if os.path.exists(os.path.join(x, 'scripts'))
-        ]
+        script_dirs = self.image_definition.get_script_dirs()
         script_sects = self.image_definition.data.get('config', []).copy()
         script_sects += self.image_definition.data.get('setup', [])
         for config_sect in script_sects:
@@ -192,5 +274,5 @@ class SourceInfoGenerator:
                 continue
             for ns, scriptlets in config_sect.get('scripts', {}).items():
                 for scriptlet in scriptlets:
-                    src_info += [script_utils.get_script_path(script_dirs, scriptlet)]
+                    src_info += [script_utils.get_script_path(script_dirs, scriptlet, self.image_definition.dir_cache)]
         return src_info
@@ -30,6 +30,9 @@ Usage:
         [--changelog-format=<format>]
         [--purge-stale-files=<true|false>]
         [--purge-ignore=<regex>]
+        [--profile=<true|false>]
+        [--profile-memory=<true|false>]
+        [--profile-trace=<file>]
     compose_kiwi_description -h | --help
     compose_kiwi_description --version
 
@@ -96,6 +99,20 @@ Options:
         When checking for old files to purge, ignore files matching <regex>
         (optional). [default: '']
 
+    --profile=<true|false>
+        If true, measure the time spent in the processing phases and print
+        a summary table to stderr when done. [default: false]
+
+    --profile-memory=<true|false>
+        If true, additionally trace memory allocations and report peak and
+        retained memory and the top allocation sites of populating the image
+        definition, schema validation, overlay packing and source info
+        writing. Implies --profile=true. [default: false]
+
+    --profile-trace=<file>
+        Write all measured phases to <file> in Chrome trace event format
+        (JSON). Implies --profile=true.
+
 """
 import docopt
 import itertools
@@ -107,6 +124,7 @@ import sys
 from datetime import datetime, timezone
 
 from kiwi_keg.version import __version__
+from kiwi_keg.profiler import profiler
 import kiwi_keg.tools.lib_changelog as lib_changelog
 import kiwi_keg.tools.lib_fileutil as lib_fileutil
 import kiwi_keg.tools.lib_image as lib_image
@@ -167,18 +185,20 @@ def generate_deleted_source_info(args, repos, image_version):
         lib_repo.checkout_start_commits(repos)
 
         logging.info('Generating previous image description')
-        lib_image.generate_image_description(
-            image_source=args['--image-source'],
-            repos=repos,
-            gen_src_log=True,
-            image_version=image_version,
-            gen_mbuild=False,
-            outdir=tmpdir,
-            archs=args['--arch']
-        )
+        with profiler.phase('previous image generation'):
+            lib_image.generate_image_description(
+                image_source=args['--image-source'],
+                repos=repos,
+                gen_src_log=True,
+                image_version=image_version,
+                gen_mbuild=False,
+                outdir=tmpdir,
+                archs=args['--arch']
+            )
 
         logging.info('Trying to detect deletions')
-        lib_source.find_deleted_src_lines(tmpdir, args['--outdir'])
+        with profiler.phase('deletion detection'):
+            lib_source.find_deleted_src_lines(tmpdir, args['--outdir'])
 
         lib_repo.checkout_head_commits(repos)
 
@@ -202,41 +222,65 @@ def generate_changelogs(args, image_version, rev_args, have_old_kiwi_config, log
 
     have_changes = False
     for source_log, flavor in lib_source.get_log_sources(args['--outdir']):
-        have_changes |= lib_changelog.generate_and_update(
-            outdir=args['--outdir'],
-            prefix=flavor,
-            log_ext=log_ext,
-            changes=change_entries,
-            source_log=source_log,
-            image_version=image_version,
-            rev_args=rev_args
-        )
+        with profiler.phase('changelog generation'):
+            have_changes |= lib_changelog.generate_and_update(
+                outdir=args['--outdir'],
+                prefix=flavor,
+                log_ext=log_ext,
+                changes=change_entries,
+                source_log=source_log,
+                image_version=image_version,
+                rev_args=rev_args
+            )
         # clean up source log file
         os.remove(source_log)
 
     return have_changes
 
 
+def report_profile(args):
+    profiler.disable()
+    profiler.print_report()
+    if args['--profile-trace']:
+        try:
+            profiler.write_trace(args['--profile-trace'])
+        except OSError as issue:
+            logging.error('Cannot write profile trace: {}'.format(issue))
+
+
 def main() -> None:
     args = docopt.docopt(__doc__, version=__version__)
 
+    profile_memory = args['--profile-memory'] == 'true'
+    if args['--profile'] == 'true' or profile_memory or args['--profile-trace']:
+        profiler.enable(memory=profile_memory)
+    try:
+        compose(args)
+    finally:
+        if profiler.enabled:
+            report_profile(args)
+
+
+def compose(args) -> None:
     handle_changelog = args['--update-changelogs'] == 'true'
     log_ext = get_changelog_format(args['--changelog-format'])
-    repos = get_repos(args)
+    with profiler.phase('repository checkout'):
+        repos = get_repos(args)
     image_version, have_old_kiwi_config = get_new_image_version(args)
 
     if not os.path.exists(args['--outdir']):
         os.mkdir(args['--outdir'])
 
-    lib_image.generate_image_description(
-        image_source=args['--image-source'],
-        repos=repos,
-        gen_src_log=handle_changelog,
-        image_version=image_version,
-        gen_mbuild=args['--generate-multibuild'] == 'true',
-        outdir=args['--outdir'],
-        archs=args['--arch']
-    )
+    with profiler.phase('image generation'):
+        lib_image.generate_image_description(
+            image_source=args['--image-source'],
+            repos=repos,
+            gen_src_log=handle_changelog,
+            image_version=image_version,
+            gen_mbuild=args['--generate-multibuild'] == 'true',
+            outdir=args['--outdir'],
+            archs=args['--arch']
+        )
 
     stale_files = lib_fileutil.purge_files(
         '.',
@@ -18,7 +18,9 @@
 
 """
 Usage: generate_recipes_changelog [-o OUTPUT_FILE] [-r REV]... [-f FORMAT]
-                                  [-m MSG_FORMAT] [-t ROOT_TAG] [-a AUTHOR_STRING] LOGFILE
+                                  [-m MSG_FORMAT] [-t ROOT_TAG] [-a AUTHOR_STRING]
+                                  [-j JOBS] [-d METHOD]
+                                  [--cache-dir=CACHE_DIR|--no-cache] LOGFILE
        generate_recipes_changelog -h | --help
 
 Arguments:
@@ -43,19 +45,71 @@ Options:
 
     -a AUTHOR_STRING
         Use AUTHOR_STRING (typically name + email) for OSC change log entries
+
+    -j JOBS
+        Run up to JOBS git queries in parallel [default: 1]
+
+    -d METHOD
+        Method to find commits changing line ranges, 'log' to use
+        'git log -L', or 'diff' to read the diff hunks of all commits once
+        per repository [default: log]
+
+    --cache-dir=CACHE_DIR
+        Directory of the persistent cache of commit lookups and commit
+        messages. Defaults to $XDG_CACHE_HOME/keg or ~/.cache/keg.
+
+    --no-cache
+        Do not read or write the persistent cache
 """
 
+import bisect
 import docopt
 import logging
 import json
+import os
+import re
 import subprocess
 import sys
+import tempfile
+import threading
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
+from kiwi_keg.file_utils import get_cache_dir
+
 log = logging.getLogger('generate_recipes_changelog')
 log.setLevel(logging.INFO)
 
+# Header of a diff hunk, line counts are omitted by git if they are 1
+HUNK_HEADER = re.compile(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+# Line header of git blame --porcelain output, with the commit hash and
+# the line number in the blamed revision
+BLAME_HEADER = re.compile(r'([0-9a-f]{40,64}) \d+ (\d+)(?: \d+)?')
+
+# Maximum number of -L options passed to a single git log call, keeps the
+# command line well below the system limit for large source logs
+MAX_RANGES_PER_LOG = 500
+
+# Maximum number of paths passed to a single git log call reading diff hunks
+MAX_FILES_PER_LOG = 500
+
+# Format placeholders taken from the commit object alone, messages using
+# other placeholders like refs, notes or relative dates are not cached
+CACHEABLE_PLACEHOLDERS = re.compile(r'%(?:[sbBnHTPf%]|[ac][net]|x[0-9a-fA-F]{2})')
+
+# Format of subject and body for the yaml and json output, the fields are
+# separated by a control character that does not occur in commit messages
+SUBJECT_BODY_FORMAT = '%s%x01%b'
+SUBJECT_BODY_SEPARATOR = '\x01'
+
+ATTRIBUTION_CACHE_VERSION = 2
+
+# Maximum number of entries kept in the attribution cache, the oldest
+# entries are dropped first
+MAX_CACHE_ENTRIES = 100000
+
 
 class MultiStr(str):
     pass
@@ -63,39 +117,411 @@ class MultiStr(str):
 
 class RangeFile:
     def __init__(self):
-        self.lines = []
+        # sorted, disjoint and non adjacent (start, end) line ranges
+        self.ranges = []
 
     def add_range(self, line_start, line_end):
-        self.lines += range(line_start, line_end + 1)
+        if line_end < line_start:
+            return
+        # merge with all ranges overlapping or adjacent to the new one
+        j = bisect.bisect_right(self.ranges, (line_end + 1, float('inf')))
+        i = j
+        while i > 0 and self.ranges[i - 1][1] >= line_start - 1:
+            i -= 1
+        if i < j:
+            line_start = min(line_start, self.ranges[i][0])
+            line_end = max(line_end, self.ranges[j - 1][1])
+        self.ranges[i:j] = [(line_start, line_end)]
 
     def get_ranges(self):
-        ranges = []
-        rstart = None
-        rend = None
-        for i in sorted(set(self.lines)):
-            if not rstart:
-                rstart = i
-                rend = i
-                continue
-            if i == rend + 1:
-                rend += 1
-            else:
-                ranges.append((rstart, rend))
-                rstart = i
-                rend = i
-        if rend:
-            ranges.append((rstart, rend))
-        return ranges
+        return list(self.ranges)
+
+
+class AttributionCache:
+    """
+    Persistent cache of commits attributed to line ranges and paths, and
+    of commit messages.
+
+    Commit lookups are keyed by the commit ids the revision range resolves
+    to, the path relative to the repository top level and the line range,
+    messages by commit hash and format. Entries refer to immutable git
+    objects only, so they are valid for any clone of the repository and
+    never need to be invalidated.
+
+    :param str cache_file: path of the cache file
+    """
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self._entries = self._read()
+        self._new_entries = {}
+        self._revisions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return cached value for key, None if there is none
+        """
+        with self._lock:
+            return self._entries.get(json.dumps(key))
+
+    def set(self, key, value):
+        """
+        Store value for key, written to the cache file by save
+        """
+        with self._lock:
+            self._entries[json.dumps(key)] = value
+            self._new_entries[json.dumps(key)] = value
+
+    def get_revision(self, gitroot, rev=None):
+        """
+        Return prefix of gitroot in its repository and the commit ids
+        of the revision range, resolved once per repository
+        """
+        with self._lock:
+            revision = self._revisions.get((gitroot, rev))
+        if revision is None:
+            revision = get_revision_key(gitroot, rev)
+            with self._lock:
+                self._revisions[(gitroot, rev)] = revision
+        return revision
+
+    def save(self):
+        """
+        Write new entries to the cache file
+        """
+        if not self._new_entries:
+            return
+        # merge with entries written by concurrent runs
+        entries = self._read()
+        for key, value in self._new_entries.items():
+            entries.pop(key, None)
+            entries[key] = value
+        while len(entries) > MAX_CACHE_ENTRIES:
+            del entries[next(iter(entries))]
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=cache_dir, delete=False) as cache:
+                json.dump({'version': ATTRIBUTION_CACHE_VERSION, 'entries': entries}, cache)
+            os.replace(cache.name, self.cache_file)
+        except OSError as issue:
+            log.warning('Cannot write attribution cache {}: {}'.format(self.cache_file, issue))
+        self._new_entries = {}
+
+    def _read(self):
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as cache:
+                content = json.load(cache)
+            if content.get('version') == ATTRIBUTION_CACHE_VERSION:
+                return content['entries']
+        except (OSError, ValueError, KeyError, AttributeError) as issue:
+            log.warning('Ignoring unreadable attribution cache {}: {}'.format(self.cache_file, issue))
+        return {}
+
+
+def get_revision_key(gitroot, rev=None):
+    # rev-parse resolves a revision range to the commit ids it includes
+    # and excludes, HEAD is used if no range is given
+    sp = subprocess.run(
+        args=['git', '-C', gitroot, 'rev-parse', '--show-prefix', rev or 'HEAD'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if sp.returncode != 0:
+        raise Exception('git exited with error "{}"'.format(sp.stderr))
+    lines = sp.stdout.decode('utf-8').split('\n')
+    return lines[0], [x for x in lines[1:] if x]
+
+
+def get_cached_commits(lookup, kind, items, gitroot, rev=None, cache=None):
+    # items are tuples ending with a path relative to gitroot, lookup
+    # returns the commits of each item in a dictionary and is only called
+    # for the items missing in the cache
+    if cache is None or rev == '':
+        return set().union(*lookup(items, gitroot, rev).values())
+    prefix, revision = cache.get_revision(gitroot, rev)
+    commits = set()
+    missing = {}
+    for item in items:
+        key = [kind, revision, prefix + item[-1]] + list(item[:-1])
+        cached = cache.get(key)
+        if cached is None:
+            missing[item] = key
+        else:
+            commits.update((ctime, chash, gitroot) for ctime, chash in cached)
+    if missing:
+        for item, item_commits in lookup(list(missing), gitroot, rev).items():
+            cache.set(missing[item], sorted([x[0], x[1]] for x in item_commits))
+            commits |= item_commits
+    return commits
+
+
+def get_range_commits(ranges, gitroot, rev=None):
+    # git log accepts multiple -L options and lists every commit touching
+    # any of the ranges, so a single call covers many files. Ranges of the
+    # same file given in one call are tracked as one range set by git,
+    # which can attribute other commits than tracking each range on its
+    # own, so every call gets at most one range per file.
+    if rev == '':
+        return {x: set() for x in ranges}
+    batches = []
+    file_ranges = {}
+    for start, end, filespec in ranges:
+        index = file_ranges.get(filespec, 0)
+        file_ranges[filespec] = index + 1
+        if index == len(batches):
+            batches.append([])
+        batches[index].append((start, end, filespec))
+    # file names in the diffs of git log -L are relative to the top level
+    prefix = get_repo_prefix(gitroot) if len(file_ranges) > 1 else ''
+    range_commits = {}
+    for batch in batches:
+        for i in range(0, len(batch), MAX_RANGES_PER_LOG):
+            range_commits.update(
+                get_commits_from_range_batch(batch[i:i + MAX_RANGES_PER_LOG], gitroot, rev, prefix)
+            )
+    return range_commits
+
+
+def get_commits_from_range_batch(ranges, gitroot, rev=None, prefix=''):
+    cmdargs = [
+        'git', '-C', gitroot, '-c', 'core.quotePath=false', 'log', '--no-merges', '--format=%x00%ct %H',
+        '--no-color', '--src-prefix=a/', '--dst-prefix=b/'
+    ]
+    if len(ranges) == 1:
+        cmdargs.append('--no-patch')
+    if rev:
+        cmdargs.append(rev)
+    cmdargs += [
+        '-L{start},{end}:{filespec}'.format(start=start, end=end, filespec=filespec)
+        for start, end, filespec in ranges
+    ]
+    try:
+        sp = subprocess.run(args=cmdargs, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if sp.returncode != 0:
+            raise Exception('git exited with error "{}"'.format(sp.stderr))
+        return assign_range_commits(sp.stdout.decode('utf-8', errors='replace'), ranges, gitroot, prefix)
+    except Exception as issue:
+        # Some git versions fail on particular combinations of ranges in
+        # one call, split the batch until the failing range is found alone
+        if len(ranges) == 1:
+            raise
+        log.debug(f'Batched git log failed, splitting batch of {len(ranges)} ranges: {issue}')
+        middle = len(ranges) // 2
+        range_commits = get_commits_from_range_batch(ranges[:middle], gitroot, rev, prefix)
+        range_commits.update(get_commits_from_range_batch(ranges[middle:], gitroot, rev, prefix))
+        return range_commits
+
+
+def assign_range_commits(output, ranges, gitroot, prefix=''):
+    # Assign the commits listed by git log -L to the ranges by the file
+    # names in the diff headers. Older commits show the old name of a
+    # renamed file, which is taken over at the commit renaming it.
+    if len(ranges) == 1:
+        return {ranges[0]: set(tuple(x.split() + [gitroot]) for x in output.split('\0') if x)}
+    names = {prefix + filespec: (start, end, filespec) for start, end, filespec in ranges}
+    range_commits = {x: set() for x in ranges}
+    for entry in output.split('\0')[1:]:
+        lines = entry.split('\n')
+        commit = tuple(lines[0].split() + [gitroot])
+        renames = []
+        old_name = None
+        for line in lines[1:]:
+            if line.startswith('diff --git '):
+                old_name = None
+            elif line.startswith('--- a/'):
+                old_name = line[6:].rstrip('\t')
+            elif line.startswith('+++ b/'):
+                new_name = line[6:].rstrip('\t')
+                if new_name not in names:
+                    raise Exception('cannot assign diff of "{}" to a range'.format(new_name))
+                range_commits[names[new_name]].add(commit)
+                if old_name and old_name != new_name:
+                    renames.append((new_name, old_name))
+        for new_name, old_name in renames:
+            if old_name in names:
+                raise Exception('cannot assign diff of "{}" to a range'.format(old_name))
+            names[old_name] = names.pop(new_name)
+    return range_commits
+
+
+def get_repo_prefix(gitroot):
+    sp = subprocess.run(
+        args=['git', '-C', gitroot, 'rev-parse', '--show-prefix'], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if sp.returncode != 0:
+        raise Exception('git exited with error "{}"'.format(sp.stderr))
+    return sp.stdout.decode('utf-8').rstrip('\n')
 
 
-def get_commits_from_range(start, end, filespec, gitroot, rev=None):
+def get_hunk_commits(ranges, gitroot, rev=None):
+    # Alternative to git log -L: read the zero context diffs of all commits
+    # changing the files in one history walk and track each range from the
+    # newest to the oldest commit the way git line-log does it
     if rev == '':
-        return set()
-    cmdargs = ['git', '-C', gitroot, 'log', '--no-merges', '--format=%ct %H', '--no-patch']
+        return {x: set() for x in ranges}
+    file_ranges = {}
+    for start, end, filespec in ranges:
+        file_ranges.setdefault(filespec, []).append((start, end, filespec))
+    filespecs = list(file_ranges)
+    range_commits = {}
+    for i in range(0, len(filespecs), MAX_FILES_PER_LOG):
+        range_commits.update(get_commits_from_hunk_batch(
+            {filespec: file_ranges[filespec] for filespec in filespecs[i:i + MAX_FILES_PER_LOG]}, gitroot, rev
+        ))
+    return range_commits
+
+
+def get_commits_from_hunk_batch(file_ranges, gitroot, rev=None):
+    # Diff options match the plain xdiff settings used by line-log, so both
+    # find the same hunks
+    cmdargs = [
+        'git', '-C', gitroot, '-c', 'core.quotePath=false', 'log', '--format=%x00%ct %H %P', '--patch',
+        '--unified=0', '--relative', '--no-color', '--no-ext-diff', '--no-renames', '--no-indent-heuristic',
+        '--diff-algorithm=myers'
+    ]
     if rev:
         cmdargs.append(rev)
-    cmdargs += ['-L{start},{end}:{filespec}'.format(start=start, end=end, filespec=filespec)]
-    return get_commits(cmdargs, gitroot)
+    cmdargs += ['--'] + list(file_ranges)
+    sp = subprocess.run(args=cmdargs, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if sp.returncode != 0:
+        raise Exception('git exited with error "{}"'.format(sp.stderr))
+    diff_headers = {'diff --git a/{0} b/{0}'.format(filespec): filespec for filespec in file_ranges}
+    tracked = {
+        filespec: [(x, [(x[0] - 1, x[1])]) for x in ranges] for filespec, ranges in file_ranges.items()
+    }
+    range_commits = {x: set() for ranges in file_ranges.values() for x in ranges}
+    created = {}
+    for entry in sp.stdout.decode('utf-8', errors='replace').split('\0')[1:]:
+        lines = entry.split('\n')
+        fields = lines[0].split()
+        if len(fields) > 3:
+            # Ranges cannot be mapped across both sides of a merge by
+            # following the linear log, leave these files to git log -L
+            log.debug(f'History of {gitroot} contains merges, using git log -L')
+            return get_range_commits(list(range_commits), gitroot, rev)
+        file_hunks = {}
+        hunks = []
+        filespec = None
+        for line in lines[1:]:
+            if line.startswith('diff '):
+                filespec = diff_headers.get(line)
+                hunks = file_hunks.setdefault(filespec, [])
+            elif line == '--- /dev/null' and filespec in tracked and not hunks and len(fields) == 3:
+                created.setdefault(fields[1], []).append(filespec)
+            else:
+                match = HUNK_HEADER.match(line)
+                if match:
+                    hunks.append(get_hunk_ranges(*match.groups()))
+        for filespec, hunks in file_hunks.items():
+            if filespec not in tracked:
+                continue
+            parent_ranges = []
+            for tracked_range, range_set in tracked[filespec]:
+                touched, range_set = map_ranges_to_parent(range_set, hunks)
+                if touched:
+                    range_commits[tracked_range].add((fields[0], fields[1], gitroot))
+                if range_set:
+                    parent_ranges.append((tracked_range, range_set))
+            if parent_ranges:
+                tracked[filespec] = parent_ranges
+            else:
+                del tracked[filespec]
+        if not tracked:
+            break
+    if created:
+        # git log -L follows a file to its previous name if it was renamed
+        # by the commit adding it, which the diffs of the current path do
+        # not show, leave the ranges of renamed files to git log -L
+        renamed = get_renamed_files(created, gitroot)
+        if renamed:
+            log.info(f'{len(renamed)} of the tracked files in {gitroot} were renamed, using git log -L for them')
+            range_commits.update(get_range_commits(
+                [x for filespec in renamed for x in file_ranges[filespec]], gitroot, rev
+            ))
+    return range_commits
+
+
+def get_renamed_files(created, gitroot):
+    # Detect renames in the commits adding the files the same way git log -L
+    # does, against the whole tree of the parent commit. Paths in the
+    # name-status output are relative to the top level of the repository.
+    prefix = get_repo_prefix(gitroot)
+    cmdargs = [
+        'git', '-C', gitroot, '-c', 'core.quotePath=false', 'log', '--no-walk=unsorted', '--stdin',
+        '--format=%x00%H', '--name-status', '-M', '--no-color'
+    ]
+    sp = subprocess.run(
+        args=cmdargs, input='\n'.join(created).encode('utf-8'), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if sp.returncode != 0:
+        raise Exception('git exited with error "{}"'.format(sp.stderr))
+    renamed = []
+    for entry in sp.stdout.decode('utf-8', errors='replace').split('\0')[1:]:
+        lines = entry.split('\n')
+        filespecs = created.get(lines[0], [])
+        for line in lines[1:]:
+            fields = line.split('\t')
+            if fields[0].startswith('R') and len(fields) == 3 and fields[2].startswith(prefix):
+                filespec = fields[2][len(prefix):]
+                if filespec in filespecs:
+                    renamed.append(filespec)
+    return renamed
+
+
+def get_hunk_ranges(parent_start, parent_count, target_start, target_count):
+    # Convert a hunk header to zero based, half open parent and target
+    # ranges. An empty range is located after the line given in the header.
+    ranges = []
+    for start, count in [(parent_start, parent_count), (target_start, target_count)]:
+        count = 1 if count is None else int(count)
+        start = int(start) if count == 0 else int(start) - 1
+        ranges += [start, start + count]
+    return tuple(ranges)
+
+
+def map_ranges_to_parent(ranges, hunks):
+    # Follows range_set_map_across_diff of git line-log: find the hunks
+    # touching the ranges, move the untouched parts of the ranges by the
+    # line offset of preceding hunks and add the parent side of touched
+    # hunks. Ranges and hunks are sorted, zero based and half open.
+    touched = []
+    j = 0
+    for hunk in hunks:
+        while j < len(ranges) and hunk[2] > ranges[j][1]:
+            j += 1
+        if j == len(ranges):
+            break
+        if not (hunk[3] <= ranges[j][0] or ranges[j][1] <= hunk[2]):
+            touched.append(hunk)
+    untouched = []
+    for start, end in ranges:
+        for hunk in touched:
+            if hunk[3] <= start or hunk[2] >= end:
+                continue
+            if hunk[2] > start:
+                untouched.append((start, hunk[2]))
+            start = max(start, hunk[3])
+        if start < end:
+            untouched.append((start, end))
+    parent_ranges = [(hunk[0], hunk[1]) for hunk in touched]
+    j = 0
+    offset = 0
+    for start, end in untouched:
+        while j < len(hunks) and start >= hunks[j][2]:
+            offset += (hunks[j][1] - hunks[j][0]) - (hunks[j][3] - hunks[j][2])
+            j += 1
+        parent_ranges.append((start + offset, end + offset))
+    merged = []
+    for start, end in sorted(parent_ranges):
+        if start == end:
+            continue
+        if merged and merged[-1][1] >= start:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return bool(touched), merged
 
 
 def get_commits_from_path(pathspec, gitroot, rev=None):
@@ -109,15 +535,11 @@ def get_commits_from_path(pathspec, gitroot, rev=None):
     return get_commits(cmdargs, gitroot)
 
 
-def get_deletion_commit(line_no, filespec, gitroot, rev):
-    # To find a commit that deleted a line, use git blame to find the last commit
-    # that still had the line in question.
-    cmdargs = ['git', '-C', gitroot, 'blame', '--no-merges', '--reverse', rev, '-L', f'{line_no},{line_no}', '--', filespec]
-    sp = subprocess.run(args=cmdargs, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if sp.returncode != 0:
-        raise Exception('git exited with error "{}"'.format(sp.stderr))
-    last_commit_with_line = sp.stdout.decode('utf-8').split(' ')[0].lstrip('^')
+def get_path_commits(paths, gitroot, rev=None):
+    return {path: get_commits_from_path(path[0], gitroot, rev) for path in paths}
+
 
+def get_next_commit(last_commit_with_line, line_no, filespec, gitroot):
     # Find the next commit in line, assuming that it is the one that deleted the line.
     cmdargs = ['git', '-C', gitroot, 'log', '--format=%ct %H', last_commit_with_line + '..', '--', filespec]
     sp = subprocess.run(args=cmdargs, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -132,6 +554,97 @@ def get_deletion_commit(line_no, filespec, gitroot, rev):
     return tuple(deletion_commit.split() + [gitroot])
 
 
+def get_deletion_commits(file_lines, gitroot, rev):
+    # Find the commits deleting the lines of a repository: one reverse blame
+    # per file finds the last commit that still had each line, and one walk
+    # over the history the next commit changing the file after it, which is
+    # assumed to be the one that deleted the line
+    last_commits = {}
+    for filespec, line_nos in file_lines.items():
+        for line_no, last_commit in get_last_commits_with_lines(line_nos, filespec, gitroot, rev).items():
+            last_commits.setdefault((filespec, last_commit), []).append(line_no)
+    history = get_commit_history(gitroot, rev)
+    positions = {}
+    file_positions = {}
+    for index, (_, chash, files) in enumerate(history or []):
+        positions[chash] = index
+        for filespec in files:
+            file_positions.setdefault(filespec, []).append(index)
+    commits = set()
+    for (filespec, last_commit), line_nos in last_commits.items():
+        if last_commit not in positions:
+            # History is not linear or the commit is not in the history of
+            # HEAD, ask git for this commit and file
+            deletion_commit = get_next_commit(last_commit, line_nos[0], filespec, gitroot)
+            if deletion_commit:
+                commits.add(deletion_commit)
+            continue
+        # The history is ordered from new to old, the deletion commit is
+        # the oldest commit changing the file after the last commit
+        index = bisect.bisect_left(file_positions.get(filespec, []), positions[last_commit]) - 1
+        if index < 0:
+            for line_no in line_nos:
+                log.debug(f'Source log indicates {filespec}:{line_no} was deleted but cannot find commit')
+            continue
+        commit = history[file_positions[filespec][index]]
+        commits.add((commit[0], commit[1], gitroot))
+    return commits
+
+
+def get_last_commits_with_lines(line_nos, filespec, gitroot, rev):
+    # Reverse blame all lines of a file in one call, consecutive lines are
+    # passed as one range
+    ranges = []
+    for line_no in sorted(set(line_nos)):
+        if ranges and ranges[-1][1] == line_no - 1:
+            ranges[-1][1] = line_no
+        else:
+            ranges.append([line_no, line_no])
+    cmdargs = ['git', '-C', gitroot, 'blame', '--no-merges', '--reverse', '--porcelain', rev]
+    cmdargs += ['-L{},{}'.format(start, end) for start, end in ranges]
+    cmdargs += ['--', filespec]
+    sp = subprocess.run(args=cmdargs, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if sp.returncode != 0:
+        raise Exception('git exited with error "{}"'.format(sp.stderr))
+    last_commits = {}
+    for line in sp.stdout.decode('utf-8', errors='replace').splitlines():
+        match = BLAME_HEADER.fullmatch(line)
+        if match:
+            last_commits[int(match.group(2))] = match.group(1)
+    return last_commits
+
+
+def get_commit_history(gitroot, rev):
+    # Return all commits from HEAD back to the start of rev, including the
+    # boundary commits, with the files they change, from new to old. None
+    # is returned if the history is not linear.
+    sp = subprocess.run(
+        args=['git', '-C', gitroot, 'rev-parse', rev], stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if sp.returncode != 0:
+        raise Exception('git exited with error "{}"'.format(sp.stderr))
+    excludes = [x for x in sp.stdout.decode('utf-8').split() if x.startswith('^')]
+    cmdargs = [
+        'git', '-C', gitroot, '-c', 'core.quotePath=false', 'log', '--format=%x00%m%ct %H %P', '--name-only',
+        '--relative', '--no-renames', '--boundary', 'HEAD'
+    ] + excludes
+    sp = subprocess.run(args=cmdargs, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if sp.returncode != 0:
+        raise Exception('git exited with error "{}"'.format(sp.stderr))
+    history = []
+    for entry in sp.stdout.decode('utf-8', errors='replace').split('\0')[1:]:
+        lines = entry.split('\n')
+        fields = lines[0][1:].split()
+        if lines[0].startswith('-'):
+            history.append((fields[0], fields[1], set()))
+        elif len(fields) > 3:
+            log.debug(f'History of {gitroot} contains merges, looking up deletion commits one by one')
+            return None
+        else:
+            history.append((fields[0], fields[1], set(x for x in lines[1:] if x)))
+    return history
+
+
 def get_commits(gitargs, gitroot):
     sp = subprocess.run(args=gitargs, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if sp.returncode != 0:
@@ -140,12 +653,40 @@ def get_commits(gitargs, gitroot):
     return set(tuple(x.split() + [gitroot]) for x in commit_lines)
 
 
-def get_commit_message(chash, gitroot, msgformat):
-    gitargs = ['git', '-C', gitroot, 'show', '--no-patch', '--format={}'.format(msgformat), chash]
-    sp = subprocess.run(args=gitargs, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if sp.returncode != 0:
-        raise Exception('git exited with error "{}"'.format(sp.stderr))
-    return sp.stdout.decode('utf-8').rstrip('\n')
+def is_cacheable_format(msgformat):
+    return '%' not in CACHEABLE_PLACEHOLDERS.sub('', msgformat)
+
+
+def get_commit_messages(commits, msgformat, cache=None):
+    # Format all commits of a repository with one git log call reading the
+    # hashes from stdin, -z separates the messages by NUL characters
+    if cache and not is_cacheable_format(msgformat):
+        cache = None
+    hashes = {}
+    messages = {}
+    for commit in commits:
+        message = cache.get(['message', msgformat, commit[1]]) if cache else None
+        if message is None:
+            hashes.setdefault(commit[2], set()).add(commit[1])
+        else:
+            messages[(commit[1], commit[2])] = message
+    for gitroot, chashes in hashes.items():
+        gitargs = [
+            'git', '-C', gitroot, 'log', '--no-walk=unsorted', '--stdin', '-z', '--format=%H%n{}'.format(msgformat)
+        ]
+        sp = subprocess.run(
+            args=gitargs, input='\n'.join(sorted(chashes)).encode('utf-8'),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        if sp.returncode != 0:
+            raise Exception('git exited with error "{}"'.format(sp.stderr))
+        for entry in sp.stdout.decode('utf-8').split('\0'):
+            if entry:
+                chash, _, message = entry.partition('\n')
+                messages[(chash, gitroot)] = message.rstrip('\n')
+                if cache:
+                    cache.set(['message', msgformat, chash], messages[(chash, gitroot)])
+    return messages
 
 
 def git_log_empty(gitroot, rev):
@@ -154,6 +695,20 @@ def git_log_empty(gitroot, rev):
     return commits == set()
 
 
+def run_queries(queries, jobs):
+    # Queries are independent read-only git calls, results are merged in
+    # query order so the outcome does not depend on the number of jobs
+    if jobs > 1 and len(queries) > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(lambda query: query[0](*query[1]), queries))
+    else:
+        results = [query[0](*query[1]) for query in queries]
+    commits = set()
+    for result in results:
+        commits |= result
+    return commits
+
+
 def repr_mstr(dumper, data):
     tag = u'tag:yaml.org,2002:str'
     return dumper.represent_scalar(tag, data, style='|')
@@ -176,6 +731,12 @@ def main():
     if args['-f'] not in ['text', 'yaml', 'json', 'osc']:
         sys.exit('Unsupported output format "{}".'.format(args['-f']))
 
+    if not args['-j'].isdigit() or int(args['-j']) < 1:
+        sys.exit('Invalid number of jobs "{}".'.format(args['-j']))
+
+    if args['-d'] not in ['log', 'diff']:
+        sys.exit('Unsupported detection method "{}".'.format(args['-d']))
+
     with open(args['LOGFILE'], 'r') as inf:
         sources = inf.read().splitlines()
 
@@ -189,9 +750,14 @@ def main():
             if git_log_empty(*fields):
                 revisions[fields[0]] = ''
 
-    commits = set()
+    cache = None
+    if not args['--no-cache']:
+        cache = AttributionCache(os.path.join(args['--cache-dir'] or get_cache_dir(), 'changelog.json'))
+
+    queries = []
     roots = []
     range_files = {}
+    deleted_lines = {}
 
     for source in sources:
         if source.startswith('root:'):
@@ -206,19 +772,32 @@ def main():
         elif source.startswith('deleted:'):
             rspec = source.split(':', 2)
             gitroot, fpath = split_path(rspec[2], roots)
-            rev = revisions.get(gitroot)
-            if rev:
-                del_commit = get_deletion_commit(rspec[1], fpath, gitroot, rev)
-                if del_commit:
-                    commits.add(del_commit)
+            if revisions.get(gitroot):
+                deleted_lines.setdefault(gitroot, {}).setdefault(fpath, []).append(int(rspec[1]))
         else:
             gitroot, fpath = split_path(source, roots)
-            commits |= get_commits_from_path(fpath, gitroot, revisions.get(gitroot))
+            queries.append(
+                (get_cached_commits, (get_path_commits, 'path', [(fpath,)], gitroot, revisions.get(gitroot), cache))
+            )
 
+    repo_ranges = {}
     for f in range_files:
         gitroot, fpath = split_path(f, roots)
-        for r in range_files[f].get_ranges():
-            commits |= get_commits_from_range(r[0], r[1], fpath, gitroot, revisions.get(gitroot))
+        repo_ranges.setdefault(gitroot, []).extend(
+            (r[0], r[1], fpath) for r in range_files[f].get_ranges()
+        )
+    # results are cached per detection method, so a difference between
+    # the methods cannot carry over from one to the other
+    lookup = get_hunk_commits if args['-d'] == 'diff' else get_range_commits
+    for gitroot, ranges in repo_ranges.items():
+        queries.append(
+            (get_cached_commits, (lookup, 'range-' + args['-d'], ranges, gitroot, revisions.get(gitroot), cache))
+        )
+
+    for gitroot, file_lines in deleted_lines.items():
+        queries.append((get_deletion_commits, (file_lines, gitroot, revisions[gitroot])))
+
+    commits = run_queries(queries, int(args['-j']))
 
     if args['-o']:
         outp = open(args['-o'], 'w')
@@ -226,13 +805,16 @@ def main():
         outp = sys.stdout
 
     if args['-f'] == 'text':
+        messages = get_commit_messages(commits, args['-m'], cache)
         for commit in sorted(commits, reverse=True):
-            print(get_commit_message(commit[1], commit[2], args['-m']), file=outp)
+            print(messages[(commit[1], commit[2])], file=outp)
     else:
+        messages = get_commit_messages(commits, SUBJECT_BODY_FORMAT, cache)
         msgs = []
         for commit in sorted(commits, reverse=True):
-            sub = get_commit_message(commit[1], commit[2], '%s').lstrip('- ')
-            body = MultiStr(get_commit_message(commit[1], commit[2], '%b').rstrip('\n'))
+            sub, _, body = messages[(commit[1], commit[2])].partition(SUBJECT_BODY_SEPARATOR)
+            sub = sub.lstrip('- ')
+            body = MultiStr(body.rstrip('\n'))
             if body:
                 msgs.append(
                     {
@@ -276,6 +858,9 @@ def main():
     if args['-o']:
         outp.close()
 
+    if cache:
+        cache.save()
+
     if not commits:
         sys.exit(2)
 
@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with keg. If not, see <http://www.gnu.org/licenses/>
 #
+import bisect
 import glob
 import os
 import logging
@@ -48,12 +49,48 @@ class SourcesFile:
                     self.roots.append(line[line.find(':') + 1:])
                 elif line.startswith('range:'):
                     self.ranges.append(Range(line, self.roots))
+        self._build_index()
 
-    def line_covered(self, line_number, line_file, line_root):
+    def _build_index(self):
+        # per source file, sorted start and end lines of the merged ranges
+        file_ranges = {}
         for r in self.ranges:
-            if r.line_covered(line_number, line_file, line_root):
-                return True
-        return False
+            file_ranges.setdefault((r.src_root, r.src_file), []).append((r.range_start, r.range_end))
+        self.index = {}
+        for key, ranges in file_ranges.items():
+            starts = []
+            ends = []
+            for range_start, range_end in sorted(ranges):
+                if ends and range_start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], range_end)
+                else:
+                    starts.append(range_start)
+                    ends.append(range_end)
+            self.index[key] = (starts, ends)
+
+    def line_covered(self, line_number, line_file, line_root):
+        starts, ends = self.index.get((line_root, line_file), ([], []))
+        i = bisect.bisect_right(starts, line_number) - 1
+        return i >= 0 and line_number <= ends[i]
+
+    def get_uncovered_ranges(self, range_start, range_end, line_file, line_root):
+        """
+        Return list of (start, end) tuples of the lines between range_start
+        and range_end that are not covered by any range
+        """
+        uncovered = []
+        starts, ends = self.index.get((line_root, line_file), ([], []))
+        i = max(bisect.bisect_right(starts, range_start) - 1, 0)
+        current = range_start
+        while current <= range_end and i < len(starts) and starts[i] <= range_end:
+            if ends[i] >= current:
+                if starts[i] > current:
+                    uncovered.append((current, starts[i] - 1))
+                current = ends[i] + 1
+            i += 1
+        if current <= range_end:
+            uncovered.append((current, range_end))
+        return uncovered
 
 
 def get_log_sources(logdir):
@@ -97,6 +134,7 @@ def find_deleted_src_lines(old_log_dir, new_log_dir):
                 elif line.startswith('range:'):
                     range_mark, range_start, range_end, src_path = line.split(':', 3)
                     src_root, src_file = get_root_and_fname(src_path, roots)
-                    for line_no in range(int(range_start), int(range_end) + 1):
-                        if not new_srcs.line_covered(line_no, src_file, src_root):
+                    uncovered = new_srcs.get_uncovered_ranges(int(range_start), int(range_end), src_file, src_root)
+                    for uncovered_start, uncovered_end in uncovered:
+                        for line_no in range(uncovered_start, uncovered_end + 1):
                             new_log.write('deleted:{}:{}\n'.format(line_no, src_path))
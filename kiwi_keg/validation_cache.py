@@ -0,0 +1,141 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import logging
+import os
+import tempfile
+from typing import (
+    Callable, Dict, Optional
+)
+
+from kiwi_keg.exceptions import KegKiwiValidationError
+from kiwi_keg.version import __version__
+
+log = logging.getLogger('keg')
+
+VALIDATION_CACHE_VERSION = 1
+MAX_ENTRIES = 512
+
+
+class ValidationCache:
+    """
+    Persistent cache of KIWI validation results.
+
+    Results are keyed by a hash of the description file content, the
+    installed kiwi version and the content of the kiwi RelaxNG schema, so
+    an entry can only be hit by a byte-identical description validated
+    against the same schema. Both positive and negative results are
+    cached, a cached failure is raised again as KegKiwiValidationError.
+
+    :param str cache_file: path of the cache file
+    """
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        self._entries: Dict[str, Dict] = self._read()
+        self._schema_id: Optional[bytes] = None
+
+    def validate(self, description_file: str, validate: Callable[[], None]) -> None:
+        """
+        Validate description_file using the cached result if available,
+        otherwise call validate and cache its result.
+
+        :param str description_file: path of the KIWI description
+        :param callable validate:
+            function validating description_file, raising
+            KegKiwiValidationError if it is invalid
+        """
+        if not os.path.isfile(description_file):
+            validate()
+            return
+        key = self.get_key(description_file)
+        entry = self._entries.get(key)
+        if entry is not None:
+            log.info('KIWI description unchanged since last validation, using cached result')
+            if entry['error']:
+                raise KegKiwiValidationError(entry['error'])
+            return
+        try:
+            validate()
+        except KegKiwiValidationError as issue:
+            self._set(key, format(issue))
+            raise
+        self._set(key, None)
+
+    def get_key(self, description_file: str) -> str:
+        """
+        Return cache key for given description file
+        """
+        digest = hashlib.sha256()
+        with open(description_file, 'rb') as description:
+            digest.update(description.read())
+        digest.update(b'\0')
+        digest.update(self._get_schema_id())
+        return digest.hexdigest()
+
+    def _get_schema_id(self) -> bytes:
+        if self._schema_id is None:
+            # avoid importing kiwi, which takes longer than the validation
+            # cache is supposed to save on a hit
+            digest = hashlib.sha256()
+            try:
+                digest.update(importlib.metadata.version('kiwi').encode('utf-8'))
+            except importlib.metadata.PackageNotFoundError:
+                pass
+            spec = importlib.util.find_spec('kiwi')
+            locations = spec.submodule_search_locations if spec and spec.submodule_search_locations else []
+            for location in locations:
+                schema_file = os.path.join(location, 'schema', 'kiwi.rng')
+                if os.path.isfile(schema_file):
+                    with open(schema_file, 'rb') as schema:
+                        digest.update(schema.read())
+            self._schema_id = digest.digest()
+        return self._schema_id
+
+    def _set(self, key: str, error: Optional[str]) -> None:
+        # merge with entries written by concurrent keg processes
+        entries = self._read()
+        entries[key] = {'error': error}
+        while len(entries) > MAX_ENTRIES:
+            del entries[next(iter(entries))]
+        self._entries = entries
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_file))
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=cache_dir, delete=False) as cache:
+                json.dump(
+                    {'version': VALIDATION_CACHE_VERSION, 'keg': __version__, 'entries': entries},
+                    cache
+                )
+            os.replace(cache.name, self.cache_file)
+        except OSError as issue:
+            log.warning('Cannot write validation cache {}: {}'.format(self.cache_file, issue))
+
+    def _read(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as cache:
+                content = json.load(cache)
+            if content.get('version') == VALIDATION_CACHE_VERSION and content.get('keg') == __version__:
+                return content['entries']
+        except (OSError, ValueError, KeyError, AttributeError) as issue:
+            log.warning('Ignoring unreadable validation cache {}: {}'.format(self.cache_file, issue))
+        return {}
@@ -0,0 +1,241 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+"""
+Benchmark the keg generation pipeline on a synthetic recipes tree.
+
+Each image of the scenario is processed the way keg -s does it, the time of
+every stage is summed up over all images and the best of all repetitions is
+reported. Results can be saved as JSON and compared against a baseline
+produced by an earlier commit.
+
+A baseline of the medium scenario without KIWI validation is kept in
+baseline/recipes_medium.json and used by 'tox -e benchmark' by default.
+Absolute timings depend on the machine, so before judging a change,
+recreate the baseline on the same machine from the commit the change is
+based on:
+
+    git checkout <base commit>
+    python run_benchmarks.py --no-kiwi-validation \
+        --output=baseline/recipes_medium.json
+    git checkout <change>
+    python run_benchmarks.py --no-kiwi-validation \
+        --compare=baseline/recipes_medium.json
+
+The committed baseline is updated together with changes that are
+expected to change the timings.
+
+Usage: run_benchmarks.py [--scenario=NAME] [--param=KEY=VALUE]... [--repeat=N]
+                         [--no-kiwi-validation] [--output=FILE]
+                         [--compare=FILE] [--threshold=PERCENT]
+       run_benchmarks.py -h | --help
+
+Options:
+    --scenario=NAME
+        Recipes size, 'small', 'medium' or 'large' [default: medium]
+
+    --param=KEY=VALUE
+        Override a scenario parameter (images, include_depth, namespaces,
+        packages, scripts, overlay_files, profiles)
+
+    --repeat=N
+        Number of repetitions [default: 3]
+
+    --no-kiwi-validation
+        Skip the KIWI validation stage
+
+    --output=FILE
+        Write results to FILE in JSON format, e.g. to create a baseline
+
+    --compare=FILE
+        Compare results with the baseline in FILE and exit with status 1
+        if any stage got slower than the threshold allows
+
+    --threshold=PERCENT
+        Allowed slow down per stage before it counts as regression
+        [default: 10]
+"""
+import docopt
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from kiwi_keg.generator import KegGenerator
+from kiwi_keg.image_definition import KegImageDefinition
+from kiwi_keg.profiler import profiler
+from kiwi_keg.source_info_generator import SourceInfoGenerator
+from kiwi_keg.version import __version__
+
+from synthetic_recipes import SCENARIOS, create_recipes
+
+RESULTS_VERSION = 1
+
+# Slow downs below this many seconds are measurement noise, they do not
+# count as regression whatever the percentage
+MIN_REGRESSION = 0.01
+
+
+def get_params(args):
+    if args['--scenario'] not in SCENARIOS:
+        sys.exit('Unknown scenario "{}"'.format(args['--scenario']))
+    params = dict(SCENARIOS[args['--scenario']])
+    for param in args['--param']:
+        key, _, value = param.partition('=')
+        if key not in params or not value.isdigit():
+            sys.exit('Invalid parameter "{}"'.format(param))
+        params[key] = int(value)
+    return params
+
+
+def run_image(recipes_root, image_source, kiwi_validation, timings):
+    """
+    Generate one image with source info and add the time spent in each
+    stage to timings
+    """
+    @contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as dest_dir:
+        with stage('total'):
+            with stage('populate'):
+                image_definition = KegImageDefinition(
+                    image_name=image_source,
+                    recipes_roots=[recipes_root],
+                    track_sources=True
+                )
+                image_generator = KegGenerator(
+                    image_definition=image_definition,
+                    dest_dir=dest_dir
+                )
+            with stage('create_kiwi_description'):
+                image_generator.create_kiwi_description()
+            if kiwi_validation:
+                with stage('validate_kiwi_description'):
+                    image_generator.validate_kiwi_description()
+            with stage('create_custom_scripts'):
+                image_generator.create_custom_scripts()
+            with stage('create_overlays'):
+                image_generator.create_overlays()
+            with stage('create_multibuild_file'):
+                image_generator.create_multibuild_file()
+            with stage('write_source_info'):
+                SourceInfoGenerator(
+                    image_definition=image_definition,
+                    dest_dir=dest_dir
+                ).write_source_info()
+
+
+def run_benchmarks(params, repeat, kiwi_validation):
+    """
+    Run all images of a synthetic recipes tree repeat times, return best
+    time per stage and per profiler phase
+    """
+    stages = {}
+    phases = {}
+    with tempfile.TemporaryDirectory() as recipes_root:
+        image_sources = create_recipes(recipes_root, **params)
+        for _ in range(repeat):
+            timings = {}
+            profiler.enable()
+            for image_source in image_sources:
+                run_image(recipes_root, image_source, kiwi_validation, timings)
+            profiler.disable()
+            for name, value in timings.items():
+                stages[name] = min(stages.get(name, value), value)
+            for phase in profiler.get_summary():
+                phases[phase['name']] = min(phases.get(phase['name'], phase['total']), phase['total'])
+    return stages, phases
+
+
+def print_results(results, baseline=None):
+    print('{:28s} {:>10s} {:>10s} {:>8s}'.format('Stage', 'Time[s]', 'Base[s]', 'Change'))
+    for section in ['stages', 'phases']:
+        for name, value in results[section].items():
+            base = baseline[section].get(name) if baseline else None
+            if base:
+                print('{:28s} {:10.4f} {:10.4f} {:+7.1f}%'.format(name, value, base, 100 * (value - base) / base))
+            else:
+                print('{:28s} {:10.4f}'.format(name, value))
+        print()
+
+
+def get_regressions(results, baseline, threshold):
+    """
+    Return names of stages that got slower than allowed by threshold
+    """
+    regressions = []
+    for name, value in results['stages'].items():
+        base = baseline['stages'].get(name)
+        if base and value > base * (1 + threshold / 100) and value - base > MIN_REGRESSION:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    args = docopt.docopt(__doc__)
+    for logger in ['keg', 'kiwi']:
+        logging.getLogger(logger).setLevel(logging.WARNING)
+    params = get_params(args)
+
+    baseline = None
+    if args['--compare']:
+        with open(args['--compare']) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('version') != RESULTS_VERSION:
+            sys.exit('Unsupported baseline format in {}'.format(args['--compare']))
+        if baseline['params'] != params:
+            print('Warning: baseline was created with different parameters {}'.format(baseline['params']))
+        if baseline.get('kiwi_validation', True) != (not args['--no-kiwi-validation']):
+            print('Warning: baseline was created {} KIWI validation'.format(
+                'with' if baseline.get('kiwi_validation', True) else 'without'
+            ))
+
+    stages, phases = run_benchmarks(params, int(args['--repeat']), not args['--no-kiwi-validation'])
+    results = {
+        'version': RESULTS_VERSION,
+        'keg': __version__,
+        'python': platform.python_version(),
+        'scenario': args['--scenario'],
+        'params': params,
+        'repeat': int(args['--repeat']),
+        'kiwi_validation': not args['--no-kiwi-validation'],
+        'stages': stages,
+        'phases': phases
+    }
+    print_results(results, baseline)
+
+    if args['--output']:
+        with open(args['--output'], 'w') as output:
+            json.dump(results, output, indent=2)
+            output.write('\n')
+
+    if baseline:
+        regressions = get_regressions(results, baseline, float(args['--threshold']))
+        if regressions:
+            print('Regressions above {}%: {}'.format(args['--threshold'], ', '.join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+"""
+Benchmark the change log tools on synthetic git histories.
+
+Throwaway repositories are created with a random history, source logs for
+the start and head revisions are derived from them. The benchmark runs
+lib_source.find_deleted_src_lines on these logs and then
+generate_recipes_changelog on the resulting head log, and reports wall
+time and number of spawned subprocesses of each. A digest of the generated
+change log is reported as well, to check that optimizations do not change
+the result. The persistent cache of generate_recipes_changelog is disabled,
+so every repetition measures a cold run and the user's cache is left alone.
+
+Usage: run_changelog_benchmarks.py [--scenario=NAME] [--param=KEY=VALUE]...
+                                   [--repeat=N] [--format=FORMAT]
+                                   [--tool-arg=ARG]... [--output=FILE]
+                                   [--compare=FILE] [--threshold=PERCENT]
+       run_changelog_benchmarks.py -h | --help
+
+Options:
+    --scenario=NAME
+        History size, 'small', 'medium' or 'large' [default: medium]
+
+    --param=KEY=VALUE
+        Override a scenario parameter (repos, commits, files, lines, ranges,
+        deleted_ranges)
+
+    --repeat=N
+        Number of repetitions [default: 3]
+
+    --format=FORMAT
+        Change log format passed to generate_recipes_changelog [default: json]
+
+    --tool-arg=ARG
+        Additional argument passed to generate_recipes_changelog, e.g. to
+        select an alternative implementation
+
+    --output=FILE
+        Write results to FILE in JSON format, e.g. to create a baseline
+
+    --compare=FILE
+        Compare results with the baseline in FILE and exit with status 1 if
+        a tool got slower than the threshold allows or its output changed
+
+    --threshold=PERCENT
+        Allowed slow down per tool before it counts as regression
+        [default: 10]
+"""
+import docopt
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from kiwi_keg.tools import generate_recipes_changelog
+from kiwi_keg.tools import lib_source
+from kiwi_keg.version import __version__
+
+from synthetic_git import SCENARIOS, create_repos, write_source_logs
+
+RESULTS_VERSION = 1
+
+
+class SubprocessCounter:
+    """
+    Count processes started through subprocess while active
+    """
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def active(self):
+        original_popen = subprocess.Popen
+        counter = self
+
+        class CountingPopen(original_popen):  # type: ignore
+            def __init__(self, *args, **kwargs):
+                with counter._lock:
+                    counter.count += 1
+                super().__init__(*args, **kwargs)
+
+        subprocess.Popen = CountingPopen  # type: ignore
+        try:
+            yield self
+        finally:
+            subprocess.Popen = original_popen  # type: ignore
+
+
+def get_params(args):
+    if args['--scenario'] not in SCENARIOS:
+        sys.exit('Unknown scenario "{}"'.format(args['--scenario']))
+    params = dict(SCENARIOS[args['--scenario']])
+    for param in args['--param']:
+        key, _, value = param.partition('=')
+        if key not in params or not value.isdigit():
+            sys.exit('Invalid parameter "{}"'.format(param))
+        params[key] = int(value)
+    return params
+
+
+def run_find_deleted(old_log_dir, new_log_dir, work_dir):
+    """
+    Run find_deleted_src_lines on a copy of the head log, return the
+    path of the resulting log and the measurement
+    """
+    result_dir = os.path.join(work_dir, 'result')
+    shutil.rmtree(result_dir, ignore_errors=True)
+    shutil.copytree(new_log_dir, result_dir)
+    counter = SubprocessCounter()
+    start = time.perf_counter()
+    with counter.active():
+        lib_source.find_deleted_src_lines(old_log_dir, result_dir)
+    duration = time.perf_counter() - start
+    return os.path.join(result_dir, 'log_sources'), {'time': duration, 'subprocesses': counter.count}
+
+
+def run_changelog(source_log, repos, log_format, tool_args, work_dir):
+    """
+    Run generate_recipes_changelog in process, return the measurement
+    """
+    output = os.path.join(work_dir, 'changelog')
+    argv = ['generate_recipes_changelog', '-o', output, '-f', log_format, '-t', '1.0.0', '--no-cache']
+    for repo in repos:
+        argv += ['-r', '{}:{}..'.format(repo.path, repo.start_commit)]
+    argv += tool_args + [source_log]
+    counter = SubprocessCounter()
+    saved_argv = sys.argv
+    sys.argv = argv
+    start = time.perf_counter()
+    try:
+        with counter.active():
+            generate_recipes_changelog.main()
+    except SystemExit as issue:
+        if issue.code not in (None, 0, 2):
+            raise
+    finally:
+        sys.argv = saved_argv
+    duration = time.perf_counter() - start
+    with open(output, 'rb') as changelog:
+        digest = hashlib.sha256(changelog.read()).hexdigest()
+    return {'time': duration, 'subprocesses': counter.count, 'digest': digest}
+
+
+def run_benchmarks(params, repeat, log_format, tool_args):
+    """
+    Run both tools repeat times on a synthetic history, return the best
+    measurement of each tool
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        repos = create_repos(os.path.join(work_dir, 'repos'), **params)
+        old_log_dir = os.path.join(work_dir, 'old')
+        new_log_dir = os.path.join(work_dir, 'new')
+        write_source_logs(repos, old_log_dir, new_log_dir, params['ranges'], params['deleted_ranges'])
+        for _ in range(repeat):
+            source_log, find_deleted = run_find_deleted(old_log_dir, new_log_dir, work_dir)
+            changelog = run_changelog(source_log, repos, log_format, tool_args, work_dir)
+            for name, value in [('find_deleted_src_lines', find_deleted), ('generate_recipes_changelog', changelog)]:
+                if name not in results or value['time'] < results[name]['time']:
+                    results[name] = value
+        with open(source_log) as log_file:
+            entries = log_file.read().splitlines()
+    results['source_log'] = {
+        'ranges': len([x for x in entries if x.startswith('range:')]),
+        'deleted': len([x for x in entries if x.startswith('deleted:')])
+    }
+    return results
+
+
+def print_results(results, baseline=None):
+    print('{:28s} {:>10s} {:>10s} {:>8s} {:>10s} {:>10s}'.format(
+        'Tool', 'Time[s]', 'Base[s]', 'Change', 'Processes', 'Base'
+    ))
+    for name in ['find_deleted_src_lines', 'generate_recipes_changelog']:
+        value = results['tools'][name]
+        base = baseline['tools'].get(name) if baseline else None
+        if base:
+            print('{:28s} {:10.4f} {:10.4f} {:+7.1f}% {:10d} {:10d}'.format(
+                name, value['time'], base['time'], 100 * (value['time'] - base['time']) / base['time'],
+                value['subprocesses'], base['subprocesses']
+            ))
+        else:
+            print('{:28s} {:10.4f} {:10s} {:8s} {:10d}'.format(name, value['time'], '', '', value['subprocesses']))
+    print('source log: {ranges} ranges, {deleted} deleted lines'.format(**results['source_log']))
+
+
+def get_regressions(results, baseline, threshold):
+    """
+    Return descriptions of tools that got slower than allowed by threshold
+    or produce a different change log
+    """
+    regressions = []
+    for name, value in results['tools'].items():
+        base = baseline['tools'].get(name)
+        if not base:
+            continue
+        if value['time'] > base['time'] * (1 + threshold / 100):
+            regressions.append('{} slower'.format(name))
+        if base.get('digest') != value.get('digest'):
+            regressions.append('{} output changed'.format(name))
+    return regressions
+
+
+def main():
+    args = docopt.docopt(__doc__)
+    params = get_params(args)
+
+    baseline = None
+    if args['--compare']:
+        with open(args['--compare']) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('version') != RESULTS_VERSION:
+            sys.exit('Unsupported baseline format in {}'.format(args['--compare']))
+        if baseline['params'] != params:
+            print('Warning: baseline was created with different parameters {}'.format(baseline['params']))
+
+    tools = run_benchmarks(params, int(args['--repeat']), args['--format'], args['--tool-arg'])
+    source_log = tools.pop('source_log')
+    results = {
+        'version': RESULTS_VERSION,
+        'keg': __version__,
+        'python': platform.python_version(),
+        'scenario': args['--scenario'],
+        'params': params,
+        'repeat': int(args['--repeat']),
+        'tool_args': args['--tool-arg'],
+        'source_log': source_log,
+        'tools': tools
+    }
+    print_results(results, baseline)
+
+    if args['--output']:
+        with open(args['--output'], 'w') as output:
+            json.dump(results, output, indent=2)
+            output.write('\n')
+
+    if baseline:
+        regressions = get_regressions(results, baseline, float(args['--threshold']))
+        if regressions:
+            print('Regressions: {}'.format(', '.join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+"""
+Generator for throwaway git repositories with a synthetic history, and
+matching keg source logs, used by the changelog benchmark.
+
+Histories are written with git fast-import and are fully deterministic for
+a given seed, so results of different keg versions can be compared.
+"""
+import os
+import random
+import subprocess
+from typing import (
+    Dict, List
+)
+
+# Predefined history sizes, selected by name in run_changelog_benchmarks.py
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    'small': {
+        'repos': 1,
+        'commits': 50,
+        'files': 5,
+        'lines': 100,
+        'ranges': 5,
+        'deleted_ranges': 1
+    },
+    'medium': {
+        'repos': 2,
+        'commits': 300,
+        'files': 20,
+        'lines': 200,
+        'ranges': 10,
+        'deleted_ranges': 2
+    },
+    'large': {
+        'repos': 3,
+        'commits': 2000,
+        'files': 50,
+        'lines': 400,
+        'ranges': 20,
+        'deleted_ranges': 4
+    }
+}
+
+COMMIT_EPOCH = 1700000000
+
+
+class SyntheticRepo:
+    """
+    Git repository with a random history of line edits, insertions and
+    deletions in a set of text files.
+
+    The first half of the history is considered old, its last commit is
+    available as start_commit to be used as revision range start.
+
+    :param str path: repository directory, created if missing
+    :param int commits: number of commits
+    :param int files: number of files
+    :param int lines: initial number of lines per file
+    :param int seed: random seed
+    """
+    def __init__(self, path: str, commits: int, files: int, lines: int, seed: int = 0):
+        self.path = path
+        self.file_names = ['data/module_{}/file_{}.yaml'.format(x % 5, x) for x in range(files)]
+        self.start_lines: Dict[str, int] = {}
+        self.head_lines: Dict[str, int] = {}
+        self.start_commit = ''
+        self._create(commits, lines, random.Random(seed))
+
+    def _create(self, commits, lines, rng):
+        os.makedirs(self.path, exist_ok=True)
+        _git(self.path, 'init', '-q', '-b', 'main')
+        content = {
+            name: ['{}: line {}'.format(name, x) for x in range(lines)] for name in self.file_names
+        }
+        stream = []
+        start_index = commits // 2
+        for index in range(commits):
+            if index == 0:
+                changed = list(self.file_names)
+                subject = 'Add recipes files'
+            else:
+                changed = rng.sample(self.file_names, rng.randint(1, min(3, len(self.file_names))))
+                subject = 'Change {} file(s) in commit {}'.format(len(changed), index)
+                for name in changed:
+                    self._edit(content[name], index, rng)
+            body = '' if index % 3 else 'Details for commit {}\n\nMore details.\n'.format(index)
+            message = '{}\n\n{}'.format(subject, body) if body else subject + '\n'
+            stream.append(self._commit_command(index, message, {x: content[x] for x in changed}))
+            if index == start_index:
+                stream.append('reset refs/tags/start\nfrom :{}\n\n'.format(index + 1))
+                self.start_lines = {x: len(content[x]) for x in self.file_names}
+        self.head_lines = {x: len(content[x]) for x in self.file_names}
+        subprocess.run(
+            ['git', '-C', self.path, 'fast-import', '--quiet'],
+            input=''.join(stream).encode('utf-8'),
+            check=True
+        )
+        _git(self.path, 'checkout', '-q', 'main')
+        self.start_commit = _git(self.path, 'rev-parse', 'start').strip()
+
+    @staticmethod
+    def _edit(lines, index, rng):
+        action = rng.random()
+        pos = rng.randrange(len(lines))
+        count = rng.randint(1, 5)
+        if action < 0.6 or len(lines) < 20:
+            for i in range(pos, min(pos + count, len(lines))):
+                lines[i] = '{} (changed in {})'.format(lines[i].split(' (')[0], index)
+        elif action < 0.8:
+            lines[pos:pos] = ['inserted in {} line {}'.format(index, x) for x in range(count)]
+        else:
+            del lines[pos:pos + count]
+
+    @staticmethod
+    def _commit_command(index, message, files):
+        command = [
+            'commit refs/heads/main\n',
+            'mark :{}\n'.format(index + 1),
+            'committer Bench <bench@example.com> {} +0000\n'.format(COMMIT_EPOCH + index * 60),
+            'data {}\n{}\n'.format(len(message.encode('utf-8')), message)
+        ]
+        for name, lines in files.items():
+            data = ''.join(x + '\n' for x in lines)
+            command.append('M 100644 inline {}\ndata {}\n{}\n'.format(name, len(data.encode('utf-8')), data))
+        command.append('\n')
+        return ''.join(command)
+
+
+def create_repos(
+    root: str,
+    repos: int = 1,
+    commits: int = 50,
+    files: int = 5,
+    lines: int = 100,
+    ranges: int = 5,
+    deleted_ranges: int = 1,
+    seed: int = 0
+) -> List[SyntheticRepo]:
+    """
+    Create repos synthetic repositories below root
+
+    The ranges and deleted_ranges parameters are not used here, they are
+    accepted so a scenario dictionary can be passed as is.
+    """
+    return [
+        SyntheticRepo(os.path.join(root, 'repo_{}'.format(x)), commits, files, lines, seed + x)
+        for x in range(repos)
+    ]
+
+
+def write_source_logs(
+    repos: List[SyntheticRepo],
+    old_log_dir: str,
+    new_log_dir: str,
+    ranges: int,
+    deleted_ranges: int,
+    seed: int = 0
+) -> None:
+    """
+    Write keg source logs for the repositories at their start and head
+    revisions. Each file is covered by ranges line ranges plus one whole
+    file entry for every fifth file. The head log misses deleted_ranges of
+    the ranges of each file, as if the corresponding keys were removed.
+    """
+    rng = random.Random(seed)
+    os.makedirs(old_log_dir, exist_ok=True)
+    os.makedirs(new_log_dir, exist_ok=True)
+    old_log = ['root:{}'.format(x.path) for x in repos]
+    new_log = list(old_log)
+    for repo in repos:
+        for index, name in enumerate(repo.file_names):
+            path = os.path.join(repo.path, name)
+            if index % 5 == 4:
+                old_log.append(path)
+                new_log.append(path)
+                continue
+            removed = set(rng.sample(range(ranges), min(deleted_ranges, ranges)))
+            for number, (start, end) in enumerate(_split_ranges(repo.start_lines[name], ranges)):
+                old_log.append('range:{}:{}:{}'.format(start, end, path))
+                if number not in removed:
+                    start = min(start, repo.head_lines[name])
+                    end = min(end, repo.head_lines[name])
+                    new_log.append('range:{}:{}:{}'.format(start, end, path))
+    for log_dir, content in [(old_log_dir, old_log), (new_log_dir, new_log)]:
+        with open(os.path.join(log_dir, 'log_sources'), 'w') as log_file:
+            log_file.write('\n'.join(content) + '\n')
+
+
+def _split_ranges(lines, ranges):
+    # split lines into ranges with a one line gap in between
+    size = max(1, lines // ranges)
+    result = []
+    for number in range(ranges):
+        start = number * size + 1
+        end = min(start + size - 2, lines)
+        if start > lines:
+            break
+        result.append((start, max(start, end)))
+    return result
+
+
+def _git(path, *args):
+    return subprocess.run(
+        ['git', '-C', path] + list(args),
+        stdout=subprocess.PIPE,
+        check=True
+    ).stdout.decode('utf-8')
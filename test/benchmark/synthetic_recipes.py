@@ -0,0 +1,292 @@
+# Copyright (c) 2026 SUSE Software Solutions Germany GmbH. All rights reserved.
+#
+# This file is part of keg.
+#
+# keg is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# keg is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with keg. If not, see <http://www.gnu.org/licenses/>
+#
+"""
+Generator for synthetic keg recipes trees used by the benchmark suite.
+
+The generated tree has the following layout::
+
+    images/image.yaml                     common image definition
+    images/family/image_N/image.yaml      per image name and profiles
+    data/packages/d1/.../dD/packages.yaml package namespaces per level
+    data/config/d1/.../dD/config.yaml     scriptlet namespaces per level
+    data/scripts/script_N.sh              scriptlets
+    data/overlayfiles/overlay_N/...       overlay files
+    schemas/config_sh_header.templ        config.sh header template
+
+Data modules are included from their deepest directory, so keg reads one
+YAML file for every include depth level.
+"""
+import os
+from typing import (
+    Dict, List
+)
+
+import yaml
+
+# Predefined recipes sizes, selected by name in run_benchmarks.py
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    'small': {
+        'images': 2,
+        'include_depth': 2,
+        'namespaces': 2,
+        'packages': 20,
+        'scripts': 4,
+        'overlay_files': 10,
+        'profiles': 2
+    },
+    'medium': {
+        'images': 4,
+        'include_depth': 4,
+        'namespaces': 6,
+        'packages': 100,
+        'scripts': 20,
+        'overlay_files': 100,
+        'profiles': 4
+    },
+    'large': {
+        'images': 8,
+        'include_depth': 6,
+        'namespaces': 12,
+        'packages': 400,
+        'scripts': 60,
+        'overlay_files': 500,
+        'profiles': 12
+    }
+}
+
+
+def create_recipes(
+    root: str,
+    images: int = 2,
+    include_depth: int = 2,
+    namespaces: int = 2,
+    packages: int = 20,
+    scripts: int = 4,
+    overlay_files: int = 10,
+    profiles: int = 2
+) -> List[str]:
+    """
+    Write a synthetic recipes tree to root and return the image sources
+
+    :param str root: recipes root directory, created if missing
+    :param int images: number of images
+    :param int include_depth: directory depth of the included data modules
+    :param int namespaces: number of namespaces per data module level
+    :param int packages: number of packages per namespace and level
+    :param int scripts: number of config scriptlets
+    :param int overlay_files: number of files per overlay module
+    :param int profiles: number of build profiles per image, 0 for none
+    """
+    depth_path = os.path.join(*['d{}'.format(x) for x in range(1, include_depth + 1)]) if include_depth else ''
+    packages_module = os.path.join('packages', depth_path) if depth_path else 'packages'
+    config_module = os.path.join('config', depth_path) if depth_path else 'config'
+    profile_names = ['profile_{}'.format(x) for x in range(profiles)]
+
+    _write_yaml(
+        os.path.join(root, 'images', 'image.yaml'),
+        _get_common_image(packages_module, config_module, profile_names)
+    )
+    image_sources = []
+    for image in range(images):
+        image_source = os.path.join('family', 'image_{}'.format(image))
+        image_sources.append(image_source)
+        _write_yaml(
+            os.path.join(root, 'images', image_source, 'image.yaml'),
+            {
+                'image': {
+                    '_attributes': {
+                        'name': 'synthetic-image-{}'.format(image)
+                    },
+                    'description': {
+                        'specification': 'Synthetic image {}'.format(image)
+                    }
+                }
+            }
+        )
+
+    module_dirs = ['']
+    for level in range(1, include_depth + 1):
+        module_dirs.append(os.path.join(module_dirs[-1], 'd{}'.format(level)))
+    for level, module_dir in enumerate(module_dirs):
+        _write_yaml(
+            os.path.join(root, 'data', 'packages', module_dir, 'packages.yaml'),
+            {'packages': _get_package_namespaces(level, namespaces, packages)}
+        )
+        _write_yaml(
+            os.path.join(root, 'data', 'config', module_dir, 'config.yaml'),
+            {'config': {'scripts': _get_script_namespaces(level, namespaces, scripts)}}
+        )
+
+    for script in range(scripts):
+        _write_text(
+            os.path.join(root, 'data', 'scripts', 'script_{}.sh'.format(script)),
+            ''.join('echo "script {} line {}"\n'.format(script, x) for x in range(20))
+        )
+
+    for overlay in range(max(1, profiles)):
+        for overlay_file in range(overlay_files):
+            _write_text(
+                os.path.join(
+                    root, 'data', 'overlayfiles', 'overlay_{}'.format(overlay),
+                    'etc', 'dir_{}'.format(overlay_file % 10), 'file_{}'.format(overlay_file)
+                ),
+                'overlay {} file {}\n'.format(overlay, overlay_file) * 10
+            )
+    _write_text(
+        os.path.join(root, 'schemas', 'config_sh_header.templ'),
+        '#!/bin/bash\n# {{ data.image._attributes.name }}, generated by {{ data.generator }}\n'
+    )
+    return image_sources
+
+
+def _get_common_image(packages_module, config_module, profile_names):
+    image: Dict = {
+        '_attributes': {
+            'schemaversion': '7.4'
+        },
+        'description': {
+            '_attributes': {
+                'type': 'system'
+            },
+            'author': 'Synthetic Author',
+            'contact': 'synthetic@example.com'
+        },
+        'preferences': [
+            {
+                'version': '1.0.0',
+                'packagemanager': 'zypper',
+                'rpm-check-signatures': 'false',
+                'locale': 'en_US',
+                'keytable': 'us',
+                'timezone': 'UTC'
+            }
+        ],
+        'repository': [
+            {
+                '_attributes': {
+                    'type': 'rpm-md'
+                },
+                'source': {
+                    '_attributes': {
+                        'path': 'obs://synthetic/repo'
+                    }
+                }
+            }
+        ],
+        'packages': [
+            {
+                '_attributes': {
+                    'type': 'image'
+                },
+                '_include': [packages_module]
+            },
+            {
+                '_attributes': {
+                    'type': 'bootstrap'
+                },
+                'package': [
+                    {'_attributes': {'name': 'filesystem'}}
+                ]
+            }
+        ]
+    }
+    image_type = {
+        '_attributes': {
+            'image': 'oem',
+            'filesystem': 'ext4'
+        }
+    }
+    if profile_names:
+        image['profiles'] = {
+            'profile': [
+                {
+                    '_attributes': {
+                        'name': name,
+                        'description': 'Synthetic profile {}'.format(name)
+                    }
+                } for name in profile_names
+            ]
+        }
+        for name in profile_names:
+            image['preferences'].append(
+                {'_attributes': {'profiles': [name]}, 'type': image_type}
+            )
+            image['packages'].append(
+                {
+                    '_attributes': {
+                        'type': 'image',
+                        'profiles': [name]
+                    },
+                    'archive': [
+                        {'_attributes': {'name': '{}.tar.gz'.format(name)}}
+                    ],
+                    'package': [
+                        {'_attributes': {'name': 'package-{}'.format(name)}}
+                    ]
+                }
+            )
+    else:
+        image['preferences'][0]['type'] = image_type
+
+    archives = [{'name': 'root.tar.gz', '_namespace_root': {'_include_overlays': ['overlay_0']}}]
+    for index, name in enumerate(profile_names):
+        archives.append(
+            {
+                'name': '{}.tar.gz'.format(name),
+                '_namespace_{}'.format(name): {'_include_overlays': ['overlay_{}'.format(index)]}
+            }
+        )
+    return {
+        'image': image,
+        'config': [{'_include': [config_module]}],
+        'archive': archives
+    }
+
+
+def _get_package_namespaces(level, namespaces, packages):
+    return {
+        '_namespace_level_{}_{}'.format(level, ns): {
+            'package': [
+                {
+                    '_attributes': {
+                        'name': 'package-{}-{}-{}'.format(level, ns, x)
+                    }
+                } for x in range(packages)
+            ]
+        } for ns in range(namespaces)
+    }
+
+
+def _get_script_namespaces(level, namespaces, scripts):
+    script_names = ['script_{}'.format(x) for x in range(scripts)]
+    return {
+        'level_{}_{}'.format(level, ns): script_names[ns::namespaces]
+        for ns in range(namespaces) if script_names[ns::namespaces]
+    }
+
+
+def _write_yaml(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as yaml_file:
+        yaml.safe_dump(data, yaml_file, sort_keys=False)
+
+
+def _write_text(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as text_file:
+        text_file.write(content)
@@ -0,0 +1,86 @@
+import json
+import os
+from unittest.mock import patch
+
+from kiwi_keg.catalogue import RecipesCatalogue, get_mtimes, read_image_info
+from kiwi_keg.exceptions import KegError
+
+
+def test_catalogue_roundtrip(tmp_path):
+    dep = tmp_path / 'image.yaml'
+    dep.write_text('')
+    cache_file = str(tmp_path / 'cache' / 'catalogue.json')
+    catalogue = RecipesCatalogue(cache_file)
+    assert catalogue.get(['root'], 'image') is None
+    entry = {'info': {'name': 'n'}, 'deps': get_mtimes([str(dep)])}
+    catalogue.set(['root'], 'image', entry)
+    catalogue.set(['root'], 'no_deps', {'info': {}, 'deps': {}})
+    catalogue.save()
+    catalogue = RecipesCatalogue(cache_file)
+    assert catalogue.get(['root'], 'image') == entry
+    assert catalogue.get(['root'], 'no_deps') is None
+    os.utime(dep, ns=(0, 0))
+    assert catalogue.get(['root'], 'image') is None
+
+
+def test_catalogue_save_unchanged_or_disabled(tmp_path):
+    RecipesCatalogue(str(tmp_path / 'catalogue.json')).save()
+    assert not os.path.exists(tmp_path / 'catalogue.json')
+    catalogue = RecipesCatalogue()
+    catalogue.set(['root'], 'image', {'deps': {'x': None}})
+    catalogue.save()
+
+
+def test_catalogue_unreadable(tmp_path, caplog):
+    cache_file = tmp_path / 'catalogue.json'
+    cache_file.write_text('{ broken')
+    assert RecipesCatalogue(str(cache_file))._entries == {}
+    assert 'Ignoring unreadable catalogue cache' in caplog.text
+
+
+def test_catalogue_other_version(tmp_path):
+    cache_file = tmp_path / 'catalogue.json'
+    cache_file.write_text(json.dumps({'version': 0, 'images': {'x': {}}}))
+    assert RecipesCatalogue(str(cache_file))._entries == {}
+
+
+@patch('os.makedirs', side_effect=OSError('read-only'))
+def test_catalogue_save_error(mock_makedirs, tmp_path, caplog):
+    catalogue = RecipesCatalogue(str(tmp_path / 'catalogue.json'))
+    catalogue.set(['root'], 'image', {'deps': {'x': None}})
+    catalogue.save()
+    assert 'Cannot write catalogue cache' in caplog.text
+
+
+def test_get_mtimes(tmp_path):
+    (tmp_path / 'file').write_text('')
+    mtimes = get_mtimes([str(tmp_path / 'file'), str(tmp_path / 'missing')])
+    assert mtimes[str(tmp_path / 'file')] == os.stat(tmp_path / 'file').st_mtime_ns
+    assert mtimes[str(tmp_path / 'missing')] is None
+
+
+def test_read_image_info(tmp_path):
+    (tmp_path / 'images' / 'sles').mkdir(parents=True)
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'images' / 'image.yaml').write_text(
+        'image:\n  _attributes: {name: img}\n  description: {specification: spec}\n'
+        '  preferences: [{version: 1.2.3}]\n'
+    )
+    entry = read_image_info([str(tmp_path)], 'sles')
+    assert entry['info'] == {'name': 'img', 'desc': 'spec', 'ver': '1.2.3'}
+    assert os.path.join(str(tmp_path), 'images', './image.yaml') in entry['deps']
+    (tmp_path / 'images' / 'image.yaml').write_text(
+        'image:\n  _attributes: {name: img}\n  description: {specification: spec}\n'
+        '  preferences: {version: 1.2.4}\n'
+    )
+    assert read_image_info([str(tmp_path)], 'sles')['info']['ver'] == '1.2.4'
+    (tmp_path / 'images' / 'image.yaml').write_text(
+        'image:\n  _attributes: {name: img}\n  description: {}\n  preferences: {}\n'
+    )
+    assert 'missing key' in read_image_info([str(tmp_path)], 'sles')['error']
+
+
+@patch('kiwi_keg.catalogue.KegImageDefinition', side_effect=KegError('fake error'))
+def test_read_image_info_invalid(mock_image_definition):
+    entry = read_image_info(['root'], 'image')
+    assert entry == {'error': 'image is not a valid image definition: fake error', 'deps': {}}
@@ -1,3 +1,6 @@
+import json
+import yaml
+from io import StringIO
 from pytest import raises
 from kiwi_keg import dict_utils
 from kiwi_keg.annotated_mapping import AnnotatedMapping
@@ -54,3 +57,45 @@ def test_rmerge_data_exception():
         dict_utils.rmerge(a_dict, not_a_dict)
     with raises(KegDataError):
         dict_utils.rmerge(not_a_dict, a_dict)
+
+
+def test_get_key_path():
+    data = AnnotatedMapping({'image': {'preferences': [{'version': '1.0'}]}})
+    assert dict_utils.get_key_path(data, 'image.preferences.0.version') == '1.0'
+    with raises(KegDataError):
+        dict_utils.get_key_path(data, 'image.preferences.1')
+    with raises(KegDataError):
+        dict_utils.get_key_path(data, 'image.foo')
+
+
+DUMP_DATA = {
+    'string': 'value',
+    'number': '1',
+    'list': [{'a': 1, 'b': None, 'c': True}, [], {}],
+    'multiline': 'first\nsecond'
+}
+
+
+def test_dump_json():
+    stream = StringIO()
+    dict_utils.dump_json(AnnotatedMapping(DUMP_DATA), stream)
+    assert stream.getvalue() == json.dumps(DUMP_DATA, indent=2) + '\n'
+
+
+def test_dump_yaml():
+    stream = StringIO()
+    dict_utils.dump_yaml(AnnotatedMapping(DUMP_DATA), stream)
+    assert stream.getvalue() == yaml.safe_dump(DUMP_DATA, sort_keys=False)
+
+
+def test_dump_annotations():
+    data = AnnotatedMapping({'key': object, '__key_source__': 'file.yaml'})
+    stream = StringIO()
+    dict_utils.dump_yaml(data, stream)
+    assert stream.getvalue() == "key: <class 'object'>\n"
+    stream = StringIO()
+    dict_utils.dump_yaml(data, stream, annotations=True)
+    assert '__key_source__: file.yaml' in stream.getvalue()
+    stream = StringIO()
+    dict_utils.dump_json(data, stream, annotations=True)
+    assert json.loads(stream.getvalue())['__key_source__'] == 'file.yaml'
@@ -0,0 +1,34 @@
+import os
+from unittest.mock import patch
+
+from kiwi_keg.directory_cache import DirectoryCache
+
+
+def test_directory_cache(tmp_path):
+    (tmp_path / 'scripts').mkdir()
+    (tmp_path / 'scripts' / 'script.sh').write_text('')
+    (tmp_path / 'other').mkdir()
+    (tmp_path / 'other' / 'script.sh').mkdir()
+    dir_cache = DirectoryCache()
+    with patch('os.scandir', wraps=os.scandir) as mock_scandir:
+        assert dir_cache.exists(str(tmp_path / 'scripts'))
+        assert dir_cache.exists(str(tmp_path / 'scripts' / 'script.sh'))
+        assert not dir_cache.exists(str(tmp_path / 'scripts' / 'missing.sh'))
+        assert not dir_cache.exists(str(tmp_path / 'missing' / 'missing.sh'))
+        assert dir_cache.exists(str(tmp_path / 'other' / '.'))
+        assert not dir_cache.exists(str(tmp_path / 'missing' / '..' / 'foo'))
+        assert dir_cache.get_entry(str(tmp_path / 'scripts')).is_dir
+        assert dir_cache.find_file(
+            [str(tmp_path / 'scripts'), str(tmp_path / 'other'), str(tmp_path / 'missing')], 'script.sh'
+        ) == os.path.join(str(tmp_path / 'scripts'), 'script.sh')
+        assert mock_scandir.call_count == 4
+    assert dir_cache.get_entry('/') is not None
+    assert dir_cache.exists('..')
+
+
+def test_directory_cache_relative(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    dir_cache = DirectoryCache()
+    assert dir_cache.exists('data')
+    assert not dir_cache.exists('nodata')
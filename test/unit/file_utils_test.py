@@ -1,9 +1,11 @@
+import os
 import yaml
 from io import StringIO
 from unittest.mock import patch, mock_open
 from pytest import raises
 import kiwi_keg.file_utils
 from kiwi_keg.exceptions import KegError
+from kiwi_keg.recipes_cache import RecipesCache
 
 
 @patch('kiwi_keg.file_utils._get_source_files')
@@ -27,6 +29,120 @@ def test_get_recipes_source_tracking(mock_open, mock_get_source_files):
     }
 
 
+@patch('kiwi_keg.file_utils._get_source_files')
+@patch("builtins.open", new_callable=mock_open, read_data='foo: bar')
+def test_get_recipes_cached(mock_open, mock_get_source_files):
+    mock_get_source_files.return_value = ['fake.yaml']
+    cache = RecipesCache()
+    for i in range(2):
+        data = kiwi_keg.file_utils.get_recipes(['fake_root'], ['fake_dirs'], ['fake_includes'], cache=cache)
+        assert data == {'foo': 'bar'}
+    mock_get_source_files.assert_called_once_with(['fake_root'], 'fake_dirs', 'yaml', ['fake_includes'])
+    mock_open.assert_called_once_with('fake.yaml', 'r')
+
+
+def test_preload_recipes(tmp_path):
+    (tmp_path / 'images' / 'sles' / 'a').mkdir(parents=True)
+    (tmp_path / 'images' / 'image.yaml').write_text('image:\n  foo: bar\n')
+    (tmp_path / 'images' / 'sles' / 'a' / 'image.yaml').write_text('image:\n  name: a\n')
+    (tmp_path / 'data' / 'base').mkdir(parents=True)
+    (tmp_path / 'data' / 'overlayfiles' / 'ov').mkdir(parents=True)
+    (tmp_path / 'data' / 'base' / 'base.yaml').write_text('base: true\n')
+    (tmp_path / 'data' / 'base' / 'broken.yaml').write_text('broken: [\n')
+    (tmp_path / 'data' / 'overlayfiles' / 'ov' / 'skip.yaml').write_text('skip: true\n')
+    cache = RecipesCache()
+    kiwi_keg.file_utils.preload_recipes(cache, [str(tmp_path)], ['sles/a'], track_sources=True)
+    loader = kiwi_keg.file_utils.SafeTrackerLoader
+    cached = cache._store['yaml']
+    assert (str(tmp_path / 'images' / 'sles' / 'a' / 'image.yaml'), loader) in cached
+    assert (str(tmp_path / 'data' / 'base' / 'base.yaml'), loader) in cached
+    assert (str(tmp_path / 'data' / 'base' / 'broken.yaml'), loader) not in cached
+    assert (str(tmp_path / 'data' / 'overlayfiles' / 'ov' / 'skip.yaml'), loader) not in cached
+    data = kiwi_keg.file_utils.get_recipes(
+        [str(tmp_path / 'images')], ['sles/a'], track_sources=True, cache=cache
+    )
+    assert data['image'].to_dict() == {'foo': 'bar', 'name': 'a'}
+
+
+def test_preload_recipes_data_root_file(tmp_path):
+    (tmp_path / 'images').mkdir()
+    (tmp_path / 'data' / 'base').mkdir(parents=True)
+    (tmp_path / 'data' / 'common.yaml').write_text('common: true\n')
+    (tmp_path / 'data' / 'base' / 'base.yaml').write_text('base: true\n')
+    cache = RecipesCache()
+    kiwi_keg.file_utils.preload_recipes(cache, [str(tmp_path)], [], track_sources=True)
+    with patch('builtins.open', side_effect=AssertionError('not preloaded')):
+        data = kiwi_keg.file_utils.get_recipes(
+            [str(tmp_path / 'data')], ['base'], track_sources=True, cache=cache
+        )
+    assert data.to_dict() == {'common': True, 'base': True}
+    assert data['__common_source__'] == os.path.join(str(tmp_path / 'data'), '.', 'common.yaml')
+
+
+header_spec = {'image': {'_attributes': None, 'description': None}, 'include-paths': None}
+header_required = [('image', '_attributes'), ('image', 'description')]
+
+
+def test_get_recipes_header(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'base.yaml').write_text(
+        'other:\n  - [1, 2]\n  - {a: b}\n'
+        'image:\n'
+        '  _attributes:\n    name: base\n    version: 1\n'
+        '  packages:\n    - package: foo\n'
+        '  description:\n    specification: spec\n'
+        'include-paths: [never_read]\n'
+        'trailing: [\n'
+    )
+    (tmp_path / 'sub' / 'image.yaml').write_text(
+        'include-paths: [sp5]\n'
+        '1: numeric key\n'
+        'image:\n  _attributes: {name: leaf}\n  preferences: {}\n'
+    )
+    data = kiwi_keg.file_utils.get_recipes_header([str(tmp_path)], ['sub'], header_spec, header_required)
+    assert data == {
+        'image': {
+            '_attributes': {'name': 'leaf', 'version': 1},
+            'description': {'specification': 'spec'}
+        },
+        'include-paths': ['sp5']
+    }
+
+
+def test_get_recipes_header_no_mapping(tmp_path):
+    (tmp_path / 'empty.yaml').write_text('')
+    (tmp_path / 'list.yaml').write_text('- foo\n')
+    assert kiwi_keg.file_utils.get_recipes_header([str(tmp_path)], ['.'], header_spec, header_required) == {}
+
+
+def test_get_recipes_header_alias_fallback(tmp_path):
+    (tmp_path / 'image.yaml').write_text(
+        'other: &attrs\n  name: aliased\n'
+        'image:\n  _attributes: *attrs\n  description: desc\n  packages: []\n'
+    )
+    data = kiwi_keg.file_utils.get_recipes_header([str(tmp_path)], ['.'], header_spec, header_required)
+    assert data == {'image': {'_attributes': {'name': 'aliased'}, 'description': 'desc'}}
+
+
+def test_filter_tree():
+    assert kiwi_keg.file_utils._filter_tree(['not', 'a', 'dict'], header_spec) == {}
+    assert kiwi_keg.file_utils._filter_tree({'image': 'scalar'}, header_spec) == {'image': 'scalar'}
+
+
+def test_get_source_dirs():
+    assert kiwi_keg.file_utils.get_source_dirs(['root'], 'a/b', ['inc']) == [
+        'root/a/b', 'root/a/b/inc', 'root/a', 'root/a/inc', 'root/.', 'root/./inc'
+    ]
+
+
+def test_get_cache_dir(monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', '/xdg')
+    assert kiwi_keg.file_utils.get_cache_dir() == '/xdg/keg'
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    monkeypatch.setenv('HOME', '/home/user')
+    assert kiwi_keg.file_utils.get_cache_dir() == '/home/user/.cache/keg'
+
+
 @patch('kiwi_keg.file_utils.os.walk')
 def test_get_all_leaf_dirs(mock_os_walk):
     mock_os_walk.return_value = [('base', ['foo'], []), ('base/foo', [], [])]
@@ -9,6 +9,7 @@ from pytest import raises, fixture
 
 from kiwi_keg.generator import KegGenerator, NodeAttributes, ContentGenerator
 from kiwi_keg.exceptions import KegError, KegDataError
+from kiwi_keg.recipes_cache import RecipesCache
 
 
 @fixture
@@ -25,6 +26,16 @@ def test_keg_generator_create_object(patched_keg_generator):
     patched_keg_generator.image_definition.populate.assert_called_once()
 
 
+def test_keg_generator_create_object_shared_cache():
+    mock_image_definition = Mock()
+    mock_image_definition.recipes_roots = ['fake_root']
+    cache = RecipesCache()
+    with patch('os.path.isdir', return_value=True):
+        generator_one = KegGenerator(mock_image_definition, 'dest_dir', cache=cache)
+        generator_two = KegGenerator(mock_image_definition, 'dest_dir', cache=cache)
+    assert generator_one.env is generator_two.env
+
+
 @patch('os.path.isdir', return_value=False)
 def test_keg_generator_create_object_dest_dir_missing(mock_isdir):
     with raises(KegError):
@@ -166,6 +177,22 @@ def test_validate_kiwi_description(mock_kiwi_description, patched_keg_generator)
     mock_kiwi_description().validate_description.assert_called_once()
 
 
+@patch('kiwi_keg.generator.KiwiDescription')
+def test_validate_kiwi_description_cached(mock_kiwi_description, patched_keg_generator):
+    cache = Mock()
+    cache.validate.side_effect = lambda description_file, validate: validate()
+    patched_keg_generator.validate_kiwi_description(cache)
+    assert cache.validate.call_args.args[0] == patched_keg_generator.kiwi_description
+    mock_kiwi_description().validate_description.assert_called_once()
+
+
+@patch('kiwi_keg.generator.KiwiDescription')
+def test_format_and_validate_kiwi_description(mock_kiwi_description, patched_keg_generator):
+    patched_keg_generator.format_kiwi_description('xml')
+    patched_keg_generator.validate_kiwi_description()
+    mock_kiwi_description.assert_called_once_with(patched_keg_generator.kiwi_description)
+
+
 @patch('kiwi_keg.generator.KiwiDescription')
 def test_format_kiwi_description_unkown_markup(mock_kiwi_description, patched_keg_generator):
     with raises(KegError) as err:
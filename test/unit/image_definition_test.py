@@ -4,6 +4,7 @@ from unittest.mock import patch, DEFAULT, call
 from datetime import datetime
 from schema import SchemaError
 
+import kiwi_keg.image_definition
 from kiwi_keg.image_definition import KegImageDefinition
 from kiwi_keg.exceptions import KegDataError
 from kiwi_keg.annotated_mapping import AnnotatedMapping
@@ -61,6 +62,7 @@ def test_image_definition_populate(
     mock_generate_config_scripts.assert_called_once()
     mock_generate_overlay_info.assert_called_once()
     mock_check_archive_refs.assert_called_once()
+    assert patched_image_definition._populated
 
 
 @patch('kiwi_keg.image_schema.ImageSchema.validate')
@@ -85,6 +87,41 @@ def test_image_definition_populate_prefs_list(
     mock_check_archive_refs.assert_called_once()
 
 
+@patch('kiwi_keg.image_schema.ImageSchema.validate')
+@patch('kiwi_keg.image_definition.KegImageDefinition._check_archive_refs')
+@patch('kiwi_keg.image_definition.KegImageDefinition._generate_config_scripts')
+@patch('kiwi_keg.image_definition.KegImageDefinition._generate_overlay_info')
+@patch('kiwi_keg.image_definition.KegImageDefinition._expand_includes')
+@patch('kiwi_keg.file_utils.get_recipes')
+def test_image_definition_populate_profile_cycle(
+        mock_get_recipes,
+        mock_expand_includes,
+        mock_generate_overlay_info,
+        mock_generate_config_scripts,
+        mock_check_archive_refs,
+        mock_image_schema_validate,
+        patched_image_definition):
+    mock_get_recipes.return_value = {
+        'image': {
+            'preferences': {'version': '0.9.9'},
+            'profiles': {
+                'profile': [
+                    {
+                        '_attributes': {'name': 'profile_one'},
+                        'requires': {'_attributes': {'profile': 'profile_two'}}
+                    },
+                    {
+                        '_attributes': {'name': 'profile_two'},
+                        'requires': {'_attributes': {'profile': 'profile_one'}}
+                    }
+                ]
+            }
+        }
+    }
+    with raises(KegDataError, match='Cyclic profile requirements: profile_one -> profile_two -> profile_one'):
+        patched_image_definition.populate()
+
+
 @patch('kiwi_keg.file_utils.get_recipes')
 def test_image_definition_populate_parse_error(mock_get_recipes, patched_image_definition):
     mock_get_recipes.side_effect = KegDataError('fake parse error')
@@ -128,14 +165,40 @@ def test_image_definition_populate_general_error(
 
 
 @patch('kiwi_keg.image_definition.KegImageDefinition._expand_includes')
-@patch('kiwi_keg.file_utils.get_recipes')
-def test_image_definition_popluate_header(mock_get_recipes, mock_expand_includes, patched_image_definition):
-    mock_get_recipes.return_value = {'image': {'description': {'foo': 'bar'}}}
+@patch('kiwi_keg.file_utils.get_recipes_header')
+def test_image_definition_popluate_header(mock_get_recipes_header, mock_expand_includes, patched_image_definition):
+    mock_get_recipes_header.return_value = {'image': {'description': {'foo': 'bar'}}}
     patched_image_definition.populate_header()
+    mock_get_recipes_header.assert_called_once_with(
+        [os.path.join('root', 'images')], ['image_name'],
+        kiwi_keg.image_definition.HEADER_SPEC, kiwi_keg.image_definition.HEADER_REQUIRED
+    )
     mock_expand_includes.assert_called_once_with({'foo': 'bar'})
 
 
+@patch('kiwi_keg.image_definition.KegImageDefinition._expand_includes')
+@patch('kiwi_keg.file_utils.get_recipes_header')
+def test_image_definition_popluate_header_include_paths(mock_get_recipes_header, mock_expand_includes, patched_image_definition):
+    mock_get_recipes_header.side_effect = [
+        {'image': {'description': [{'_include': 'base'}]}},
+        {'include-paths': ['sp5']}
+    ]
+    patched_image_definition.populate_header()
+    mock_get_recipes_header.assert_called_with(
+        [os.path.join('root', 'images')], ['image_name'], {'include-paths': None}, [('include-paths',)]
+    )
+    assert patched_image_definition.data['include-paths'] == ['sp5']
+
+
+@patch('kiwi_keg.image_definition.KegImageDefinition._expand_includes')
 @patch('kiwi_keg.file_utils.get_recipes')
+def test_image_definition_popluate_header_tracking(mock_get_recipes, mock_expand_includes, patched_image_definition_tracking):
+    mock_get_recipes.return_value = {'image': {'description': {'foo': 'bar'}}}
+    patched_image_definition_tracking.populate_header()
+    mock_expand_includes.assert_called_once_with({'foo': 'bar'})
+
+
+@patch('kiwi_keg.file_utils.get_recipes_header')
 def test_image_definition_popluate_header_error(mock_get_recipes, patched_image_definition):
     mock_get_recipes.side_effect = Exception('fake exception')
     with raises(KegDataError) as err:
@@ -235,7 +298,7 @@ def test_expand_includes_list(mock_expand_include, patched_image_definition):
 
 
 @patch('kiwi_keg.file_utils.get_recipes')
-@patch('os.path.exists', return_value=False)
+@patch('kiwi_keg.directory_cache.DirectoryCache.exists', return_value=False)
 def test_expand_include(mock_path_exists, mock_get_recipes, patched_image_definition):
     data = AnnotatedMapping({'_include': 'some-include'})
     mock_get_recipes.return_value = AnnotatedMapping({'root': {'included': 'data'}})
@@ -244,14 +307,14 @@ def test_expand_include(mock_path_exists, mock_get_recipes, patched_image_defini
 
 
 @patch('kiwi_keg.script_utils.get_config_script')
-@patch('os.path.exists', return_value=True)
+@patch('kiwi_keg.directory_cache.DirectoryCache.exists', return_value=True)
 def test_generate_config_scripts(mock_path_exists, mock_get_config_script, patched_image_definition):
     patched_image_definition._data = {'config': {'fake_config': {}}, 'setup': {'fake_setup': {}}}
     patched_image_definition._generate_config_scripts()
     mock_get_config_script.assert_has_calls(
         [
-            call({'fake_config': {}}, [os.path.join('root', 'data', 'scripts')]),
-            call({'fake_setup': {}}, [os.path.join('root', 'data', 'scripts')])
+            call({'fake_config': {}}, [os.path.join('root', 'data', 'scripts')], None, patched_image_definition.dir_cache),
+            call({'fake_setup': {}}, [os.path.join('root', 'data', 'scripts')], None, patched_image_definition.dir_cache)
         ]
     )
 
@@ -263,14 +326,14 @@ def test_generate_overlay_info(mock_add_dir_to_archive, patched_image_definition
     mock_add_dir_to_archive.assert_called_once_with('foo', 'overlay_dir')
 
 
-@patch('os.path.exists', return_value=True)
+@patch('kiwi_keg.directory_cache.DirectoryCache.exists', return_value=True)
 def test_add_dir_to_archive(mock_path_exists, patched_image_definition):
     patched_image_definition._data = {'archives': {}}
     patched_image_definition._add_dir_to_archive('foo-archive', 'overlay_module')
     assert patched_image_definition._data == {'archives': {'foo-archive': [os.path.join('root', 'data', 'overlayfiles', 'overlay_module')]}}
 
 
-@patch('os.path.exists', return_value=False)
+@patch('kiwi_keg.directory_cache.DirectoryCache.exists', return_value=False)
 def test_add_dir_to_archive_missing(mock_path_exists, patched_image_definition):
     patched_image_definition._data = {'archives': {}}
     with raises(KegDataError) as err:
@@ -288,3 +351,47 @@ def test_keg_image_definition_properties(patched_image_definition):
     assert patched_image_definition.archives == ['foo-archive']
     assert patched_image_definition.config_script == 'config_script'
     assert patched_image_definition.images_script == 'images_script'
+
+
+@patch('kiwi_keg.image_definition.KegImageDefinition._populate')
+def test_image_definition_snapshot(mock_populate, patched_image_definition_tracking, tmp_path):
+    image_definition = patched_image_definition_tracking
+    image_definition._data = AnnotatedMapping({
+        'image': {'name': 'image', '__name_source__': 'images/image.yaml'},
+        'archives': {'root.tar.gz': ['root/data/overlayfiles/base']}
+    })
+    image_definition._config_script = 'config'
+    image_definition._images_script = 'images'
+    image_definition._source_dirs = ['root/images/image_name']
+    image_definition._cache = object()
+    image_definition._populated = True
+    image_definition.save_snapshot(str(tmp_path / 'snapshot'))
+
+    restored = KegImageDefinition.load_snapshot(str(tmp_path / 'snapshot'))
+    restored.populate()
+    assert not mock_populate.called
+    assert restored.image_name == 'image_name'
+    assert restored.recipes_roots == ['root']
+    assert restored.data['image']['__name_source__'] == 'images/image.yaml'
+    assert restored.archives == {'root.tar.gz': ['root/data/overlayfiles/base']}
+    assert restored.config_script == 'config'
+    assert restored.images_script == 'images'
+    assert restored.source_dirs == ['root/images/image_name']
+    assert restored.dict_type == AnnotatedMapping
+    assert restored._cache is None
+
+
+def test_image_definition_snapshot_invalid(patched_image_definition, tmp_path):
+    with raises(KegDataError, match='Error reading image definition snapshot'):
+        KegImageDefinition.load_snapshot(str(tmp_path / 'missing'))
+    patched_image_definition._populated = True
+    patched_image_definition.save_snapshot(str(tmp_path / 'snapshot'))
+    with patch('kiwi_keg.version.__version__', '0.0.0'):
+        with raises(KegDataError, match='was not written by keg 0.0.0'):
+            KegImageDefinition.load_snapshot(str(tmp_path / 'snapshot'))
+
+
+def test_image_definition_snapshot_not_populated(patched_image_definition, tmp_path):
+    with raises(KegDataError, match='is not populated'):
+        patched_image_definition.save_snapshot(str(tmp_path / 'snapshot'))
+    assert not (tmp_path / 'snapshot').exists()
@@ -1,12 +1,16 @@
+import json
+import os
 import sys
 from pytest import fixture, raises
-from unittest.mock import Mock, patch, DEFAULT
+from unittest.mock import Mock, patch, call, DEFAULT
 import kiwi_keg.keg
+from kiwi_keg.file_utils import get_all_leaf_dirs
 from kiwi_keg.exceptions import KegError, KegKiwiValidationError
 
 
 class FakeImageDefinition:
     def __init__(self):
+        self.source_dirs = []
         self.data = {
             'image': {
                 '_attributes': {
@@ -27,21 +31,25 @@ class FakeImageDefinition:
 
 
 @fixture
-def patched_keg():
-    with patch.multiple(
-        'kiwi_keg.keg',
-        KegGenerator=DEFAULT,
-        KegImageDefinition=DEFAULT,
-        get_all_leaf_dirs=DEFAULT,
-        SourceInfoGenerator=DEFAULT,
-        AnnotatedPrettyPrinter=DEFAULT
-    ) as mocks:
+def patched_keg(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    # keg imports these lazily, patch them where they are defined
+    with patch.multiple('kiwi_keg.generator', KegGenerator=DEFAULT) as generator_mocks, \
+            patch.multiple('kiwi_keg.image_definition', KegImageDefinition=DEFAULT) as image_definition_mocks, \
+            patch.multiple('kiwi_keg.file_utils', get_all_leaf_dirs=DEFAULT) as file_utils_mocks, \
+            patch.multiple('kiwi_keg.source_info_generator', SourceInfoGenerator=DEFAULT) as source_info_mocks, \
+            patch.multiple('kiwi_keg.annotated_mapping', AnnotatedPrettyPrinter=DEFAULT) as annotated_mapping_mocks:
+        mocks = dict(
+            **generator_mocks, **image_definition_mocks, **file_utils_mocks,
+            **source_info_mocks, **annotated_mapping_mocks
+        )
         mocks['get_all_leaf_dirs'].return_value = ['fake_image_src']
         mocks['KegImageDefinition'].return_value = FakeImageDefinition()
         pprinter = Mock()
         mocks['AnnotatedPrettyPrinter'].return_value = pprinter
         mocks['pprinter'] = pprinter
-        yield mocks
+        with patch('kiwi_keg.catalogue.KegImageDefinition', mocks['KegImageDefinition']):
+            yield mocks
 
 
 def test_main_list_recipes(patched_keg, capsys):
@@ -75,6 +83,52 @@ def test_main_list_recipes_missing_key(patched_keg, caplog):
     assert 'is not a valid image definition, missing key' in caplog.text
 
 
+def test_main_list_recipes_json(patched_keg, capsys):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--list-recipes', '--list-format=json', '--no-cache']
+    kiwi_keg.keg.main()
+    cap = capsys.readouterr()
+    assert json.loads(cap.out) == [
+        {'source': 'fake_image_src', 'name': 'fake image', 'version': '1.0.0', 'description': 'fake spec'}
+    ]
+
+
+def test_main_list_recipes_invalid_format(patched_keg, caplog):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--list-recipes', '--list-format=xml']
+    with raises(SystemExit):
+        kiwi_keg.keg.main()
+    assert 'Unsupported list format "xml"' in caplog.text
+
+
+@patch('multiprocessing.get_context')
+def test_main_list_recipes_parallel(mock_get_context, patched_keg, capsys):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--list-recipes', '-j', '8', '--no-cache']
+    patched_keg['get_all_leaf_dirs'].return_value = ['image_b', 'image_a']
+    pool = mock_get_context.return_value.Pool.return_value.__enter__.return_value
+    pool.starmap.side_effect = lambda func, iterable: [func(*x) for x in iterable]
+    kiwi_keg.keg.main()
+    mock_get_context.return_value.Pool.assert_called_once_with(2)
+    cap = capsys.readouterr()
+    assert cap.out.splitlines()[1:] == [
+        'image_a fake image 1.0.0   fake spec',
+        'image_b fake image 1.0.0   fake spec'
+    ]
+
+
+def test_main_list_recipes_cached(patched_keg, capsys, tmp_path):
+    (tmp_path / 'images').mkdir()
+    patched_keg['KegImageDefinition'].return_value.source_dirs = [str(tmp_path / 'images')]
+    sys.argv = ['keg', '--recipes-root=fake_root', '--list-recipes', '--cache-dir', str(tmp_path / 'keg')]
+    kiwi_keg.keg.main()
+    kiwi_keg.keg.main()
+    assert patched_keg['KegImageDefinition'].call_count == 1
+    assert os.path.exists(tmp_path / 'keg' / 'catalogue.json')
+    (tmp_path / 'images' / 'new.yaml').write_text('')
+    kiwi_keg.keg.main()
+    assert patched_keg['KegImageDefinition'].call_count == 2
+    cap = capsys.readouterr()
+    assert cap.out.count('fake_image_src fake image 1.0.0   fake spec') == 3
+
+
 def test_main_dump_dict(patched_keg):
     sys.argv = ['keg', '--verbose', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--dump-dict', 'fake_image_src']
     kiwi_keg.keg.main()
@@ -87,6 +141,32 @@ def test_main_dump_dict(patched_keg):
     patched_keg['pprinter'].pprint.assert_called_once_with(patched_keg['KegImageDefinition']().data)
 
 
+def test_main_dump_dict_json(patched_keg, capsys):
+    sys.argv = [
+        'keg', '--recipes-root=fake_root', '--dump-dict', '--dump-format=json',
+        '--dump-key=image.description', 'fake_image_src'
+    ]
+    kiwi_keg.keg.main()
+    assert json.loads(capsys.readouterr().out) == {'specification': 'fake spec'}
+
+
+def test_main_dump_dict_yaml(patched_keg, capsys):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dump-dict', '--dump-format=yaml', 'fake_image_src']
+    kiwi_keg.keg.main()
+    assert 'specification: fake spec\n' in capsys.readouterr().out
+
+
+def test_main_dump_dict_errors(patched_keg, caplog):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dump-dict', '--dump-format=xml', 'fake_image_src']
+    with raises(SystemExit):
+        kiwi_keg.keg.main()
+    assert 'Unsupported dump format: xml' in caplog.text
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dump-dict', '--dump-key=image.nope', 'fake_image_src']
+    with raises(SystemExit):
+        kiwi_keg.keg.main()
+    assert 'Key path image.nope not found' in caplog.text
+
+
 def test_main_standard(patched_keg):
     sys.argv = ['keg', '--verbose', '--recipes-root=fake_root', '--dest-dir=fake_dir', '-s', 'fake_image_src']
     kiwi_keg.keg.main()
@@ -94,13 +174,15 @@ def test_main_standard(patched_keg):
         image_name='fake_image_src',
         recipes_roots=['fake_root'],
         image_version=None,
-        track_sources=True
+        track_sources=True,
+        cache=None
     )
     patched_keg['KegGenerator'].assert_called_once_with(
         image_definition=patched_keg['KegImageDefinition'](),
         dest_dir='fake_dir',
         archs=[],
-        gen_profiles_comment=True
+        gen_profiles_comment=True,
+        cache=None
     )
     patched_keg['KegGenerator']().create_kiwi_description.assert_called_once()
     patched_keg['KegGenerator']().validate_kiwi_description.assert_called_once()
@@ -162,3 +244,161 @@ def test_main_unknown_error(patched_keg, caplog):
     with raises(Exception):
         kiwi_keg.keg.main()
     assert 'Unexpected error' in caplog.text
+
+
+@patch('os.makedirs')
+@patch('kiwi_keg.keg.get_batch_sources', return_value=['sles/a', 'sles/b'])
+def test_main_batch(mock_get_batch_sources, mock_makedirs, patched_keg):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--batch', 'sles/*']
+    kiwi_keg.keg.main()
+    mock_get_batch_sources.assert_called_once_with(['fake_root'], ['sles/*'])
+    assert mock_makedirs.call_args_list == [
+        call(os.path.join('fake_dir', 'sles/a'), exist_ok=True),
+        call(os.path.join('fake_dir', 'sles/b'), exist_ok=True)
+    ]
+    calls = patched_keg['KegImageDefinition'].call_args_list
+    assert [x.kwargs['image_name'] for x in calls] == ['sles/a', 'sles/b']
+    # all images share the same cache
+    assert calls[0].kwargs['cache'] is calls[1].kwargs['cache']
+    assert calls[0].kwargs['cache'] is not None
+
+
+@patch('os.makedirs')
+@patch('kiwi_keg.keg.get_batch_sources', return_value=['sles/a', 'sles/b', 'sles/c'])
+def test_main_batch_errors(mock_get_batch_sources, mock_makedirs, patched_keg, caplog):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--batch', 'sles/*']
+    patched_keg['KegImageDefinition'].side_effect = [KegError('fake error'), Exception('boom'), FakeImageDefinition()]
+    with raises(SystemExit):
+        kiwi_keg.keg.main()
+    assert 'sles/a: KegError: fake error' in caplog.text
+    assert 'sles/b: Unexpected error' in caplog.text
+    assert 'Generated 1 of 3 image descriptions' in caplog.text
+    assert 'Failed images: sles/a, sles/b' in caplog.text
+
+
+@patch('os.makedirs')
+@patch('kiwi_keg.keg.get_batch_sources', return_value=['sles/a'])
+def test_main_batch_keyboard_interrupt(mock_get_batch_sources, mock_makedirs, patched_keg, caplog):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--batch', 'sles/*']
+    patched_keg['KegImageDefinition'].side_effect = KeyboardInterrupt
+    with raises(SystemExit):
+        kiwi_keg.keg.main()
+    assert 'keg aborted by keyboard interrupt' in caplog.text
+
+
+@patch('os.makedirs')
+@patch('multiprocessing.get_context')
+@patch('kiwi_keg.file_utils.preload_recipes')
+@patch('kiwi_keg.keg.get_batch_sources', return_value=['sles/a', 'sles/b'])
+def test_main_batch_parallel(mock_get_batch_sources, mock_preload_recipes, mock_get_context, mock_makedirs, patched_keg):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--batch', '-j', '4', '-s', 'sles/*']
+    pool = mock_get_context.return_value.Pool.return_value.__enter__.return_value
+    pool.starmap.side_effect = lambda func, iterable, chunksize: [func(*x) for x in iterable]
+    kiwi_keg.keg.main()
+    cache = mock_preload_recipes.call_args.args[0]
+    mock_preload_recipes.assert_called_once_with(cache, ['fake_root'], ['sles/a', 'sles/b'], True)
+    mock_get_context.assert_called_once_with('fork')
+    mock_get_context.return_value.Pool.assert_called_once_with(2)
+    calls = patched_keg['KegImageDefinition'].call_args_list
+    assert [x.kwargs['image_name'] for x in calls] == ['sles/a', 'sles/b']
+    assert calls[0].kwargs['cache'] is cache
+    assert kiwi_keg.keg._batch_cache is None
+
+
+@patch('kiwi_keg.keg.get_batch_sources', return_value=['sles/a'])
+def test_main_batch_invalid_jobs(mock_get_batch_sources, patched_keg, caplog):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--batch', '-j', 'many', 'sles/*']
+    with raises(SystemExit):
+        kiwi_keg.keg.main()
+    assert 'Invalid number of jobs "many"' in caplog.text
+
+
+@patch('kiwi_keg.keg.get_batch_sources', return_value=[])
+def test_main_batch_no_images(mock_get_batch_sources, patched_keg, caplog):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--batch', 'nomatch/*']
+    with raises(SystemExit):
+        kiwi_keg.keg.main()
+    assert 'No images found matching nomatch/*' in caplog.text
+
+
+def test_get_batch_sources(patched_keg, tmp_path):
+    for image in ['sles/15/a', 'sles/15/b', 'sles/16/a', 'leap/15']:
+        (tmp_path / 'images' / image).mkdir(parents=True)
+    patched_keg['get_all_leaf_dirs'].side_effect = get_all_leaf_dirs
+    assert kiwi_keg.keg.get_batch_sources([str(tmp_path)], ['sles/15/*', 'leap']) == [
+        'leap/15', 'sles/15/a', 'sles/15/b'
+    ]
+    assert kiwi_keg.keg.get_batch_sources([str(tmp_path)], ['**']) == [
+        'leap/15', 'sles/15/a', 'sles/15/b', 'sles/16/a'
+    ]
+
+
+def test_main_profile(patched_keg, capsys, tmp_path):
+    trace_file = tmp_path / 'trace.json'
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--profile-trace', str(trace_file), 'fake_image_src']
+
+    def fake_generate_image(*args):
+        with kiwi_keg.keg.profiler.phase('fake phase'):
+            pass
+
+    with patch('kiwi_keg.keg.generate_image', side_effect=fake_generate_image):
+        kiwi_keg.keg.main()
+    assert not kiwi_keg.keg.profiler.enabled
+    assert 'wall time' in capsys.readouterr().err
+    with open(trace_file) as trace:
+        assert [x['name'] for x in json.load(trace)['traceEvents']] == ['fake phase']
+
+
+def test_main_profile_trace_error(patched_keg, caplog):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--profile-trace', '/does/not/exist/trace.json', 'fake_image_src']
+    kiwi_keg.keg.main()
+    assert 'Cannot write profile trace' in caplog.text
+
+
+@patch('os.makedirs')
+@patch('multiprocessing.get_context')
+@patch('kiwi_keg.file_utils.preload_recipes')
+@patch('kiwi_keg.keg.get_batch_sources', return_value=['sles/a', 'sles/b'])
+def test_main_batch_parallel_profile(mock_get_batch_sources, mock_preload_recipes, mock_get_context, mock_makedirs, patched_keg, capsys):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--batch', '-j', '2', '--profile', 'sles/*']
+    pool = mock_get_context.return_value.Pool.return_value.__enter__.return_value
+
+    def fake_worker(func, iterable, chunksize):
+        # simulate separate worker processes, each with their own records
+        results = []
+        for x in iterable:
+            ok, records = func(*x)
+            del kiwi_keg.keg.profiler.records[-len(records):]
+            results.append((ok, records))
+        return results
+
+    def fake_generate_image(*args):
+        with kiwi_keg.keg.profiler.phase('fake phase'):
+            pass
+
+    pool.starmap.side_effect = fake_worker
+    with patch('kiwi_keg.keg.generate_image', side_effect=fake_generate_image):
+        kiwi_keg.keg.main()
+    assert [x['name'] for x in kiwi_keg.keg.profiler.records] == ['fake phase', 'fake phase']
+    assert 'fake phase' in capsys.readouterr().err
+
+
+def test_main_profile_memory(patched_keg):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--profile-memory', 'fake_image_src']
+    with patch.object(kiwi_keg.keg.profiler, 'enable', wraps=kiwi_keg.keg.profiler.enable) as mock_enable:
+        kiwi_keg.keg.main()
+    mock_enable.assert_called_once_with(memory=True)
+    assert not kiwi_keg.keg.profiler.memory_enabled
+
+
+def test_main_validation_cache(patched_keg, tmp_path):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--cache-dir', str(tmp_path), 'fake_image_src']
+    kiwi_keg.keg.main()
+    cache = patched_keg['KegGenerator']().validate_kiwi_description.call_args.args[0]
+    assert cache.cache_file == os.path.join(str(tmp_path), 'validation.json')
+
+
+def test_main_validation_no_cache(patched_keg):
+    sys.argv = ['keg', '--recipes-root=fake_root', '--dest-dir=fake_dir', '--no-cache', 'fake_image_src']
+    kiwi_keg.keg.main()
+    patched_keg['KegGenerator']().validate_kiwi_description.assert_called_once_with(None)
@@ -1,5 +1,5 @@
 from pytest import raises
-from unittest.mock import patch, Mock, call, mock_open
+from unittest.mock import patch, Mock, mock_open
 
 from kiwi_keg.kiwi_description import KiwiDescription
 
@@ -16,7 +16,7 @@ def test_kiwi_description_init_raises(mock_isfile):
         KiwiDescription('does-not-exist')
 
 
-@patch('kiwi_keg.kiwi_description.XMLDescription')
+@patch('kiwi.xml_description.XMLDescription')
 @patch('os.path.isfile', return_value=True)
 def test_kiwi_description_validate_description(mock_isfile, mock_xml_description):
     kiwi = KiwiDescription('config.xml')
@@ -26,6 +26,15 @@ def test_kiwi_description_validate_description(mock_isfile, mock_xml_description
     mock_description_obj.load.assert_called_once()
 
 
+@patch('kiwi.xml_description.XMLDescription')
+@patch('os.path.isfile', return_value=True)
+def test_kiwi_description_validate_description_once(mock_isfile, mock_xml_description):
+    kiwi = KiwiDescription('config.xml')
+    assert kiwi.validate_description() is kiwi.validate_description()
+    mock_xml_description.assert_called_once_with('config.xml')
+    mock_xml_description.return_value.load.assert_called_once()
+
+
 @patch('kiwi.xml_description.XMLDescription')
 @patch('os.path.isfile', return_value=True)
 def test_kiwi_description_validate_description_invalid(mock_isfile, mock_xml_description):
@@ -39,17 +48,11 @@ def test_kiwi_description_validate_description_invalid(mock_isfile, mock_xml_des
 @patch('kiwi_keg.kiwi_description.KiwiDescription._read_XML_comments')
 @patch('os.path.isfile', return_value=True)
 def test_kiwi_description_create_XML_description(mock_isfile, mock_read_xml_comments, mock_create_description):
-    mock_read_xml_comments.return_value = '<!-- comment -->'
+    mock_read_xml_comments.return_value = ['<!-- comment -->\n']
     kiwi = KiwiDescription('config.xml')
-    with patch('builtins.open') as mock_file:
-        kiwi.create_XML_description('output.xml')
-        mock_read_xml_comments.assert_called_once()
-        mock_create_description.assert_called_once_with('output.xml', 'xml')
-        mock_file.assert_has_calls([
-            call('output.xml', 'w'),
-            call().__enter__(),
-            call().__enter__().write('<!-- comment -->'),
-        ])
+    kiwi.create_XML_description('output.xml')
+    mock_read_xml_comments.assert_called_once()
+    mock_create_description.assert_called_once_with('output.xml', 'xml', ['<!-- comment -->\n'])
 
 
 @patch('kiwi_keg.kiwi_description.KiwiDescription._create_description')
@@ -108,10 +111,11 @@ def test_kiwi_description_read_yaml_comments(mock_isfile):
 XML_comments = '''
 <?xml?>
 <!-- single line comment -->
-<not a comment/>
 <!-- multi
 line
 comment -->
+<not a comment/>
+<!-- trailing comment -->
 '''
 
 
@@ -123,5 +127,18 @@ def test_kiwi_description_read_xml_comments(mock_isfile):
         comments = kiwi._read_XML_comments()
         assert '<!-- single line comment -->\n' in comments
         assert '<!-- multi\n' in comments
+        assert 'comment -->\n' in comments
+        assert '<!-- trailing comment -->\n' not in comments
 
     mo.assert_called_once_with('config.xml', 'r')
+
+
+@patch('kiwi_keg.kiwi_description.KiwiDescription.validate_description')
+@patch('os.path.isfile', return_value=True)
+def test_kiwi_description_create_description_header(mock_isfile, mock_validate_description, tmp_path):
+    document = tmp_path / 'document.xml'
+    document.write_text('<image/>\n')
+    mock_validate_description.return_value.markup.get_xml_description.return_value = str(document)
+    kiwi = KiwiDescription('config.xml')
+    kiwi._create_description(str(tmp_path / 'output.xml'), 'xml', ['<?xml?>\n', '<!-- comment -->\n'])
+    assert (tmp_path / 'output.xml').read_text() == '<?xml?>\n<!-- comment -->\n<image/>\n'
@@ -0,0 +1,40 @@
+from pytest import raises
+
+from kiwi_keg.exceptions import KegDataError
+from kiwi_keg.profile_graph import ProfileGraph
+
+
+def _profile(name, *requires):
+    profile = {'_attributes': {'name': name}}
+    if len(requires) == 1:
+        profile['requires'] = {'_attributes': {'profile': requires[0]}}
+    elif requires:
+        profile['requires'] = [{'_attributes': {'profile': x}} for x in requires]
+    return profile
+
+
+def test_profile_graph():
+    graph = ProfileGraph.from_profiles([
+        _profile('base'),
+        _profile('cloud', 'base'),
+        _profile('azure', 'cloud', 'sap'),
+        _profile('sap', 'base')
+    ])
+    graph.check()
+    assert graph.names == ['base', 'cloud', 'azure', 'sap']
+    assert graph.get_requires('azure') == ['cloud', 'sap']
+    assert graph.get_requires('unknown') == []
+    requires = graph.get_requires('azure')
+    requires.append('modified')
+    assert graph.get_requires('azure') == ['cloud', 'sap']
+
+
+def test_profile_graph_cycle():
+    graph = ProfileGraph.from_profiles([
+        _profile('base', 'azure'),
+        _profile('cloud', 'base'),
+        _profile('azure', 'cloud')
+    ])
+    assert graph.get_requires('base') == ['azure']
+    with raises(KegDataError, match='Cyclic profile requirements: base -> azure -> cloud -> base'):
+        graph.check()
@@ -0,0 +1,149 @@
+import io
+import json
+from unittest.mock import patch
+
+from kiwi_keg.profiler import Profiler
+
+
+class TestProfiler:
+    def setup_method(self):
+        self.profiler = Profiler()
+
+    def test_phase_disabled(self):
+        with self.profiler.phase('load'):
+            pass
+        assert self.profiler.records == []
+        assert self.profiler.get_wall_time() == 0.0
+
+    @patch('kiwi_keg.profiler.time.perf_counter')
+    def test_phase_enabled(self, mock_perf_counter):
+        mock_perf_counter.side_effect = [10.0, 11.0, 13.0, 14.0, 14.5, 16.0, 20.0]
+        self.profiler.enable()
+        with self.profiler.phase('load'):
+            pass
+        with self.profiler.phase('render'):
+            pass
+        try:
+            with self.profiler.phase('load'):
+                raise ValueError
+        except ValueError:
+            pass
+        assert [(x['name'], x['start'], x['duration']) for x in self.profiler.records] == [
+            ('load', 11.0, 2.0),
+            ('render', 14.0, 0.5),
+            ('load', 16.0, 4.0)
+        ]
+        assert self.profiler.get_summary() == [
+            {'name': 'load', 'calls': 2, 'total': 6.0, 'max': 4.0, 'mean': 3.0},
+            {'name': 'render', 'calls': 1, 'total': 0.5, 'max': 0.5, 'mean': 0.5}
+        ]
+        self.profiler.disable()
+        with self.profiler.phase('load'):
+            pass
+        assert len(self.profiler.records) == 3
+
+    @patch('kiwi_keg.profiler.time.perf_counter')
+    def test_print_report(self, mock_perf_counter):
+        mock_perf_counter.side_effect = [0.0, 10.0]
+        self.profiler.enable()
+        self.profiler.add_records([
+            {'kind': 'time', 'name': 'recipe loading', 'start': 1.0, 'duration': 2.5, 'pid': 1}
+        ])
+        report = io.StringIO()
+        self.profiler.print_report(report)
+        lines = report.getvalue().splitlines()
+        assert lines[0].split() == ['Phase', 'Calls', 'Total[s]', 'Mean[s]', 'Max[s]', 'Wall%']
+        assert lines[1].split() == ['recipe', 'loading', '1', '2.500', '2.500', '2.500', '25.0']
+        assert lines[2].split() == ['wall', 'time', '10.000']
+
+    def test_print_report_no_wall_time(self):
+        self.profiler.add_records([
+            {'kind': 'time', 'name': 'load', 'start': 1.0, 'duration': 2.5, 'pid': 1}
+        ])
+        report = io.StringIO()
+        self.profiler.print_report(report)
+        assert report.getvalue().splitlines()[1].split()[-1] == '0.0'
+
+    @patch('kiwi_keg.profiler.time.perf_counter')
+    def test_write_trace(self, mock_perf_counter, tmp_path):
+        mock_perf_counter.side_effect = [1.0, 5.0]
+        self.profiler.enable()
+        self.profiler.add_records([
+            {'kind': 'time', 'name': 'load', 'start': 1.5, 'duration': 0.25, 'pid': 42}
+        ])
+        trace_file = tmp_path / 'trace.json'
+        self.profiler.write_trace(str(trace_file))
+        with open(trace_file) as trace:
+            content = json.load(trace)
+        assert content['traceEvents'] == [
+            {'name': 'load', 'ph': 'X', 'ts': 500000, 'dur': 250000, 'pid': 42, 'tid': 42}
+        ]
+        assert content['summary'][0]['calls'] == 1
+        assert content['wall_time'] == 4.0
+
+    def test_memory_disabled(self):
+        self.profiler.enable()
+        with self.profiler.memory('populate'):
+            pass
+        assert self.profiler.records == []
+
+    def test_memory(self):
+        self.profiler.enable(memory=True)
+        with self.profiler.memory('populate'):
+            kept = [bytearray(1000) for _ in range(100)]
+            with self.profiler.memory('schema validation'):
+                temporary = bytearray(500000)
+                del temporary
+        self.profiler.disable()
+        assert [x['name'] for x in self.profiler.records] == ['schema validation', 'populate']
+        inner, outer = self.profiler.records
+        assert inner['peak'] >= 400000
+        assert inner['retained'] < 400000
+        # peak of the nested phase is accounted for in the outer phase
+        assert outer['peak'] >= inner['peak']
+        assert outer['retained'] >= 100000
+        assert any(__file__ in x['site'] for x in outer['sites'])
+        assert len(kept) == 100
+
+    @patch('kiwi_keg.profiler.tracemalloc')
+    def test_memory_already_tracing(self, mock_tracemalloc):
+        mock_tracemalloc.is_tracing.return_value = True
+        self.profiler.enable(memory=True)
+        self.profiler.disable()
+        mock_tracemalloc.start.assert_not_called()
+        mock_tracemalloc.stop.assert_not_called()
+
+    def test_memory_report(self, tmp_path):
+        self.profiler.enable(memory=True)
+        self.profiler.disable()
+        self.profiler.add_records([
+            {
+                'kind': 'memory', 'name': 'populate', 'peak': 4096, 'retained': 1024,
+                'sites': [{'site': 'a.py:1', 'size': 1024, 'count': 1}, {'site': 'b.py:2', 'size': 512, 'count': 1}],
+                'pid': 1
+            },
+            {
+                'kind': 'memory', 'name': 'populate', 'peak': 2048, 'retained': 1024,
+                'sites': [{'site': 'b.py:2', 'size': 1024, 'count': 1}],
+                'pid': 1
+            }
+        ])
+        assert self.profiler.get_memory_summary() == [
+            {
+                'name': 'populate', 'calls': 2, 'peak': 4096, 'retained': 2048,
+                'sites': [{'site': 'b.py:2', 'size': 1536}, {'site': 'a.py:1', 'size': 1024}]
+            }
+        ]
+        report = io.StringIO()
+        self.profiler.print_report(report)
+        lines = report.getvalue().splitlines()
+        assert lines[3].split() == ['Phase', 'Calls', 'Peak[KiB]', 'Retained[KiB]']
+        assert lines[4].split() == ['populate', '2', '4.0', '2.0']
+        assert lines[6] == 'Top allocation sites in populate:'
+        assert lines[7].split() == ['1.5', 'KiB', 'b.py:2']
+        trace_file = tmp_path / 'trace.json'
+        self.profiler.write_trace(str(trace_file))
+        with open(trace_file) as trace:
+            content = json.load(trace)
+        assert content['traceEvents'] == []
+        assert content['memory'][0]['peak'] == 4096
@@ -0,0 +1,33 @@
+import yaml
+from unittest.mock import patch, mock_open, Mock
+
+from kiwi_keg.recipes_cache import RecipesCache
+
+
+def test_recipes_cache_get():
+    cache = RecipesCache()
+    factory = Mock(return_value='value')
+    assert cache.get('ns', 'key', factory) == 'value'
+    assert cache.get('ns', 'key', factory) == 'value'
+    factory.assert_called_once_with()
+    cache.clear()
+    assert cache.get('ns', 'key', factory) == 'value'
+    assert factory.call_count == 2
+
+
+@patch('builtins.open', new_callable=mock_open, read_data='foo:\n  bar: baz\n')
+def test_recipes_cache_load_yaml(mock_file):
+    cache = RecipesCache()
+    data = cache.load_yaml('fake.yaml', yaml.SafeLoader)
+    assert data == {'foo': {'bar': 'baz'}}
+    data['foo']['bar'] = 'modified'
+    assert cache.load_yaml('fake.yaml', yaml.SafeLoader) == {'foo': {'bar': 'baz'}}
+    mock_file.assert_called_once_with('fake.yaml', 'r')
+
+
+@patch('builtins.open', new_callable=mock_open, read_data='script content')
+def test_recipes_cache_read_file(mock_file):
+    cache = RecipesCache()
+    assert cache.read_file('script.sh') == 'script content'
+    assert cache.read_file('script.sh') == 'script content'
+    mock_file.assert_called_once_with('script.sh', 'r')
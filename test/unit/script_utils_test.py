@@ -3,6 +3,7 @@ from pytest import raises
 from unittest.mock import patch, call, mock_open, Mock
 from kiwi_keg import script_utils
 from kiwi_keg.exceptions import KegError
+from kiwi_keg.recipes_cache import RecipesCache
 
 
 config_data = [
@@ -55,8 +56,8 @@ def test_script_utils_get_config_script_no_profiles(mock_get_script_section):
     mock_get_script_section.return_value = 'script_data'
     output = script_utils.get_config_script(config_data, ['scripts'])
     mock_get_script_section.assert_has_calls([
-        call(config_data[0], ['scripts']),
-        call(config_data[1], ['scripts']),
+        call(config_data[0], ['scripts'], cache=None, dir_cache=None),
+        call(config_data[1], ['scripts'], cache=None, dir_cache=None),
     ])
     assert output == 'script_data\nscript_data'
 
@@ -76,7 +77,7 @@ def test_script_utils_get_config_script_with_profiles(mock_get_script_section):
     del cd[1]
     mock_get_script_section.return_value = '    script_data\n'
     output = script_utils.get_config_script(cd, ['scripts'])
-    mock_get_script_section.assert_called_with(cd[0], ['scripts'], '    ')
+    mock_get_script_section.assert_called_with(cd[0], ['scripts'], '    ', None, None)
     assert output == expected_output
 
 
@@ -88,7 +89,7 @@ def test_script_utils_get_script_section(mock_files, mock_scripts, mock_services
     script_utils.get_script_section(config_data[0], ['scripts'], 'indent')
     script_utils.get_script_section(config_data[1], ['scripts'], 'indent')
     mock_files.assert_called_once_with(config_data[0]['files']['files_namespace'], 'files_namespace', 'indent')
-    mock_scripts.assert_called_once_with(config_data[0]['scripts']['scripts_namespace'], 'scripts_namespace', ['scripts'])
+    mock_scripts.assert_called_once_with(config_data[0]['scripts']['scripts_namespace'], 'scripts_namespace', ['scripts'], None, None)
     mock_services.assert_called_once_with(config_data[0]['services']['services_namespace'], 'services_namespace')
     mock_sysconfig.assert_called_once_with(config_data[1]['sysconfig']['sysconfig_namespace'], 'sysconfig_namespace')
 
@@ -129,7 +130,21 @@ def test_script_utils_get_scripts_section(mock_get_script_path):
     with patch('builtins.open', mo):
         data = script_utils.get_scripts_section(config_data[0]['scripts']['scripts_namespace'], 'scripts_namespace', ['scripts'])
     assert data == 'script_content'
-    mock_get_script_path.assert_called_once_with(['scripts'], 'config_scriptlet')
+    mock_get_script_path.assert_called_once_with(['scripts'], 'config_scriptlet', None)
+
+
+@patch('kiwi_keg.script_utils.get_script_path', return_value='scripts/config_scriptlet.sh')
+def test_script_utils_get_scripts_section_cached(mock_get_script_path):
+    cache = RecipesCache()
+    mo = mock_open(read_data='script_content')
+    with patch('builtins.open', mo):
+        for i in range(2):
+            data = script_utils.get_scripts_section(
+                config_data[0]['scripts']['scripts_namespace'], 'scripts_namespace', ['scripts'], cache
+            )
+            assert data == 'script_content'
+    mock_get_script_path.assert_called_once_with(['scripts'], 'config_scriptlet', None)
+    mo.assert_called_once_with('scripts/config_scriptlet.sh', 'r')
 
 
 @patch('kiwi_keg.script_utils.get_script_path', return_value=None)
@@ -146,3 +161,10 @@ def test_script_utils_get_script_path(mock_scandir):
     mock_scandir.return_value = [mock_entry]
     data = script_utils.get_script_path(['scripts'], 'script_name')
     assert data == os.path.join('scripts', 'script_name.sh')
+
+
+def test_script_utils_get_script_path_dir_cache():
+    dir_cache = Mock()
+    dir_cache.find_file.return_value = 'scripts/config_scriptlet.sh'
+    assert script_utils.get_script_path(['scripts'], 'config_scriptlet', dir_cache) == 'scripts/config_scriptlet.sh'
+    dir_cache.find_file.assert_called_once_with(['scripts'], 'config_scriptlet.sh')
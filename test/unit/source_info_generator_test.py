@@ -57,9 +57,12 @@ def test_source_info_generator_write_source_info(
 @patch('kiwi_keg.image_definition.KegImageDefinition.get_build_profile_names', return_value=['profile_one'])
 @patch('kiwi_keg.source_info_generator.SourceInfoGenerator._get_archive_sources', return_value=['root/overlayfiles/overlay_dir'])
 @patch('kiwi_keg.source_info_generator.SourceInfoGenerator._get_script_sources', return_value=['root/script.sh'])
-@patch('kiwi_keg.source_info_generator.SourceInfoGenerator._get_mapping_sources', return_value=['range:1:2:root/file.yaml'])
+@patch(
+    'kiwi_keg.source_info_generator.SourceInfoGenerator._get_profile_mapping_sources',
+    return_value=[('range:1:2:root/file.yaml', frozenset(['profile_one']))]
+)
 def test_source_info_generator_write_source_info_profiles(
-        mock_get_mapping_sources,
+        mock_get_profile_mapping_sources,
         mock_get_script_sources,
         mock_get_archive_sources,
         mock_get_build_profile_names,
@@ -69,9 +72,9 @@ def test_source_info_generator_write_source_info_profiles(
     patched_source_info_generator.image_definition._data = AnnotatedMapping({'foo': 'bar'})
     with patch('builtins.open', mo):
         patched_source_info_generator.write_source_info()
-    mock_get_mapping_sources.assert_called_once_with(
+    mock_get_profile_mapping_sources.assert_called_once_with(
         AnnotatedMapping({'foo': 'bar'}),
-        profile='profile_one',
+        frozenset(['profile_one']),
         skip_keys=patched_source_info_generator.internal_toplevel_keys
     )
     mock_get_script_sources.assert_called_once_with('profile_one')
@@ -84,6 +87,57 @@ def test_source_info_generator_write_source_info_profiles(
     ])
 
 
+def _annotated(data, line):
+    result = AnnotatedMapping()
+    for key, value in data.items():
+        if isinstance(value, dict):
+            value = _annotated(value, line + 10)
+        elif isinstance(value, list):
+            value = [_annotated(x, line + 20 + i) if isinstance(x, dict) else x for i, x in enumerate(value)]
+        result[key] = value
+        result['__{}_source__'.format(key)] = 'file_{}.yaml'.format(line)
+        result['__{}_line_start__'.format(key)] = line
+        result['__{}_line_end__'.format(key)] = line + 1
+    return result
+
+
+@patch('kiwi_keg.source_info_generator.SourceInfoGenerator._get_archive_sources', return_value=[])
+@patch('kiwi_keg.source_info_generator.SourceInfoGenerator._get_script_sources', return_value=[])
+def test_source_info_generator_get_profile_sources(mock_get_script_sources, mock_get_archive_sources, patched_source_info_generator):
+    patched_source_info_generator.image_definition._data = _annotated({
+        'image': {
+            'profiles': {
+                'profile': [
+                    {'_attributes': {'name': 'base'}},
+                    {'_attributes': {'name': 'one'}, 'requires': {'_attributes': {'profile': 'base'}}},
+                    {'_attributes': {'name': 'two'}, 'requires': {'_attributes': {'profile': 'base'}}}
+                ]
+            },
+            'preferences': [
+                {'_attributes': {'profiles': ['one']}, 'type': {'image': 'oem'}},
+                {'_attributes': {'profiles': ['two']}, 'type': {'image': 'vmx'}},
+                {'_attributes': {'profiles': ['base']}, 'version': '1.0'},
+                {'locale': 'en_US'}
+            ],
+            'packages': [
+                {'_attributes': {'profiles': ['one', 'two']}, 'package': ['foo']}
+            ]
+        },
+        'timestamp': 'now'
+    }, 1)
+    profile_sources = patched_source_info_generator._get_profile_sources(['one', 'two'])
+    assert list(profile_sources) == ['one', 'base', 'two']
+    for profile, sources in profile_sources.items():
+        assert sources == patched_source_info_generator._coalesce_sources(
+            patched_source_info_generator._get_mapping_sources(
+                patched_source_info_generator.image_definition.data,
+                profile=profile,
+                skip_keys=patched_source_info_generator.internal_toplevel_keys
+            )
+        )
+    assert profile_sources['one'] != profile_sources['two']
+
+
 @patch('kiwi_keg.source_info_generator.SourceInfoGenerator._get_key_sources')
 def test_source_info_generator_get_mapping_sources_string(mock_get_key_sources, patched_source_info_generator):
     data = AnnotatedMapping({'foo': 'bar', '__foo_line_start__': 1, '__foo_line_end__': 2, '__foo_source__': 'foo_source'})
@@ -258,7 +312,7 @@ def test_source_info_generator_get_archive_sources_no_match(
 
 @patch('kiwi_keg.source_info_generator.script_utils.get_script_path', return_value='scriptlet_path')
 @patch('kiwi_keg.source_info_generator.SourceInfoGenerator._get_profiles_attrib', return_value=['profile_one'])
-@patch('os.path.exists', return_value=True)
+@patch('kiwi_keg.directory_cache.DirectoryCache.exists', return_value=True)
 def test_source_info_generator_get_script_sources(mock_path_exists, mock_get_profiles_attrib, mock_get_script_path, patched_source_info_generator):
     patched_source_info_generator.image_definition._data = {
         'config': [
@@ -273,12 +327,17 @@ def test_source_info_generator_get_script_sources(mock_path_exists, mock_get_pro
     }
     result = patched_source_info_generator._get_script_sources(profile='profile_one')
     mock_get_profiles_attrib.assert_called_with({'scripts': {'scripts_namespace': ['scriptlet']}})
+    mock_get_script_path.assert_called_once_with(
+        patched_source_info_generator.image_definition.get_script_dirs(),
+        'scriptlet',
+        patched_source_info_generator.image_definition.dir_cache
+    )
     assert result == ['scriptlet_path']
 
 
 @patch('kiwi_keg.source_info_generator.script_utils.get_script_path')
 @patch('kiwi_keg.source_info_generator.SourceInfoGenerator._get_profiles_attrib', return_value=['profile_two'])
-@patch('os.path.exists', return_value=True)
+@patch('kiwi_keg.directory_cache.DirectoryCache.exists', return_value=True)
 def test_source_info_generator_get_script_sources_no_match(
         mock_path_exists,
         mock_get_profiles_attrib,
@@ -298,3 +357,28 @@ def test_source_info_generator_get_script_sources_no_match(
     result = patched_source_info_generator._get_script_sources(profile='profile_one')
     mock_get_script_path.assert_not_called()
     assert result == []
+
+
+def test_source_info_generator_coalesce_sources(patched_source_info_generator):
+    assert patched_source_info_generator._coalesce_sources([
+        'range:10:12:root/b.yaml',
+        'range:1:2:root/a.yaml',
+        None,
+        'root/script.sh',
+        'range:3:5:root/a.yaml',
+        'range:13:13:root/b.yaml',
+        'root/script.sh',
+        'range:9:9:root/a.yaml',
+        'range:4:4:root/a.yaml',
+        'range:1:2:root/a.yaml',
+        'range:20:30:root/b.yaml',
+        'range:25:26:root/b.yaml',
+        'root/overlayfiles/overlay_dir'
+    ]) == [
+        'range:10:13:root/b.yaml',
+        'range:20:30:root/b.yaml',
+        'range:1:5:root/a.yaml',
+        'range:9:9:root/a.yaml',
+        'root/script.sh',
+        'root/overlayfiles/overlay_dir'
+    ]
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+# Modules keg must not load before they are needed
+HEAVY_MODULES = ['kiwi', 'jinja2', 'schema', 'yaml', 'tarfile', 'multiprocessing']
+
+# Budget for the cumulative import time of the keg command line module, in
+# microseconds. Loading keg with all dependencies takes several times more.
+IMPORT_TIME_BUDGET = 150000
+
+
+def get_import_times(module):
+    sp = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True
+    )
+    import_times = {}
+    for line in sp.stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        import_times[name.strip()] = int(cumulative)
+    return import_times
+
+
+def test_keg_startup_imports():
+    import_times = get_import_times('kiwi_keg.keg')
+    loaded = [x for x in import_times if x.split('.')[0] in HEAVY_MODULES]
+    assert loaded == []
+
+
+def test_keg_startup_time():
+    import_times = get_import_times('kiwi_keg.keg')
+    assert import_times['kiwi_keg.keg'] < IMPORT_TIME_BUDGET
@@ -1,4 +1,5 @@
 import datetime
+import json
 import logging
 import sys
 
@@ -245,3 +246,40 @@ def test_compose_kiwi_description_main_version(capsys):
     with raises(SystemExit):
         compose_kiwi_description.main()
         assert capsys.readouterr().out == compose_kiwi_description.__version__ + '\n'
+
+
+@patch('kiwi_keg.tools.compose_kiwi_description.compose')
+def test_compose_kiwi_description_main_profile(mock_compose, capsys, tmp_path):
+    trace_file = tmp_path / 'trace.json'
+
+    def fake_compose(args):
+        with compose_kiwi_description.profiler.phase('image generation'):
+            pass
+
+    mock_compose.side_effect = fake_compose
+    sys.argv = [
+        'compose_kiwi_description',
+        '--git-recipes=recipes',
+        '--image-source=image_source',
+        '--outdir=outdir',
+        '--profile-trace={}'.format(trace_file)
+    ]
+    compose_kiwi_description.main()
+    assert not compose_kiwi_description.profiler.enabled
+    assert 'image generation' in capsys.readouterr().err
+    with open(trace_file) as trace:
+        assert [x['name'] for x in json.load(trace)['traceEvents']] == ['image generation']
+
+
+@patch('kiwi_keg.tools.compose_kiwi_description.compose')
+def test_compose_kiwi_description_main_profile_trace_error(mock_compose, caplog):
+    sys.argv = [
+        'compose_kiwi_description',
+        '--git-recipes=recipes',
+        '--image-source=image_source',
+        '--outdir=outdir',
+        '--profile=true',
+        '--profile-trace=/does/not/exist/trace.json'
+    ]
+    compose_kiwi_description.main()
+    assert 'Cannot write profile trace' in caplog.text
@@ -1,33 +1,519 @@
 import datetime
 import logging
+import subprocess
 import sys
 from pytest import raises
-from unittest.mock import patch, Mock, mock_open
+from unittest.mock import patch, call, Mock, mock_open
 
 from kiwi_keg.tools import generate_recipes_changelog
 
 
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits')
-def test_generate_recipes_changelog_get_commits_from_range(mock_get_commits):
-    generate_recipes_changelog.get_commits_from_range('start', 'end', 'filespec', 'gitroot', 'rev')
-    mock_get_commits.assert_called_with(
+range_log = b'''\0002 commit2
+
+diff --git a/sub/file2 b/sub/file2
+--- a/sub/file2
++++ b/sub/file2
+@@ -1,3 +1,3 @@
+-line
++line
+\0001 commit1
+
+diff --git a/sub/file1 b/sub/file1
+--- a/sub/old name\t
++++ b/sub/file1
+@@ -1,2 +1,2 @@
+-line
++line
+diff --git a/sub/file2 b/sub/file2
+--- /dev/null
++++ b/sub/file2
+@@ -0,0 +1,3 @@
++line
+\0000 commit0
+
+diff --git a/sub/old name b/sub/old name
+--- a/sub/old name\t
++++ b/sub/old name\t
+@@ -1,2 +1,2 @@
+-line
++line
+'''
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_repo_prefix', return_value='sub/')
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_range_commits(mock_subprocess_run, mock_get_repo_prefix):
+    mock_subprocess_run.side_effect = [
+        Mock(returncode=0, stdout=range_log),
+        Mock(returncode=0, stdout=b'\0003 commit3\n')
+    ]
+    assert generate_recipes_changelog.get_range_commits(
+        [(1, 2, 'file1'), (5, 6, 'file1'), (1, 3, 'file2')], 'gitroot', 'rev'
+    ) == {
+        (1, 2, 'file1'): set([('1', 'commit1', 'gitroot'), ('0', 'commit0', 'gitroot')]),
+        (5, 6, 'file1'): set([('3', 'commit3', 'gitroot')]),
+        (1, 3, 'file2'): set([('2', 'commit2', 'gitroot'), ('1', 'commit1', 'gitroot')])
+    }
+    mock_get_repo_prefix.assert_called_once_with('gitroot')
+    assert [x[1]['args'] for x in mock_subprocess_run.call_args_list] == [
         [
-            'git',
-            '-C',
-            'gitroot',
-            'log',
-            '--no-merges',
-            '--format=%ct %H',
-            '--no-patch',
-            'rev',
-            '-Lstart,end:filespec'
+            'git', '-C', 'gitroot', '-c', 'core.quotePath=false', 'log', '--no-merges', '--format=%x00%ct %H',
+            '--no-color', '--src-prefix=a/', '--dst-prefix=b/', 'rev', '-L1,2:file1', '-L1,3:file2'
         ],
-        'gitroot'
+        [
+            'git', '-C', 'gitroot', '-c', 'core.quotePath=false', 'log', '--no-merges', '--format=%x00%ct %H',
+            '--no-color', '--src-prefix=a/', '--dst-prefix=b/', '--no-patch', 'rev', '-L5,6:file1'
+        ]
+    ]
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_repo_prefix', return_value='')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_range_batch')
+def test_generate_recipes_changelog_get_range_commits_same_file(
+        mock_get_commits_from_range_batch, mock_get_repo_prefix
+):
+    mock_get_commits_from_range_batch.side_effect = [
+        {(1, 2, 'file1'): set([('1', 'commit1', 'gitroot')]), (1, 3, 'file2'): set()},
+        {(5, 6, 'file1'): set([('2', 'commit2', 'gitroot')])}
+    ]
+    assert generate_recipes_changelog.get_range_commits(
+        [(1, 2, 'file1'), (5, 6, 'file1'), (1, 3, 'file2')], 'gitroot', 'rev'
+    ) == {
+        (1, 2, 'file1'): set([('1', 'commit1', 'gitroot')]),
+        (5, 6, 'file1'): set([('2', 'commit2', 'gitroot')]),
+        (1, 3, 'file2'): set()
+    }
+    assert mock_get_commits_from_range_batch.call_args_list == [
+        call([(1, 2, 'file1'), (1, 3, 'file2')], 'gitroot', 'rev', ''),
+        call([(5, 6, 'file1')], 'gitroot', 'rev', '')
+    ]
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.MAX_RANGES_PER_LOG', 2)
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_repo_prefix', return_value='')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_range_batch')
+def test_generate_recipes_changelog_get_range_commits_chunks(mock_get_commits_from_range_batch, mock_get_repo_prefix):
+    mock_get_commits_from_range_batch.return_value = {}
+    generate_recipes_changelog.get_range_commits([(1, 2, 'file1'), (5, 6, 'file2'), (1, 3, 'file3')], 'gitroot')
+    assert mock_get_commits_from_range_batch.call_args_list == [
+        call([(1, 2, 'file1'), (5, 6, 'file2')], 'gitroot', None, ''),
+        call([(1, 3, 'file3')], 'gitroot', None, '')
+    ]
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_range_commits_split(mock_subprocess_run):
+    def run(args, stdout, stderr):
+        if len([x for x in args if x.startswith('-L')]) > 1:
+            return Mock(returncode=1, stderr=b'assertion failed')
+        return Mock(returncode=0, stdout='\0001 {}\n'.format(args[-1]).encode())
+    mock_subprocess_run.side_effect = run
+    assert generate_recipes_changelog.get_range_commits(
+        [(1, 2, 'file1'), (5, 6, 'file2'), (1, 3, 'file3')], 'gitroot', 'rev'
+    ) == {
+        (1, 2, 'file1'): set([('1', '-L1,2:file1', 'gitroot')]),
+        (5, 6, 'file2'): set([('1', '-L5,6:file2', 'gitroot')]),
+        (1, 3, 'file3'): set([('1', '-L1,3:file3', 'gitroot')])
+    }
+    # rev-parse, the full batch, one half and its two parts, the other half
+    assert mock_subprocess_run.call_count == 6
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_repo_prefix', return_value='')
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_range_commits_unknown_file(mock_subprocess_run, mock_get_repo_prefix):
+    mock_subprocess_run.side_effect = [
+        Mock(returncode=0, stdout=range_log),
+        Mock(returncode=0, stdout=b'\0002 commit2\n'),
+        Mock(returncode=0, stdout=b'\0001 commit1\n')
+    ]
+    assert generate_recipes_changelog.get_range_commits([(1, 2, 'file1'), (1, 3, 'file2')], 'gitroot') == {
+        (1, 2, 'file1'): set([('2', 'commit2', 'gitroot')]),
+        (1, 3, 'file2'): set([('1', 'commit1', 'gitroot')])
+    }
+
+
+def test_generate_recipes_changelog_assign_range_commits_rename_conflict():
+    with raises(Exception) as e_info:
+        generate_recipes_changelog.assign_range_commits(
+            range_log.decode(), [(1, 2, 'file1'), (1, 3, 'file2'), (1, 1, 'old name')], 'gitroot', 'sub/'
+        )
+    assert str(e_info.value) == 'cannot assign diff of "sub/old name" to a range'
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_range_commits_exception(mock_subprocess_run):
+    mock_subprocess_run.side_effect = [
+        Mock(returncode=0, stdout=b'\n'),
+        Mock(returncode=1, stderr=b'no such path'),
+        Mock(returncode=1, stderr=b'no such path')
+    ]
+    with raises(Exception) as e_info:
+        generate_recipes_changelog.get_range_commits([(1, 2, 'file1'), (5, 6, 'file2')], 'gitroot', 'rev')
+    assert str(e_info.value) == 'git exited with error "b\'no such path\'"'
+
+
+def test_generate_recipes_changelog_get_range_commits_empty_rev():
+    assert generate_recipes_changelog.get_range_commits([(1, 2, 'file1')], 'gitroot', '') == {
+        (1, 2, 'file1'): set()
+    }
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_repo_prefix(mock_subprocess_run):
+    mock_subprocess_run.return_value = Mock(returncode=0, stdout=b'sub/\n')
+    assert generate_recipes_changelog.get_repo_prefix('gitroot') == 'sub/'
+    mock_subprocess_run.return_value = Mock(returncode=128, stderr=b'not a git repository')
+    with raises(Exception):
+        generate_recipes_changelog.get_repo_prefix('gitroot')
+
+
+def test_generate_recipes_changelog_attribution_cache(tmp_path):
+    cache_file = str(tmp_path / 'cache' / 'changelog.json')
+    cache = generate_recipes_changelog.AttributionCache(cache_file)
+    assert cache.get(['message', '%s', 'hash1']) is None
+    cache.set(['message', '%s', 'hash1'], 'subject1')
+    assert cache.get(['message', '%s', 'hash1']) == 'subject1'
+    cache.save()
+    other_cache = generate_recipes_changelog.AttributionCache(cache_file)
+    other_cache.set(['message', '%s', 'hash2'], 'subject2')
+    # entries written by other runs in the meantime are kept
+    cache.set(['message', '%s', 'hash3'], 'subject3')
+    cache.save()
+    other_cache.save()
+    other_cache.save()
+    cache = generate_recipes_changelog.AttributionCache(cache_file)
+    assert [cache.get(['message', '%s', x]) for x in ['hash1', 'hash2', 'hash3']] == [
+        'subject1', 'subject2', 'subject3'
+    ]
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.MAX_CACHE_ENTRIES', 2)
+def test_generate_recipes_changelog_attribution_cache_max_entries(tmp_path):
+    cache_file = str(tmp_path / 'changelog.json')
+    cache = generate_recipes_changelog.AttributionCache(cache_file)
+    for key in ['a', 'b', 'c']:
+        cache.set([key], key)
+    cache.save()
+    cache = generate_recipes_changelog.AttributionCache(cache_file)
+    assert [cache.get([x]) for x in ['a', 'b', 'c']] == [None, 'b', 'c']
+
+
+def test_generate_recipes_changelog_attribution_cache_unreadable(tmp_path, caplog):
+    cache_file = tmp_path / 'changelog.json'
+    cache_file.write_text('{"version": 0, "entries": {"[\\"a\\"]": "a"}}')
+    assert generate_recipes_changelog.AttributionCache(str(cache_file)).get(['a']) is None
+    cache_file.write_text('no json')
+    with caplog.at_level(logging.WARNING):
+        assert generate_recipes_changelog.AttributionCache(str(cache_file)).get(['a']) is None
+    assert 'Ignoring unreadable attribution cache' in caplog.text
+
+
+def test_generate_recipes_changelog_attribution_cache_write_error(tmp_path, caplog):
+    cache_file = tmp_path / 'file' / 'changelog.json'
+    (tmp_path / 'file').write_text('')
+    cache = generate_recipes_changelog.AttributionCache(str(cache_file))
+    cache.set(['a'], 'a')
+    with caplog.at_level(logging.WARNING):
+        cache.save()
+    assert 'Cannot write attribution cache' in caplog.text
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_revision_key', return_value=('sub/', ['head']))
+def test_generate_recipes_changelog_attribution_cache_get_revision(mock_get_revision_key, tmp_path):
+    cache = generate_recipes_changelog.AttributionCache(str(tmp_path / 'changelog.json'))
+    assert cache.get_revision('gitroot', 'rev') == ('sub/', ['head'])
+    assert cache.get_revision('gitroot', 'rev') == ('sub/', ['head'])
+    mock_get_revision_key.assert_called_once_with('gitroot', 'rev')
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_revision_key(mock_subprocess_run):
+    mock_subprocess_run.return_value = Mock(returncode=0, stdout=b'\nhead\n^start\n')
+    assert generate_recipes_changelog.get_revision_key('gitroot', 'start..') == ('', ['head', '^start'])
+    mock_subprocess_run.assert_called_once_with(
+        args=['git', '-C', 'gitroot', 'rev-parse', '--show-prefix', 'start..'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    mock_subprocess_run.return_value = Mock(returncode=0, stdout=b'sub/\nhead\n')
+    assert generate_recipes_changelog.get_revision_key('gitroot') == ('sub/', ['head'])
+    assert mock_subprocess_run.call_args[1]['args'][-1] == 'HEAD'
+    mock_subprocess_run.return_value = Mock(returncode=128, stderr=b'bad revision')
+    with raises(Exception):
+        generate_recipes_changelog.get_revision_key('gitroot', 'foo..')
+
+
+def test_generate_recipes_changelog_get_cached_commits(tmp_path):
+    lookup = Mock()
+    lookup.return_value = {
+        (1, 2, 'file1'): set([('1', 'commit1', 'gitroot')]),
+        (5, 6, 'file1'): set([('2', 'commit2', 'gitroot')])
+    }
+    ranges = [(1, 2, 'file1'), (5, 6, 'file1')]
+    assert generate_recipes_changelog.get_cached_commits(lookup, 'range', ranges, 'gitroot', 'rev') == set([
+        ('1', 'commit1', 'gitroot'), ('2', 'commit2', 'gitroot')
+    ])
+    cache = generate_recipes_changelog.AttributionCache(str(tmp_path / 'changelog.json'))
+    with patch.object(cache, 'get_revision', return_value=('sub/', ['head', '^start'])):
+        generate_recipes_changelog.get_cached_commits(lookup, 'range', ranges, 'gitroot', 'rev', cache)
+        lookup.return_value = {(1, 3, 'file2'): set()}
+        assert generate_recipes_changelog.get_cached_commits(
+            lookup, 'range', ranges + [(1, 3, 'file2')], 'other_clone', 'rev', cache
+        ) == set([('1', 'commit1', 'other_clone'), ('2', 'commit2', 'other_clone')])
+        lookup.assert_called_with([(1, 3, 'file2')], 'other_clone', 'rev')
+        assert cache.get(['range', ['head', '^start'], 'sub/file1', 5, 6]) == [['2', 'commit2']]
+        assert generate_recipes_changelog.get_cached_commits(lookup, 'range', ranges, 'gitroot', '', cache) == set()
+
+
+hunk_log = b'''\0003 hash_0 hash_a
+
+diff --git a/other b/other
+index 1234567..89abcde 100644
+--- a/other
++++ b/other
+@@ -3 +3 @@
+-old line
++new line
+\0002 hash_a hash_b
+
+diff --git a/file b/file
+index 1234567..89abcde 100644
+--- a/file
++++ b/file
+@@ -3 +3 @@ context
+-old line
++@@ -1 +1 @@ new line
+\0001 hash_b
+
+diff --git a/file b/file
+new file mode 100644
+index 0000000..1234567
+--- /dev/null
++++ b/file
+@@ -0,0 +1,10 @@
++line
+diff --git a/file2 b/file2
+new file mode 100644
+index 0000000..1234567
+--- /dev/null
++++ b/file2
+@@ -0,0 +1,10 @@
++line
+\0000 hash_c
+
+diff --git a/file b/file
+@@ -1 +1 @@
+-line
++line
+'''
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_hunk_commits(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = hunk_log
+    assert generate_recipes_changelog.get_hunk_commits(
+        [(3, 4, 'file'), (8, 8, 'file'), (1, 1, 'file2')], 'gitroot', 'rev'
+    ) == {
+        (3, 4, 'file'): set([('2', 'hash_a', 'gitroot'), ('1', 'hash_b', 'gitroot')]),
+        (8, 8, 'file'): set([('1', 'hash_b', 'gitroot')]),
+        (1, 1, 'file2'): set([('1', 'hash_b', 'gitroot')])
+    }
+    mock_subprocess_run.assert_called_once_with(
+        args=[
+            'git', '-C', 'gitroot', '-c', 'core.quotePath=false', 'log', '--format=%x00%ct %H %P', '--patch',
+            '--unified=0', '--relative', '--no-color', '--no-ext-diff', '--no-renames', '--no-indent-heuristic',
+            '--diff-algorithm=myers', 'rev', '--', 'file', 'file2'
+        ],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_hunk_commits_untouched(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = hunk_log
+    assert generate_recipes_changelog.get_hunk_commits([(5, 6, 'file')], 'gitroot') == {
+        (5, 6, 'file'): set([('1', 'hash_b', 'gitroot')])
+    }
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.MAX_FILES_PER_LOG', 1)
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_hunk_commits_chunks(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = hunk_log
+    assert generate_recipes_changelog.get_hunk_commits([(3, 4, 'file'), (1, 1, 'file2')], 'gitroot', 'rev') == {
+        (3, 4, 'file'): set([('2', 'hash_a', 'gitroot'), ('1', 'hash_b', 'gitroot')]),
+        (1, 1, 'file2'): set([('1', 'hash_b', 'gitroot')])
+    }
+    assert [x[1]['args'][-1] for x in mock_subprocess_run.call_args_list] == ['file', 'file2']
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_hunk_commits_merge(mock_subprocess_run, mock_get_range_commits):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = b'\0002 hash_a hash_b hash_c\n\0001 hash_b\n'
+    mock_get_range_commits.return_value = {(3, 4, 'file'): set([('2', 'hash_a', 'gitroot')])}
+    assert generate_recipes_changelog.get_hunk_commits(
+        [(3, 4, 'file'), (8, 8, 'file'), (1, 1, 'file2')], 'gitroot', 'rev'
+    ) == {(3, 4, 'file'): set([('2', 'hash_a', 'gitroot')])}
+    mock_get_range_commits.assert_called_once_with(
+        [(3, 4, 'file'), (8, 8, 'file'), (1, 1, 'file2')], 'gitroot', 'rev'
+    )
+
+
+hunk_log_created = b'''\0003 hash_a hash_b
+
+diff --git a/file b/file
+--- a/file
++++ b/file
+@@ -3 +3 @@
+-old line
++new line
+\0002 hash_b hash_c
+
+diff --git a/file b/file
+new file mode 100644
+--- /dev/null
++++ b/file
+@@ -0,0 +1,10 @@
++line
+diff --git a/other b/other
+new file mode 100644
+--- /dev/null
++++ b/other
+@@ -0,0 +1 @@
++--- /dev/null
+\0001 hash_c
+
+diff --git a/file b/file
+new file mode 100644
+--- /dev/null
++++ b/file
+@@ -0,0 +1,10 @@
++line
+'''
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_renamed_files', return_value=['file'])
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_hunk_commits_renamed(
+        mock_subprocess_run, mock_get_range_commits, mock_get_renamed_files
+):
+    mock_subprocess_run.return_value.returncode = 0
+    # file was created by renaming another file in hash_b, which is only
+    # visible to git log -L
+    mock_subprocess_run.return_value.stdout = hunk_log_created
+    mock_get_range_commits.return_value = {
+        (3, 4, 'file'): set([('3', 'hash_a', 'gitroot'), ('1', 'hash_d', 'gitroot')]),
+        (8, 8, 'file'): set([('1', 'hash_d', 'gitroot')])
+    }
+    assert generate_recipes_changelog.get_hunk_commits(
+        [(3, 4, 'file'), (8, 8, 'file'), (1, 1, 'file2')], 'gitroot', 'rev'
+    ) == {
+        (3, 4, 'file'): set([('3', 'hash_a', 'gitroot'), ('1', 'hash_d', 'gitroot')]),
+        (8, 8, 'file'): set([('1', 'hash_d', 'gitroot')]),
+        (1, 1, 'file2'): set()
+    }
+    mock_get_renamed_files.assert_called_once_with({'hash_b': ['file']}, 'gitroot')
+    mock_get_range_commits.assert_called_once_with([(3, 4, 'file'), (8, 8, 'file')], 'gitroot', 'rev')
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_renamed_files', return_value=[])
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_hunk_commits_added(
+        mock_subprocess_run, mock_get_range_commits, mock_get_renamed_files
+):
+    mock_subprocess_run.return_value.returncode = 0
+    # file was added in hash_b, the older history of the path is not
+    # part of the history of the ranges
+    mock_subprocess_run.return_value.stdout = hunk_log_created
+    assert generate_recipes_changelog.get_hunk_commits(
+        [(3, 4, 'file'), (8, 8, 'file')], 'gitroot', 'rev'
+    ) == {
+        (3, 4, 'file'): set([('3', 'hash_a', 'gitroot'), ('2', 'hash_b', 'gitroot')]),
+        (8, 8, 'file'): set([('2', 'hash_b', 'gitroot')])
+    }
+    mock_get_renamed_files.assert_called_once_with({'hash_b': ['file']}, 'gitroot')
+    assert not mock_get_range_commits.called
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_repo_prefix', return_value='sub/')
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_renamed_files(mock_subprocess_run, mock_get_repo_prefix):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = (
+        b'\0hash_b\n\nR087\tsub/old\tsub/file\nA\tsub/other\n'
+        b'\0hash_c\n\nR100\told\tfile2\nR100\tsub/x\tsub/file3\nM\tsub/file2\n'
+    )
+    assert generate_recipes_changelog.get_renamed_files(
+        {'hash_b': ['file', 'other'], 'hash_c': ['file2']}, 'gitroot'
+    ) == ['file']
+    mock_subprocess_run.assert_called_once_with(
+        args=[
+            'git', '-C', 'gitroot', '-c', 'core.quotePath=false', 'log', '--no-walk=unsorted', '--stdin',
+            '--format=%x00%H', '--name-status', '-M', '--no-color'
+        ],
+        input=b'hash_b\nhash_c', stdout=subprocess.PIPE, stderr=subprocess.PIPE
     )
 
 
-def test_generate_recipes_changelog_get_commits_from_range_empty_rev():
-    assert generate_recipes_changelog.get_commits_from_range('start', 'end', 'filespec', 'gitroot', '') == set()
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_repo_prefix', return_value='')
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_renamed_files_exception(mock_subprocess_run, mock_get_repo_prefix):
+    mock_subprocess_run.return_value.returncode = 1
+    with raises(Exception):
+        generate_recipes_changelog.get_renamed_files({'hash_b': ['file']}, 'gitroot')
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_hunk_commits_exception(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 1
+    with raises(Exception):
+        generate_recipes_changelog.get_hunk_commits([(3, 4, 'file')], 'gitroot', 'rev')
+
+
+def test_generate_recipes_changelog_get_hunk_commits_empty_rev():
+    assert generate_recipes_changelog.get_hunk_commits([(3, 4, 'file')], 'gitroot', '') == {(3, 4, 'file'): set()}
+
+
+def test_generate_recipes_changelog_get_hunk_ranges():
+    assert generate_recipes_changelog.get_hunk_ranges('3', '2', '5', None) == (2, 4, 4, 5)
+    assert generate_recipes_changelog.get_hunk_ranges('3', '0', '4', '2') == (3, 3, 3, 5)
+    assert generate_recipes_changelog.get_hunk_ranges('6', '2', '5', '0') == (5, 7, 5, 5)
+
+
+def test_generate_recipes_changelog_map_ranges_to_parent():
+    map_ranges_to_parent = generate_recipes_changelog.map_ranges_to_parent
+    # no change
+    assert map_ranges_to_parent([(0, 5)], []) == (False, [(0, 5)])
+    # lines added before the range
+    assert map_ranges_to_parent([(10, 15)], [(2, 2, 2, 5)]) == (False, [(7, 12)])
+    # lines changed in the range
+    assert map_ranges_to_parent([(0, 10)], [(4, 6, 4, 7)]) == (True, [(0, 9)])
+    # range added
+    assert map_ranges_to_parent([(0, 3)], [(0, 0, 0, 3)]) == (True, [])
+    # lines deleted after the range
+    assert map_ranges_to_parent([(2, 5)], [(5, 7, 5, 5)]) == (False, [(2, 5)])
+    # lines deleted in the range
+    assert map_ranges_to_parent([(2, 5)], [(3, 5, 3, 3)]) == (True, [(2, 7)])
+    # lines changed in the second range only
+    assert map_ranges_to_parent([(0, 2), (5, 8)], [(6, 7, 6, 7)]) == (True, [(0, 2), (5, 8)])
+    # hunk after the last range
+    assert map_ranges_to_parent([(2, 5)], [(5, 7, 5, 5), (20, 21, 20, 21)]) == (False, [(2, 5)])
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
+def test_generate_recipes_changelog_get_path_commits(mock_get_commits_from_path):
+    mock_get_commits_from_path.return_value = set([('1', 'commit1', 'gitroot')])
+    assert generate_recipes_changelog.get_path_commits([('file1',)], 'gitroot', 'rev') == {
+        ('file1',): set([('1', 'commit1', 'gitroot')])
+    }
+    mock_get_commits_from_path.assert_called_once_with('file1', 'gitroot', 'rev')
 
 
 @patch('kiwi_keg.tools.generate_recipes_changelog.get_commits')
@@ -54,57 +540,189 @@ def test_generate_recipes_changelog_get_commits_from_path_empty_rev():
 
 
 @patch('subprocess.run')
-def test_generate_recipes_changelog_get_deletion_commit_blame_exception(mock_subprocess_run):
+def test_generate_recipes_changelog_get_next_commit_exception(mock_subprocess_run):
     mock_subprocess_run.return_value.returncode = 1
-    mock_subprocess_run.return_value.stderr = b'blame fail\n'
+    mock_subprocess_run.return_value.stderr = b'log fail\n'
     with raises(Exception) as e_info:
-        generate_recipes_changelog.get_deletion_commit('line_no', 'filespec', 'gitroot', 'rev')
-        assert str(e_info.value) == 'git exited with error "blame fail"'
+        generate_recipes_changelog.get_next_commit('last_commit', 'line_no', 'filespec', 'gitroot')
+    assert str(e_info.value) == 'git exited with error "b\'log fail\\n\'"'
 
 
 @patch('subprocess.run')
-def test_generate_recipes_changelog_get_deletion_commit_log_exception(mock_subprocess_run):
-    mock_sp_blame = Mock()
-    mock_sp_log = Mock()
-    mock_sp_blame.returncode = 0
-    mock_sp_blame.stdout = b'last_commit\n'
-    mock_sp_log.returncode = 1
-    mock_sp_log.stderr = b'log fail\n'
-    mock_subprocess_run.side_effect = [mock_sp_blame, mock_sp_log]
-    with raises(Exception) as e_info:
-        generate_recipes_changelog.get_deletion_commit('line_no', 'filespec', 'gitroot', 'rev')
-        assert str(e_info.value) == 'git exited with error "log fail"'
+def test_generate_recipes_changelog_get_next_commit_no_commits(mock_subprocess_run, caplog):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = b''
+    with caplog.at_level(logging.DEBUG):
+        generate_recipes_changelog.log.setLevel(logging.DEBUG)
+        assert generate_recipes_changelog.get_next_commit('last_commit', 'line_no', 'filespec', 'gitroot') is None
+    assert 'Source log indicates filespec:line_no was deleted but cannot find commit' in caplog.text
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_next_commit(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = b'later_commit_time later_commit_hash\ndeletion_commit_time deletion_commit_hash\n'
+    assert generate_recipes_changelog.get_next_commit(
+        'last_commit', 'line_no', 'filespec', 'gitroot'
+    ) == ('deletion_commit_time', 'deletion_commit_hash', 'gitroot')
+    mock_subprocess_run.assert_called_once_with(
+        args=['git', '-C', 'gitroot', 'log', '--format=%ct %H', 'last_commit..', '--', 'filespec'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+
+blame_output = '''{hash_a} 2 3 1
+author a
+summary 1
+filename file
+\told line
+{hash_b} 3 4 1
+author b
+summary 2
+previous {hash_a} file
+filename file
+\t{hash_b} 3 5 1
+{hash_b} 6 7
+\told line
+'''.format(hash_a='a' * 40, hash_b='b' * 40).encode('utf-8')
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_last_commits_with_lines(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = blame_output
+    assert generate_recipes_changelog.get_last_commits_with_lines([7, 3, 4, 3], 'file', 'gitroot', 'rev') == {
+        3: 'a' * 40,
+        4: 'b' * 40,
+        7: 'b' * 40
+    }
+    mock_subprocess_run.assert_called_once_with(
+        args=[
+            'git', '-C', 'gitroot', 'blame', '--no-merges', '--reverse', '--porcelain', 'rev',
+            '-L3,4', '-L7,7', '--', 'file'
+        ],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_last_commits_with_lines_exception(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 1
+    with raises(Exception):
+        generate_recipes_changelog.get_last_commits_with_lines([3], 'file', 'gitroot', 'rev')
+
+
+history_log = b'''\000>3 hash_c hash_b
+
+file2
+\000>2 hash_b hash_a
+
+file1
+file2
+\000-1 hash_a hash_0
+
+file1
+'''
 
 
 @patch('subprocess.run')
-def test_generate_recipes_changelog_get_deletion_commit_no_commits(mock_subprocess_run, caplog):
-    mock_sp_blame = Mock()
+def test_generate_recipes_changelog_get_commit_history(mock_subprocess_run):
+    mock_sp_rev_parse = Mock()
+    mock_sp_rev_parse.returncode = 0
+    mock_sp_rev_parse.stdout = b'hash_head\n^hash_a\n'
     mock_sp_log = Mock()
-    mock_sp_blame.returncode = 0
-    mock_sp_blame.stdout = b'last_commit\n'
     mock_sp_log.returncode = 0
-    mock_sp_log.stdout = b''
-    mock_subprocess_run.side_effect = [mock_sp_blame, mock_sp_log]
-    with caplog.at_level(logging.DEBUG):
-        generate_recipes_changelog.log.setLevel(logging.DEBUG)
-        generate_recipes_changelog.get_deletion_commit('line_no', 'filespec', 'gitroot', 'rev')
-    assert 'Source log indicates filespec:line_no was deleted but cannot find commit' in caplog.text
+    mock_sp_log.stdout = history_log
+    mock_subprocess_run.side_effect = [mock_sp_rev_parse, mock_sp_log]
+    assert generate_recipes_changelog.get_commit_history('gitroot', 'hash_a..') == [
+        ('3', 'hash_c', set(['file2'])),
+        ('2', 'hash_b', set(['file1', 'file2'])),
+        ('1', 'hash_a', set())
+    ]
+    mock_subprocess_run.assert_called_with(
+        args=[
+            'git', '-C', 'gitroot', '-c', 'core.quotePath=false', 'log', '--format=%x00%m%ct %H %P', '--name-only',
+            '--relative', '--no-renames', '--boundary', 'HEAD', '^hash_a'
+        ],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_commit_history_merges(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = b'\000>3 hash_c hash_b hash_x\n\0'
+    assert generate_recipes_changelog.get_commit_history('gitroot', 'hash_a..') is None
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_commit_history_rev_parse_exception(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 1
+    with raises(Exception):
+        generate_recipes_changelog.get_commit_history('gitroot', 'rev')
 
 
 @patch('subprocess.run')
-def test_generate_recipes_changelog_get_deletion_commit(mock_subprocess_run):
-    mock_sp_blame = Mock()
+def test_generate_recipes_changelog_get_commit_history_log_exception(mock_subprocess_run):
+    mock_sp_rev_parse = Mock()
+    mock_sp_rev_parse.returncode = 0
+    mock_sp_rev_parse.stdout = b'hash_head\n^hash_a\n'
     mock_sp_log = Mock()
-    mock_sp_blame.returncode = 0
-    mock_sp_blame.stdout = b'last_commit\n'
-    mock_sp_log.returncode = 0
-    mock_sp_log.stdout = b'deletion_commit_time deletion_commit_hash'
-    mock_subprocess_run.side_effect = [mock_sp_blame, mock_sp_log]
-    assert generate_recipes_changelog.get_deletion_commit(
-        'line_no',
-        'filespec',
-        'gitroot',
-        'rev') == ('deletion_commit_time', 'deletion_commit_hash', 'gitroot')
+    mock_sp_log.returncode = 1
+    mock_subprocess_run.side_effect = [mock_sp_rev_parse, mock_sp_log]
+    with raises(Exception):
+        generate_recipes_changelog.get_commit_history('gitroot', 'rev')
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_next_commit')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_history')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_last_commits_with_lines')
+def test_generate_recipes_changelog_get_deletion_commits(
+        mock_get_last_commits_with_lines,
+        mock_get_commit_history,
+        mock_get_next_commit,
+        caplog
+):
+    mock_get_last_commits_with_lines.side_effect = [
+        {3: 'hash_a', 4: 'hash_a', 8: 'hash_b'},
+        {1: 'hash_b', 2: 'hash_c', 5: 'hash_x'}
+    ]
+    mock_get_commit_history.return_value = [
+        ('3', 'hash_c', set(['file2'])),
+        ('2', 'hash_b', set(['file1', 'file2'])),
+        ('1', 'hash_a', set())
+    ]
+    mock_get_next_commit.return_value = ('4', 'hash_x_next', 'gitroot')
+    with caplog.at_level(logging.DEBUG):
+        generate_recipes_changelog.log.setLevel(logging.DEBUG)
+        assert generate_recipes_changelog.get_deletion_commits(
+            {'file1': [3, 4, 8], 'file2': [1, 2, 5]}, 'gitroot', 'rev'
+        ) == set([
+            ('2', 'hash_b', 'gitroot'),
+            ('3', 'hash_c', 'gitroot'),
+            ('4', 'hash_x_next', 'gitroot')
+        ])
+    assert 'Source log indicates file1:8 was deleted but cannot find commit' in caplog.text
+    assert 'Source log indicates file2:2 was deleted but cannot find commit' in caplog.text
+    mock_get_commit_history.assert_called_once_with('gitroot', 'rev')
+    mock_get_next_commit.assert_called_once_with('hash_x', 5, 'file2', 'gitroot')
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_next_commit')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_history')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_last_commits_with_lines')
+def test_generate_recipes_changelog_get_deletion_commits_no_linear_history(
+        mock_get_last_commits_with_lines,
+        mock_get_commit_history,
+        mock_get_next_commit
+):
+    mock_get_last_commits_with_lines.return_value = {3: 'hash_a', 4: 'hash_a', 8: 'hash_b'}
+    mock_get_commit_history.return_value = None
+    mock_get_next_commit.side_effect = [('2', 'hash_b', 'gitroot'), None]
+    assert generate_recipes_changelog.get_deletion_commits({'file1': [3, 4, 8]}, 'gitroot', 'rev') == set([
+        ('2', 'hash_b', 'gitroot')
+    ])
+    assert mock_get_next_commit.call_count == 2
 
 
 @patch('subprocess.run')
@@ -123,17 +741,59 @@ def test_generate_recipes_changelog_get_commits(mock_subprocess_run):
 
 
 @patch('subprocess.run')
-def test_generate_recipes_changelog_get_commit_message_exception(mock_subprocess_run):
-    mock_subprocess_run.return_value.returncode = 1
-    with raises(Exception):
-        generate_recipes_changelog.get_commit_message('gitargs', 'gitroot', 'msgformat')
+def test_generate_recipes_changelog_get_commit_messages(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = b'hash1\nsubject1\n\0hash2\nsubject2\n\nbody2\n\0'
+    assert generate_recipes_changelog.get_commit_messages(
+        [('1', 'hash1', 'gitroot'), ('2', 'hash2', 'gitroot')], 'msgformat'
+    ) == {('hash1', 'gitroot'): 'subject1', ('hash2', 'gitroot'): 'subject2\n\nbody2'}
+    mock_subprocess_run.assert_called_once_with(
+        args=['git', '-C', 'gitroot', 'log', '--no-walk=unsorted', '--stdin', '-z', '--format=%H%nmsgformat'],
+        input=b'hash1\nhash2', stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_commit_messages_cached(mock_subprocess_run, tmp_path):
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = b'hash2\nsubject2\n\0'
+    cache = generate_recipes_changelog.AttributionCache(str(tmp_path / 'changelog.json'))
+    cache.set(['message', 'msgformat', 'hash1'], 'subject1')
+    assert generate_recipes_changelog.get_commit_messages(
+        [('1', 'hash1', 'gitroot'), ('2', 'hash2', 'gitroot')], 'msgformat', cache
+    ) == {('hash1', 'gitroot'): 'subject1', ('hash2', 'gitroot'): 'subject2'}
+    assert mock_subprocess_run.call_args[1]['input'] == b'hash2'
+    assert cache.get(['message', 'msgformat', 'hash2']) == 'subject2'
 
 
 @patch('subprocess.run')
-def test_generate_recipes_changelog_get_commit_message(mock_subprocess_run):
+def test_generate_recipes_changelog_get_commit_messages_not_cacheable(mock_subprocess_run, tmp_path):
     mock_subprocess_run.return_value.returncode = 0
-    mock_subprocess_run.return_value.stdout = b'commit message\n'
-    assert generate_recipes_changelog.get_commit_message('gitargs', 'gitroot', 'msgformat') == 'commit message'
+    mock_subprocess_run.return_value.stdout = b'hash1\nsubject1 (HEAD -> main)\n\0'
+    cache = generate_recipes_changelog.AttributionCache(str(tmp_path / 'changelog.json'))
+    cache.set(['message', '%s%d', 'hash1'], 'subject1 (tag: old)')
+    assert generate_recipes_changelog.get_commit_messages([('1', 'hash1', 'gitroot')], '%s%d', cache) == {
+        ('hash1', 'gitroot'): 'subject1 (HEAD -> main)'
+    }
+    assert cache.get(['message', '%s%d', 'hash1']) == 'subject1 (tag: old)'
+
+
+def test_generate_recipes_changelog_is_cacheable_format():
+    is_cacheable_format = generate_recipes_changelog.is_cacheable_format
+    assert is_cacheable_format('- %s')
+    assert is_cacheable_format('%s%n%n%b %an <%ae> %ct %%d')
+    assert is_cacheable_format('%s%x01%b')
+    assert not is_cacheable_format('%s%d')
+    assert not is_cacheable_format('%s (%cr)')
+    assert not is_cacheable_format('%N')
+    assert not is_cacheable_format('%ad')
+
+
+@patch('subprocess.run')
+def test_generate_recipes_changelog_get_commit_messages_exception(mock_subprocess_run):
+    mock_subprocess_run.return_value.returncode = 1
+    with raises(Exception):
+        generate_recipes_changelog.get_commit_messages([('1', 'hash1', 'gitroot')], 'msgformat')
 
 
 @patch('kiwi_keg.tools.generate_recipes_changelog.get_commits', return_value=set())
@@ -170,28 +830,34 @@ deleted:3:/root/range_file'''
 
 
 @patch('json.dump')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commit')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commits')
 @patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_range')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_message')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_messages')
 @patch('kiwi_keg.tools.generate_recipes_changelog.git_log_empty', return_value=False)
 def test_generate_recipes_changelog_main_json(
         mock_git_log_empty,
-        mock_get_commit_message,
-        mock_get_commits_from_range,
+        mock_get_commit_messages,
+        mock_get_range_commits,
         mock_get_commits_from_path,
-        mock_get_deletion_commit,
+        mock_get_deletion_commits,
         mock_json_dump
 ):
     mock_get_commits_from_path.return_value = set([('1', 'commit1', '/root')])
-    mock_get_commits_from_range.return_value = set([('2', 'commit2', '/root')])
-    mock_get_deletion_commit.return_value = ('3', 'commit3', '/root')
-    mock_get_commit_message.side_effect = ['sub1', 'msg1', 'sub2', 'msg2', 'sub3', 'msg3']
-    sys.argv = ['generate_recipes_changelog', '-f', 'json', '-r', '/root:rev', 'logfile']
+    mock_get_range_commits.return_value = {(1, 2, 'range_file'): set([('2', 'commit2', '/root')])}
+    mock_get_deletion_commits.return_value = set([('3', 'commit3', '/root')])
+    mock_get_commit_messages.return_value = {
+        ('commit3', '/root'): 'sub1\x01msg1', ('commit2', '/root'): 'sub2\x01msg2', ('commit1', '/root'): 'sub3\x01msg3'
+    }
+    sys.argv = ['generate_recipes_changelog', '-f', 'json', '-r', '/root:rev', '--no-cache', 'logfile']
     mock_file = mock_open(read_data=source_info)
     with patch('builtins.open', mock_file):
         generate_recipes_changelog.main()
-    mock_get_deletion_commit.assert_called_with('3', 'range_file', '/root', 'rev')
+    mock_get_range_commits.assert_called_once_with([(1, 2, 'range_file')], '/root', 'rev')
+    mock_get_deletion_commits.assert_called_once_with({'range_file': [3]}, '/root', 'rev')
+    mock_get_commit_messages.assert_called_once_with(
+        set([('1', 'commit1', '/root'), ('2', 'commit2', '/root'), ('3', 'commit3', '/root')]), '%s%x01%b', None
+    )
     mock_json_dump.assert_called_with([
         {'change': 'sub1', 'date': '1970-01-01T00:00:03', 'details': 'msg1'},
         {'change': 'sub2', 'date': '1970-01-01T00:00:02', 'details': 'msg2'},
@@ -200,28 +866,30 @@ def test_generate_recipes_changelog_main_json(
 
 
 @patch('json.dump')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commit')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commits')
 @patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_range')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_message')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_messages')
 @patch('kiwi_keg.tools.generate_recipes_changelog.git_log_empty', return_value=False)
 def test_generate_recipes_changelog_main_json_root_tag_file_out(
         mock_git_log_empty,
-        mock_get_commit_message,
-        mock_get_commits_from_range,
+        mock_get_commit_messages,
+        mock_get_range_commits,
         mock_get_commits_from_path,
-        mock_get_deletion_commit,
+        mock_get_deletion_commits,
         mock_json_dump
 ):
     mock_get_commits_from_path.return_value = set([('1', 'commit1', '/root')])
-    mock_get_commits_from_range.return_value = set([('2', 'commit2', '/root')])
-    mock_get_deletion_commit.return_value = ('3', 'commit3', '/root')
-    mock_get_commit_message.side_effect = ['sub1', 'msg1', 'sub2', 'msg2', 'sub3', 'msg3']
-    sys.argv = ['generate_recipes_changelog', '-f', 'json', '-r', '/root:rev', '-t', 'root_tag', '-o', 'outfile', 'logfile']
+    mock_get_range_commits.return_value = {(1, 2, 'range_file'): set([('2', 'commit2', '/root')])}
+    mock_get_deletion_commits.return_value = set([('3', 'commit3', '/root')])
+    mock_get_commit_messages.return_value = {
+        ('commit3', '/root'): 'sub1\x01msg1', ('commit2', '/root'): 'sub2\x01msg2', ('commit1', '/root'): 'sub3\x01msg3'
+    }
+    sys.argv = ['generate_recipes_changelog', '-f', 'json', '-r', '/root:rev', '-t', 'root_tag', '-o', 'outfile', '--no-cache', 'logfile']
     mock_file = mock_open(read_data=source_info)
     with patch('builtins.open', mock_file):
         generate_recipes_changelog.main()
-    mock_get_deletion_commit.assert_called_with('3', 'range_file', '/root', 'rev')
+    mock_get_deletion_commits.assert_called_once_with({'range_file': [3]}, '/root', 'rev')
     mock_json_dump.assert_called_with({
         'root_tag': [
             {'change': 'sub1', 'date': '1970-01-01T00:00:03', 'details': 'msg1'},
@@ -232,28 +900,30 @@ def test_generate_recipes_changelog_main_json_root_tag_file_out(
 
 
 @patch('yaml.safe_dump')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commit')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commits')
 @patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_range')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_message')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_messages')
 @patch('kiwi_keg.tools.generate_recipes_changelog.git_log_empty', return_value=False)
 def test_generate_recipes_changelog_main_yaml(
         mock_git_log_empty,
-        mock_get_commit_message,
-        mock_get_commits_from_range,
+        mock_get_commit_messages,
+        mock_get_range_commits,
         mock_get_commits_from_path,
-        mock_get_deletion_commit,
+        mock_get_deletion_commits,
         mock_yaml_safe_dump
 ):
     mock_get_commits_from_path.return_value = set([('1', 'commit1', '/root')])
-    mock_get_commits_from_range.return_value = set([('2', 'commit2', '/root')])
-    mock_get_deletion_commit.return_value = ('3', 'commit3', '/root')
-    mock_get_commit_message.side_effect = ['sub1', 'msg1', 'sub2', 'msg2', 'sub3', '']
-    sys.argv = ['generate_recipes_changelog', '-f', 'yaml', '-r', '/root:rev', 'logfile']
+    mock_get_range_commits.return_value = {(1, 2, 'range_file'): set([('2', 'commit2', '/root')])}
+    mock_get_deletion_commits.return_value = set([('3', 'commit3', '/root')])
+    mock_get_commit_messages.return_value = {
+        ('commit3', '/root'): 'sub1\x01msg1', ('commit2', '/root'): 'sub2\x01msg2', ('commit1', '/root'): 'sub3\x01'
+    }
+    sys.argv = ['generate_recipes_changelog', '-f', 'yaml', '-r', '/root:rev', '--no-cache', 'logfile']
     mock_file = mock_open(read_data=source_info)
     with patch('builtins.open', mock_file):
         generate_recipes_changelog.main()
-    mock_get_deletion_commit.assert_called_with('3', 'range_file', '/root', 'rev')
+    mock_get_deletion_commits.assert_called_once_with({'range_file': [3]}, '/root', 'rev')
     mock_yaml_safe_dump.assert_called_with([
         {'change': 'sub1', 'date': '1970-01-01T00:00:03', 'details': 'msg1'},
         {'change': 'sub2', 'date': '1970-01-01T00:00:02', 'details': 'msg2'},
@@ -262,28 +932,30 @@ def test_generate_recipes_changelog_main_yaml(
 
 
 @patch('yaml.safe_dump')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commit')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commits')
 @patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_range')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_message')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_messages')
 @patch('kiwi_keg.tools.generate_recipes_changelog.git_log_empty', return_value=False)
 def test_generate_recipes_changelog_main_yaml_root_tag(
         mock_git_log_empty,
-        mock_get_commit_message,
-        mock_get_commits_from_range,
+        mock_get_commit_messages,
+        mock_get_range_commits,
         mock_get_commits_from_path,
-        mock_get_deletion_commit,
+        mock_get_deletion_commits,
         mock_yaml_safe_dump
 ):
     mock_get_commits_from_path.return_value = set([('1', 'commit1', '/root')])
-    mock_get_commits_from_range.return_value = set([('2', 'commit2', '/root')])
-    mock_get_deletion_commit.return_value = ('3', 'commit3', '/root')
-    mock_get_commit_message.side_effect = ['sub1', 'msg1', 'sub2', 'msg2', 'sub3', '']
-    sys.argv = ['generate_recipes_changelog', '-f', 'yaml', '-r', '/root:rev', '-t', 'root_tag', 'logfile']
+    mock_get_range_commits.return_value = {(1, 2, 'range_file'): set([('2', 'commit2', '/root')])}
+    mock_get_deletion_commits.return_value = set([('3', 'commit3', '/root')])
+    mock_get_commit_messages.return_value = {
+        ('commit3', '/root'): 'sub1\x01msg1', ('commit2', '/root'): 'sub2\x01msg2', ('commit1', '/root'): 'sub3\x01'
+    }
+    sys.argv = ['generate_recipes_changelog', '-f', 'yaml', '-r', '/root:rev', '-t', 'root_tag', '--no-cache', 'logfile']
     mock_file = mock_open(read_data=source_info)
     with patch('builtins.open', mock_file):
         generate_recipes_changelog.main()
-    mock_get_deletion_commit.assert_called_with('3', 'range_file', '/root', 'rev')
+    mock_get_deletion_commits.assert_called_once_with({'range_file': [3]}, '/root', 'rev')
     mock_yaml_safe_dump.assert_called_with({
         'root_tag': [
             {'change': 'sub1', 'date': '1970-01-01T00:00:03', 'details': 'msg1'},
@@ -301,24 +973,24 @@ def test_generate_recipes_changelog_main_malformed_rev_spec():
     assert str(e_info.value) == 'Malformed revision specification "invalid_rev_spec"'
 
 
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commit')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commits')
 @patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_range')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_message')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_messages')
 @patch('kiwi_keg.tools.generate_recipes_changelog.git_log_empty', return_value=True)
 def test_generate_recipes_changelog_main_text(
         mock_git_log_empty,
-        mock_get_commit_message,
-        mock_get_commits_from_range,
+        mock_get_commit_messages,
+        mock_get_range_commits,
         mock_get_commits_from_path,
-        mock_get_deletion_commit,
+        mock_get_deletion_commits,
         capsys
 ):
     mock_get_commits_from_path.return_value = set([('1', 'commit1', '/root')])
-    mock_get_commits_from_range.return_value = set([('2', 'commit2', '/root')])
-    mock_get_deletion_commit.return_value = ('3', 'commit3', '/root')
-    mock_get_commit_message.side_effect = ['sub1', 'sub2']
-    sys.argv = ['generate_recipes_changelog', '-f', 'text', '-r', '/root:rev', 'logfile']
+    mock_get_range_commits.return_value = {(1, 2, 'range_file'): set([('2', 'commit2', '/root')])}
+    mock_get_deletion_commits.return_value = set([('3', 'commit3', '/root')])
+    mock_get_commit_messages.return_value = {('commit2', '/root'): 'sub1', ('commit1', '/root'): 'sub2'}
+    sys.argv = ['generate_recipes_changelog', '-f', 'text', '-r', '/root:rev', '--no-cache', 'logfile']
     mock_file = mock_open(read_data=source_info)
     with patch('builtins.open', mock_file):
         generate_recipes_changelog.main()
@@ -335,24 +1007,26 @@ Fri Dec 12 12:12:00 2025  - author
 '''
 
 
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commit')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commits')
 @patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_range')
-@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_message')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_messages')
 @patch('kiwi_keg.tools.generate_recipes_changelog.git_log_empty', return_value=True)
 def test_generate_recipes_changelog_main_osc(
         mock_git_log_empty,
-        mock_get_commit_message,
-        mock_get_commits_from_range,
+        mock_get_commit_messages,
+        mock_get_range_commits,
         mock_get_commits_from_path,
-        mock_get_deletion_commit,
+        mock_get_deletion_commits,
         capsys
 ):
     mock_get_commits_from_path.return_value = set([('1', 'commit1', '/root')])
-    mock_get_commits_from_range.return_value = set([('2', 'commit2', '/root')])
-    mock_get_deletion_commit.return_value = ('3', 'commit3', '/root')
-    mock_get_commit_message.side_effect = ['sub1', 'msg1', 'sub2', 'msg2']
-    sys.argv = ['generate_recipes_changelog', '-f', 'osc', '-r', '/root:rev', '-t', 'tag', '-a', 'author', 'logfile']
+    mock_get_range_commits.return_value = {(1, 2, 'range_file'): set([('2', 'commit2', '/root')])}
+    mock_get_deletion_commits.return_value = set([('3', 'commit3', '/root')])
+    mock_get_commit_messages.return_value = {
+        ('commit2', '/root'): 'sub1\x01msg1', ('commit1', '/root'): 'sub2\x01msg2'
+    }
+    sys.argv = ['generate_recipes_changelog', '-f', 'osc', '-r', '/root:rev', '-t', 'tag', '-a', 'author', '--no-cache', 'logfile']
     mock_file = mock_open(read_data=source_info)
     with patch('builtins.open', mock_file), patch('kiwi_keg.tools.generate_recipes_changelog.datetime') as p_dt:
         p_dt.now.return_value = datetime.datetime(2025, 12, 12, 12, 12)
@@ -368,6 +1042,124 @@ def test_generate_recipes_changelog_no_commits(mock_git_log_empty):
     assert e_info.value.code == 2
 
 
+def test_generate_recipes_changelog_main_invalid_jobs():
+    sys.argv = ['generate_recipes_changelog', '-j', '0', 'logfile']
+    with raises(SystemExit) as e_info:
+        generate_recipes_changelog.main()
+    assert str(e_info.value) == 'Invalid number of jobs "0".'
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_messages')
+@patch('kiwi_keg.tools.generate_recipes_changelog.git_log_empty', return_value=False)
+def test_generate_recipes_changelog_main_jobs(
+        mock_git_log_empty,
+        mock_get_commit_messages,
+        mock_get_range_commits,
+        mock_get_commits_from_path,
+        mock_get_deletion_commits,
+        capsys
+):
+    mock_get_commits_from_path.return_value = set([('1', 'commit1', '/root')])
+    mock_get_range_commits.return_value = {(1, 2, 'range_file'): set([('2', 'commit2', '/root')])}
+    mock_get_deletion_commits.return_value = set([('3', 'commit3', '/root')])
+    mock_get_commit_messages.return_value = {
+        ('commit3', '/root'): 'sub1', ('commit2', '/root'): 'sub2', ('commit1', '/root'): 'sub3'
+    }
+    sys.argv = ['generate_recipes_changelog', '-f', 'text', '-r', '/root:rev', '-j', '4', '--no-cache', 'logfile']
+    mock_file = mock_open(read_data=source_info)
+    with patch('builtins.open', mock_file):
+        generate_recipes_changelog.main()
+    assert capsys.readouterr().out == 'sub1\nsub2\nsub3\n'
+
+
+def test_generate_recipes_changelog_main_unsupported_detection_method():
+    sys.argv = ['generate_recipes_changelog', '-d', 'foo', 'logfile']
+    with raises(SystemExit) as e_info:
+        generate_recipes_changelog.main()
+    assert str(e_info.value) == 'Unsupported detection method "foo".'
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_hunk_commits')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commit_messages')
+@patch('kiwi_keg.tools.generate_recipes_changelog.git_log_empty', return_value=False)
+def test_generate_recipes_changelog_main_diff(
+        mock_git_log_empty,
+        mock_get_commit_messages,
+        mock_get_hunk_commits,
+        mock_get_commits_from_path,
+        mock_get_deletion_commits,
+        capsys
+):
+    mock_get_commits_from_path.return_value = set([('1', 'commit1', '/root')])
+    mock_get_hunk_commits.return_value = {(1, 2, 'range_file'): set([('2', 'commit2', '/root')])}
+    mock_get_deletion_commits.return_value = set()
+    mock_get_commit_messages.return_value = {('commit2', '/root'): 'sub1', ('commit1', '/root'): 'sub2'}
+    sys.argv = ['generate_recipes_changelog', '-f', 'text', '-r', '/root:rev', '-d', 'diff', '--no-cache', 'logfile']
+    mock_file = mock_open(read_data=source_info)
+    with patch('builtins.open', mock_file):
+        generate_recipes_changelog.main()
+    mock_get_hunk_commits.assert_called_once_with([(1, 2, 'range_file')], '/root', 'rev')
+    assert capsys.readouterr().out == 'sub1\nsub2\n'
+
+
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_revision_key', return_value=('', ['head', '^start']))
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_deletion_commits', return_value=set())
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_commits_from_path')
+@patch('kiwi_keg.tools.generate_recipes_changelog.get_range_commits')
+@patch('subprocess.run')
+@patch('kiwi_keg.tools.generate_recipes_changelog.git_log_empty', return_value=False)
+def test_generate_recipes_changelog_main_cache(
+        mock_git_log_empty,
+        mock_subprocess_run,
+        mock_get_range_commits,
+        mock_get_commits_from_path,
+        mock_get_deletion_commits,
+        mock_get_revision_key,
+        tmp_path,
+        capsys
+):
+    mock_get_commits_from_path.return_value = set([('1', 'commit1', '/root')])
+    mock_get_range_commits.return_value = {(1, 2, 'range_file'): set([('2', 'commit2', '/root')])}
+    mock_subprocess_run.return_value.returncode = 0
+    mock_subprocess_run.return_value.stdout = b'commit2\n- sub1\0commit1\n- sub2\0'
+    log_file = tmp_path / 'logfile'
+    log_file.write_text(source_info)
+    sys.argv = [
+        'generate_recipes_changelog', '-f', 'text', '-r', '/root:start..',
+        '--cache-dir', str(tmp_path / 'cache'), str(log_file)
+    ]
+    generate_recipes_changelog.main()
+    generate_recipes_changelog.main()
+    assert capsys.readouterr().out == '- sub1\n- sub2\n' * 2
+    assert mock_get_range_commits.call_count == 1
+    assert mock_get_commits_from_path.call_count == 1
+    assert mock_subprocess_run.call_count == 1
+    assert mock_get_revision_key.call_count == 2
+    # commits found by git log -L are not used for the diff method
+    with patch('kiwi_keg.tools.generate_recipes_changelog.get_hunk_commits') as mock_get_hunk_commits:
+        mock_get_hunk_commits.return_value = {(1, 2, 'range_file'): set()}
+        sys.argv[-1:-1] = ['-d', 'diff']
+        generate_recipes_changelog.main()
+        mock_get_hunk_commits.assert_called_once_with([(1, 2, 'range_file')], '/root', 'start..')
+    assert capsys.readouterr().out == '- sub2\n'
+
+
+def test_generate_recipes_changelog_run_queries():
+    queries = [
+        (lambda x: set([('1', x, '/root')]), ('commit1',)),
+        (lambda x: set([('2', x, '/root')]), ('commit2',)),
+        (lambda x: set(), ('commit3',))
+    ]
+    expected_result = set([('1', 'commit1', '/root'), ('2', 'commit2', '/root')])
+    assert generate_recipes_changelog.run_queries(queries, 1) == expected_result
+    assert generate_recipes_changelog.run_queries(queries, 3) == expected_result
+
+
 def test_generate_recipes_changelog_repr_mstr():
     dumper = Mock()
     generate_recipes_changelog.repr_mstr(dumper, 'data')
@@ -380,3 +1172,18 @@ def test_rangefile_get_ranges_multiple_unconnected_ranges():
     rf.add_range(3, 4)
     rf.add_range(7, 8)
     assert rf.get_ranges() == [(2, 4), (7, 8)]
+
+
+def test_rangefile_get_ranges_merged_ranges():
+    rf = generate_recipes_changelog.RangeFile()
+    rf.add_range(10, 12)
+    rf.add_range(2, 3)
+    rf.add_range(5, 5)
+    rf.add_range(20, 19)
+    assert rf.get_ranges() == [(2, 3), (5, 5), (10, 12)]
+    rf.add_range(4, 4)
+    assert rf.get_ranges() == [(2, 5), (10, 12)]
+    rf.add_range(11, 11)
+    assert rf.get_ranges() == [(2, 5), (10, 12)]
+    rf.add_range(1, 13)
+    assert rf.get_ranges() == [(1, 13)]
@@ -18,12 +18,31 @@ def test_lib_source_sources_file():
     assert src_file.ranges[0].src_file == 'src_file'
     assert src_file.ranges[0].range_start == 1
     assert src_file.ranges[0].range_end == 2
+    assert src_file.ranges[0].line_covered(2, 'src_file', 'rootdir') is True
+    assert src_file.ranges[0].line_covered(3, 'src_file', 'rootdir') is False
+    assert src_file.ranges[0].line_covered(1, 'other_file', 'rootdir') is False
+    assert src_file.ranges[0].line_covered(1, 'src_file', 'other_rootdir') is False
     assert src_file.line_covered(1, 'src_file', 'rootdir') is True
     assert src_file.line_covered(3, 'src_file', 'rootdir') is False
     assert src_file.line_covered(1, 'other_file', 'rootdir') is False
     assert src_file.line_covered(1, 'src_file', 'other_rootdir') is False
 
 
+def test_lib_source_sources_file_index():
+    mock_file = mock_open(read_data=sources + 'range:3:4:rootdir/src_file\nrange:8:9:rootdir/src_file\nrange:12:20:rootdir/src_file\n')
+    with patch('builtins.open', mock_file):
+        src_file = lib_source.SourcesFile('sources_file')
+    assert src_file.index[('rootdir', 'src_file')] == ([1, 8, 12], [4, 9, 20])
+    assert [x for x in range(25) if src_file.line_covered(x, 'src_file', 'rootdir')] == \
+        [1, 2, 3, 4, 8, 9] + list(range(12, 21))
+    assert src_file.get_uncovered_ranges(1, 30, 'src_file', 'rootdir') == [(5, 7), (10, 11), (21, 30)]
+    assert src_file.get_uncovered_ranges(3, 8, 'src_file', 'rootdir') == [(5, 7)]
+    assert src_file.get_uncovered_ranges(13, 15, 'src_file', 'rootdir') == []
+    assert src_file.get_uncovered_ranges(5, 6, 'src_file', 'rootdir') == [(5, 6)]
+    assert src_file.get_uncovered_ranges(5, 4, 'src_file', 'rootdir') == []
+    assert src_file.get_uncovered_ranges(1, 2, 'other_file', 'rootdir') == [(1, 2)]
+
+
 @patch('glob.glob', return_value=['logdir/log_sources_flavor1', 'logdir/log_sources_flavor2'])
 def test_lib_source_get_log_sources(mock_glob):
     assert list(lib_source.get_log_sources('logdir')) == [
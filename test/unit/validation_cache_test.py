@@ -0,0 +1,103 @@
+import json
+import os
+from pytest import raises
+from unittest.mock import Mock, patch
+
+from kiwi_keg.exceptions import KegKiwiValidationError
+from kiwi_keg.validation_cache import ValidationCache
+
+
+class TestValidationCache:
+    def setup_method(self):
+        self.validate = Mock()
+
+    def test_validate_cached(self, tmp_path):
+        description = tmp_path / 'config.kiwi'
+        description.write_text('<image/>')
+        cache_file = str(tmp_path / 'cache' / 'validation.json')
+        ValidationCache(cache_file).validate(str(description), self.validate)
+        ValidationCache(cache_file).validate(str(description), self.validate)
+        assert self.validate.call_count == 1
+        description.write_text('<image name="changed"/>')
+        ValidationCache(cache_file).validate(str(description), self.validate)
+        assert self.validate.call_count == 2
+
+    def test_validate_cached_error(self, tmp_path):
+        description = tmp_path / 'config.kiwi'
+        description.write_text('<image/>')
+        cache_file = str(tmp_path / 'validation.json')
+        self.validate.side_effect = KegKiwiValidationError('broken')
+        with raises(KegKiwiValidationError):
+            ValidationCache(cache_file).validate(str(description), self.validate)
+        with raises(KegKiwiValidationError, match='broken'):
+            ValidationCache(cache_file).validate(str(description), self.validate)
+        assert self.validate.call_count == 1
+
+    def test_validate_other_error_not_cached(self, tmp_path):
+        description = tmp_path / 'config.kiwi'
+        description.write_text('<image/>')
+        cache_file = str(tmp_path / 'validation.json')
+        self.validate.side_effect = KeyboardInterrupt
+        with raises(KeyboardInterrupt):
+            ValidationCache(cache_file).validate(str(description), self.validate)
+        assert not os.path.exists(cache_file)
+
+    def test_validate_missing_description(self, tmp_path):
+        ValidationCache(str(tmp_path / 'validation.json')).validate(str(tmp_path / 'missing'), self.validate)
+        self.validate.assert_called_once_with()
+
+    def test_key_depends_on_schema(self, tmp_path):
+        description = tmp_path / 'config.kiwi'
+        description.write_text('<image/>')
+        cache = ValidationCache(str(tmp_path / 'validation.json'))
+        key = cache.get_key(str(description))
+        assert cache.get_key(str(description)) == key
+        schema_dir = tmp_path / 'kiwi' / 'schema'
+        schema_dir.mkdir(parents=True)
+        (schema_dir / 'kiwi.rng').write_text('<grammar/>')
+        spec = Mock(submodule_search_locations=[str(tmp_path / 'kiwi')])
+        with patch('importlib.util.find_spec', return_value=spec), \
+                patch('importlib.metadata.version', return_value='0.0.1'):
+            assert ValidationCache(str(tmp_path / 'validation.json')).get_key(str(description)) != key
+
+    def test_key_without_kiwi(self, tmp_path):
+        import importlib.metadata
+        description = tmp_path / 'config.kiwi'
+        description.write_text('<image/>')
+        with patch('importlib.util.find_spec', return_value=None), \
+                patch('importlib.metadata.version', side_effect=importlib.metadata.PackageNotFoundError):
+            assert ValidationCache(str(tmp_path / 'validation.json')).get_key(str(description))
+
+    @patch('kiwi_keg.validation_cache.MAX_ENTRIES', 2)
+    def test_max_entries(self, tmp_path):
+        cache_file = tmp_path / 'validation.json'
+        for content in ['a', 'b', 'c']:
+            description = tmp_path / 'config.kiwi'
+            description.write_text(content)
+            ValidationCache(str(cache_file)).validate(str(description), self.validate)
+        with open(cache_file) as cache:
+            assert len(json.load(cache)['entries']) == 2
+
+    def test_unreadable_cache(self, tmp_path, caplog):
+        cache_file = tmp_path / 'validation.json'
+        cache_file.write_text('no json')
+        ValidationCache(str(cache_file))
+        assert 'Ignoring unreadable validation cache' in caplog.text
+
+    def test_outdated_cache(self, tmp_path):
+        description = tmp_path / 'config.kiwi'
+        description.write_text('<image/>')
+        cache_file = tmp_path / 'validation.json'
+        cache = ValidationCache(str(cache_file))
+        cache_file.write_text(json.dumps(
+            {'version': 0, 'keg': 'old', 'entries': {cache.get_key(str(description)): {'error': None}}}
+        ))
+        ValidationCache(str(cache_file)).validate(str(description), self.validate)
+        self.validate.assert_called_once_with()
+
+    @patch('tempfile.NamedTemporaryFile', side_effect=OSError('read-only'))
+    def test_write_error(self, mock_tempfile, tmp_path, caplog):
+        description = tmp_path / 'config.kiwi'
+        description.write_text('<image/>')
+        ValidationCache(str(tmp_path / 'validation.json')).validate(str(description), self.validate)
+        assert 'Cannot write validation cache' in caplog.text